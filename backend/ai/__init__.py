@@ -1,10 +1,12 @@
 """Guidio AI — proactive tour guide powered by LLM + ElevenLabs TTS."""
 
 from .models import Information, Response
-from .main import describe
+from .main import adescribe, astream_describe, describe
 
 __all__ = [
     "Information",
     "Response",
+    "adescribe",
+    "astream_describe",
     "describe",
 ]
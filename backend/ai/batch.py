@@ -0,0 +1,253 @@
+"""Generate narration text and audio for parsed POIs, many at a time.
+
+Usage:
+    uv run python -m ai.batch                       # next 10 unprocessed files
+    uv run python -m ai.batch -n 50                 # next 50 unprocessed files
+    uv run python -m ai.batch --all --llm-concurrency 8 --tts-concurrency 4
+    uv run python -m ai.batch Q1754 Q54315          # specific entity IDs (even if already done)
+    uv run python -m ai.batch --changed             # entities refreshed by parse_all_entities.py --refresh
+
+Every POI goes through the LLM and then TTS, each behind its own concurrency
+limit, so the audio of one POI is synthesized while the text of the next is
+still being written. Rate limits and transient errors are retried with
+backoff (honouring ``Retry-After``). Results are saved as soon as they exist,
+``<QID>.txt`` after the LLM and ``<QID>.mp3`` after TTS, so an interrupted
+run resumes where it stopped and only synthesizes the audio of entities whose
+text was already written.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from .models import Information
+from .services import llm, tts
+from .services.cache import write_atomic
+from .services.retry import status_code, with_retries
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+PARSED_DIR = BACKEND_DIR / "scripts" / "parsed"
+CHANGED_PATH = PARSED_DIR / "_changed_entities.json"
+OUTPUT_DIR = Path(__file__).parent / "test" / "output"
+FAILED_NAME = "_failed_narrations.json"
+DEFAULT_BATCH_SIZE = 10
+LOCATION = "Stockholm, Sweden"
+INTEREST = "history and culture"
+
+
+def load_information(path: Path) -> Information:
+    data = json.loads(path.read_text())
+    return Information(
+        title=data["title"],
+        latitude=data["latitude"],
+        longitude=data["longitude"],
+        summary=data.get("summary") or "",
+        text=data.get("text") or "",
+        location=LOCATION,
+        interest=INTEREST,
+    )
+
+
+@dataclass
+class BatchStats:
+    total: int = 0
+    narrated: int = 0
+    resumed: int = 0
+    retries: int = 0
+    failed: dict[str, str] = field(default_factory=dict)
+
+
+class NarrationRunner:
+    """Runs POIs through ``llm.agenerate`` and ``tts.asynthesize_chunked`` with separate limits."""
+
+    def __init__(
+        self,
+        output_dir: Path = OUTPUT_DIR,
+        llm_concurrency: int = 4,
+        tts_concurrency: int = 2,
+        attempts: int = 5,
+        base_delay: float = 1.0,
+        force: bool = False,
+    ):
+        self.output_dir = output_dir
+        self.llm_concurrency = max(1, llm_concurrency)
+        self.tts_concurrency = max(1, tts_concurrency)
+        self.attempts = attempts
+        self.base_delay = base_delay
+        # Regenerate the text even if an earlier run left one behind.
+        self.force = force
+        self.stats = BatchStats()
+
+    def _on_retry(self, stage: str, entity_id: str):
+        def report(exc: BaseException, delay: float) -> None:
+            self.stats.retries += 1
+            reason = status_code(exc) or type(exc).__name__
+            print(f"  {entity_id}: {stage} {reason}, retrying in {delay:.1f}s")
+
+        return report
+
+    async def _text(self, ctx: Information, entity_id: str) -> tuple[str, float]:
+        path = self.output_dir / f"{entity_id}.txt"
+        if path.exists() and not self.force:
+            self.stats.resumed += 1
+            return path.read_text(encoding="utf-8"), 0.0
+        async with self._llm:
+            started = time.monotonic()
+            text = await with_retries(
+                llm.agenerate,
+                ctx,
+                attempts=self.attempts,
+                base_delay=self.base_delay,
+                on_retry=self._on_retry("llm", entity_id),
+            )
+            elapsed = time.monotonic() - started
+        write_atomic(path, text.encode("utf-8"))
+        return text, elapsed
+
+    async def _audio(self, text: str, entity_id: str) -> tuple[bytes, float]:
+        async with self._tts:
+            started = time.monotonic()
+            audio = await with_retries(
+                tts.asynthesize_chunked,
+                text,
+                attempts=self.attempts,
+                base_delay=self.base_delay,
+                on_retry=self._on_retry("tts", entity_id),
+            )
+            elapsed = time.monotonic() - started
+        write_atomic(self.output_dir / f"{entity_id}.mp3", audio)
+        return audio, elapsed
+
+    async def process(self, path: Path) -> None:
+        entity_id = path.stem
+        try:
+            ctx = load_information(path)
+            text, llm_s = await self._text(ctx, entity_id)
+            audio, tts_s = await self._audio(text, entity_id)
+        except Exception as exc:
+            self.stats.failed[entity_id] = f"{type(exc).__name__}: {exc}"
+            print(f"  {entity_id}: failed ({self.stats.failed[entity_id]})")
+            return
+        self.stats.narrated += 1
+        done = self.stats.narrated + len(self.stats.failed)
+        print(
+            f"[{done}/{self.stats.total}] {ctx.title} ({entity_id}): "
+            f"llm {llm_s:.1f}s, tts {tts_s:.1f}s, {len(audio)} bytes"
+        )
+
+    async def run(self, paths: list[Path]) -> BatchStats:
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.stats = BatchStats(total=len(paths))
+        self._llm = asyncio.Semaphore(self.llm_concurrency)
+        self._tts = asyncio.Semaphore(self.tts_concurrency)
+        queue: asyncio.Queue[Path] = asyncio.Queue()
+        for path in paths:
+            queue.put_nowait(path)
+
+        async def worker() -> None:
+            while not queue.empty():
+                await self.process(queue.get_nowait())
+
+        # Enough workers to keep both pools busy; the semaphores do the limiting.
+        await asyncio.gather(*(worker() for _ in range(self.llm_concurrency + self.tts_concurrency)))
+
+        failed_path = self.output_dir / FAILED_NAME
+        if self.stats.failed:
+            failed_path.write_text(json.dumps({"failed": self.stats.failed}, indent=2))
+        elif failed_path.exists():
+            failed_path.unlink()
+        return self.stats
+
+
+def is_done(path: Path, output_dir: Path = OUTPUT_DIR) -> bool:
+    return (output_dir / f"{path.stem}.mp3").exists()
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Generate narration text and audio for parsed POIs.")
+    parser.add_argument("entity_ids", nargs="*", help="Entity IDs to (re)generate, even if already done.")
+    parser.add_argument("-n", type=int, default=DEFAULT_BATCH_SIZE, help="Number of unprocessed entities to run.")
+    parser.add_argument("--all", action="store_true", help="Run every unprocessed entity.")
+    parser.add_argument(
+        "--changed",
+        action="store_true",
+        help="Regenerate the entities listed by parse_all_entities.py --refresh.",
+    )
+    parser.add_argument("--parsed-dir", type=Path, default=PARSED_DIR, help="Directory of <QID>.json files.")
+    parser.add_argument("--output-dir", type=Path, default=OUTPUT_DIR, help="Where <QID>.txt/.mp3 are written.")
+    parser.add_argument("--llm-concurrency", type=int, default=4, help="Completions in flight at once.")
+    parser.add_argument("--tts-concurrency", type=int, default=2, help="Syntheses in flight at once.")
+    parser.add_argument("--attempts", type=int, default=5, help="Tries per provider call before giving up.")
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+    from dotenv import load_dotenv
+
+    load_dotenv(BACKEND_DIR / ".env")
+    args = parse_args(argv)
+
+    # _failed_entities.json / _changed_entities.json are run reports, not entities
+    all_files = sorted(f for f in args.parsed_dir.glob("*.json") if not f.name.startswith("_"))
+    remaining = [f for f in all_files if not is_done(f, args.output_dir)]
+    print(f"Total: {len(all_files)} | Done: {len(all_files) - len(remaining)} | Remaining: {len(remaining)}\n")
+
+    force = True
+    if args.changed:
+        changed_path = args.parsed_dir / CHANGED_PATH.name
+        changed = json.loads(changed_path.read_text())["changed"] if changed_path.exists() else []
+        json_files = [args.parsed_dir / f"{entity_id}.json" for entity_id in changed]
+    elif args.entity_ids:
+        json_files = []
+        for entity_id in args.entity_ids:
+            path = args.parsed_dir / f"{entity_id}.json"
+            if path.exists():
+                json_files.append(path)
+            else:
+                print(f"Warning: {entity_id}.json not found, skipping")
+    else:
+        force = False
+        json_files = remaining if args.all else remaining[: max(0, args.n)]
+
+    if not json_files:
+        print("Nothing to process!")
+        return 0
+
+    print(f"Processing {len(json_files)} file(s)\n")
+    runner = NarrationRunner(
+        args.output_dir,
+        llm_concurrency=args.llm_concurrency,
+        tts_concurrency=args.tts_concurrency,
+        attempts=args.attempts,
+        force=force,
+    )
+    started = time.monotonic()
+    stats = asyncio.run(runner.run(json_files))
+    elapsed = time.monotonic() - started
+
+    print(
+        f"\nNarrated {stats.narrated} POIs in {elapsed:.0f}s "
+        f"({stats.narrated / elapsed * 60 if elapsed > 0 else 0:.1f}/min, "
+        f"{stats.resumed} resumed from saved text, {stats.retries} retries)"
+    )
+    if llm.TOKEN_USAGE["requests"]:
+        usage = llm.TOKEN_USAGE
+        print(
+            f"LLM tokens per request: {usage['prompt_tokens'] / usage['requests']:.0f} in, "
+            f"{usage['completion_tokens'] / usage['requests']:.0f} out"
+        )
+    if stats.failed:
+        print(f"Failed: {len(stats.failed)} (see {args.output_dir / FAILED_NAME})")
+    done_now = len([f for f in all_files if is_done(f, args.output_dir)])
+    print(f"Done! ({done_now}/{len(all_files)} total completed)")
+    return 0 if not stats.failed else 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
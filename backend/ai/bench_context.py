@@ -0,0 +1,61 @@
+"""Measure how much the context reduction shrinks the narration prompts.
+
+Builds the user prompt of every parsed record three ways: with the raw
+article HTML (as sent before the reduction), with the whole article as plain
+text, and cut to the token budget. Tokens are counted with tiktoken when it
+is installed, otherwise estimated at four characters per token.
+
+Usage:
+    uv run python -m ai.bench_context
+    uv run python -m ai.bench_context --budget 800 --limit 100
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from dataclasses import replace
+from pathlib import Path
+
+from .batch import PARSED_DIR, load_information
+from .config import LLM_CONTEXT_TOKENS
+from .services import llm
+from .services.context import estimate_tokens
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--parsed-dir", type=Path, default=PARSED_DIR)
+    parser.add_argument("--budget", type=int, default=LLM_CONTEXT_TOKENS, help="Reference text token budget.")
+    parser.add_argument("--limit", type=int, default=None, help="Max records to use.")
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(argv)
+    paths = sorted(p for p in args.parsed_dir.glob("*.json") if not p.name.startswith("_"))
+    if args.limit is not None:
+        paths = paths[: max(0, args.limit)]
+    if not paths:
+        print("No parsed records found.", file=sys.stderr)
+        return 1
+    contexts = [load_information(path) for path in paths]
+
+    # The summary is always in the prompt; an empty text shows its fixed cost.
+    floor = [estimate_tokens(llm._build_user_prompt(replace(ctx, text=""), 0)) for ctx in contexts]
+    raw = [base + estimate_tokens(ctx.text) for base, ctx in zip(floor, contexts)]
+    plain = [estimate_tokens(llm._build_user_prompt(ctx, 0)) for ctx in contexts]
+    started = time.perf_counter()
+    reduced = [estimate_tokens(llm._build_user_prompt(ctx, args.budget)) for ctx in contexts]
+    elapsed = time.perf_counter() - started
+
+    print(f"{len(contexts)} records from {args.parsed_dir}, budget {args.budget} tokens")
+    for label, counts in (("raw HTML", raw), ("plain text", plain), ("reduced", reduced), ("no text", floor)):
+        print(f"{label:<11} mean {sum(counts) / len(counts):8.0f}  max {max(counts):7d}  total {sum(counts):9d}")
+    print(f"Prompt tokens saved: {1 - sum(reduced) / sum(raw):.0%} ({elapsed / len(contexts) * 1000:.2f} ms/record)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -4,7 +4,16 @@ from pathlib import Path
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 ELEVENLABS_API_KEY = os.getenv("ELEVENLABS_API_KEY")
 ELEVENLABS_VOICE_ID = os.getenv("ELEVENLABS_VOICE_ID", "JBFqnCBsd6RMkjVDRZzb")
+# Override the API hosts, e.g. to point at a proxy or a local stub.
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL")
+ELEVENLABS_BASE_URL = os.getenv("ELEVENLABS_BASE_URL")
 
 PROMPT_DIR = Path(__file__).parent / "prompt"
 LLM_MODEL = os.getenv("LLM_MODEL", "gpt-4o-mini")
+# Token budget for the Wikipedia reference text in the prompt; 0 sends all of it.
+LLM_CONTEXT_TOKENS = int(os.getenv("LLM_CONTEXT_TOKENS", "1200"))
 TTS_MODEL = "eleven_turbo_v2_5"
+TTS_OUTPUT_FORMAT = "mp3_44100_128"
+# Narrations longer than this are synthesized as parallel pieces; 0 disables it.
+TTS_CHUNK_CHARS = int(os.getenv("TTS_CHUNK_CHARS", "800"))
+TTS_CHUNK_CONCURRENCY = int(os.getenv("TTS_CHUNK_CONCURRENCY", "4"))
@@ -1,9 +1,64 @@
+import asyncio
+from collections.abc import AsyncIterator
+
 from .models import Information, Response
-from .services import llm, tts
+from .services import llm, mp3, tts
+from .services.retry import with_retries
+from .services.sentences import SentenceChunker
+
+# Characters of already spoken narration sent along with each streamed sentence.
+PREVIOUS_TEXT_CHARS = 300
 
 
 def describe(ctx: Information) -> Response:
     """Generate a tour-guide description and synthesize audio."""
     text = llm.generate(ctx)
-    audio = tts.synthesize(text)
+    audio = tts.synthesize_chunked(text)
+    return Response(text=text, audio=audio)
+
+
+async def adescribe(ctx: Information) -> Response:
+    """Async describe(); each provider call is retried on rate limits and transient errors."""
+    text = await with_retries(llm.agenerate, ctx)
+    audio = await with_retries(tts.asynthesize_chunked, text)
     return Response(text=text, audio=audio)
+
+
+async def astream_describe(ctx: Information) -> AsyncIterator[bytes]:
+    """Yield MP3 audio of the description while it is still being written.
+
+    The completion is streamed and cut into sentences; each sentence is
+    synthesized as soon as it is complete while the model keeps writing the
+    next ones, so the first audio arrives after one sentence instead of after
+    the whole text. Nothing is retried: a failure ends the stream.
+
+    Only the audio frames of each sentence are yielded, without its tags and
+    Info frame, so the sentences join into one stream like mp3.concat().
+    """
+    sentences: asyncio.Queue[str | None] = asyncio.Queue()
+
+    async def write() -> None:
+        chunker = SentenceChunker()
+        try:
+            async for delta in llm.astream(ctx):
+                for sentence in chunker.feed(delta):
+                    sentences.put_nowait(sentence)
+            if (tail := chunker.flush()) is not None:
+                sentences.put_nowait(tail)
+        finally:
+            sentences.put_nowait(None)
+
+    writer = asyncio.create_task(write())
+    try:
+        spoken = ""
+        while (sentence := await sentences.get()) is not None:
+            frames = mp3.FrameStream()
+            async for chunk in tts.astream(sentence, previous_text=spoken[-PREVIOUS_TEXT_CHARS:] or None):
+                if audio := frames.feed(chunk):
+                    yield audio
+            if audio := frames.close():
+                yield audio
+            spoken = f"{spoken} {sentence}".strip()
+        await writer
+    finally:
+        writer.cancel()
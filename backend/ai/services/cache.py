@@ -0,0 +1,69 @@
+"""Content-addressed store of generated narrations.
+
+A narration is stored under the hash of everything that determines it: the
+messages sent to the LLM (which contain the reference text, the interest and
+the location), the LLM model and the voice and TTS settings. Regenerating a
+POI whose input did not change is therefore a cache hit, even after a
+re-import cleared its ``audio_file``; a changed article or prompt gets a new
+key and is generated again.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from pathlib import Path
+
+from ..config import ELEVENLABS_VOICE_ID, LLM_MODEL, TTS_MODEL, TTS_OUTPUT_FORMAT
+from ..models import Information, Response
+from . import llm
+
+
+def narration_key(ctx: Information, voice_id: str | None = None) -> str:
+    blob = json.dumps(
+        {
+            "messages": llm.build_messages(ctx),
+            "model": LLM_MODEL,
+            "voice": voice_id or ELEVENLABS_VOICE_ID,
+            "tts_model": TTS_MODEL,
+            "output_format": TTS_OUTPUT_FORMAT,
+        },
+        ensure_ascii=False,
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def write_atomic(path: Path, data: bytes) -> None:
+    """Write ``data`` to ``path`` so readers see either the old file or all of the new one."""
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+class NarrationCache:
+    """``<root>/<key[:2]>/<key>.txt`` and ``.mp3`` per narration."""
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+
+    def paths(self, key: str) -> tuple[Path, Path]:
+        base = self.root / key[:2] / key
+        return base.with_suffix(".txt"), base.with_suffix(".mp3")
+
+    def get(self, key: str) -> tuple[str, Path] | None:
+        """The cached text and audio file, if both were written."""
+        text_path, audio_path = self.paths(key)
+        # The audio is written last, so its presence means the entry is complete.
+        if not audio_path.is_file() or not text_path.is_file():
+            return None
+        return text_path.read_text(encoding="utf-8"), audio_path
+
+    def put(self, key: str, narration: Response) -> Path:
+        text_path, audio_path = self.paths(key)
+        text_path.parent.mkdir(parents=True, exist_ok=True)
+        write_atomic(text_path, narration.text.encode("utf-8"))
+        write_atomic(audio_path, narration.audio)
+        return audio_path
@@ -0,0 +1,178 @@
+"""Reduce the Wikipedia reference text of a POI to a token budget before prompting.
+
+The simplified article HTML is flattened into sections of plain-text
+sentences, without the ones the summary already contains. Each sentence is
+scored by how many of its words also appear in the title, the summary and
+the client's interest, plus a bonus for the lead section and for the first
+sentences of a section. The best sentences are then kept until the budget is
+spent, and printed in article order under their section headings, so the
+model still reads a coherent excerpt.
+"""
+
+from __future__ import annotations
+
+import math
+import re
+from dataclasses import dataclass
+from html.parser import HTMLParser
+
+try:
+    import tiktoken
+except ImportError:  # optional; the estimate below is close enough for budgeting
+    tiktoken = None
+
+_ENCODING = tiktoken.get_encoding("o200k_base") if tiktoken is not None else None
+
+_HEADINGS = {"h1", "h2", "h3", "h4", "h5", "h6"}
+_BLOCKS = {"p", "li", "dd", "dt", "td", "th", "blockquote", "div", "tr", "br"}
+_SENTENCE_RE = re.compile(r"(?<=[.!?])[\"')\]]*\s+(?=[\"'(\[]?[A-Z0-9ÅÄÖÉ])")
+_WORD_RE = re.compile(r"[^\W\d_]{3,}")
+# Crude stemming: "historic" and "history", "cultural" and "culture" match.
+_STEM_CHARS = 6
+_STOPWORDS = frozenset(
+    "the and for with that this from was were are has have had its into also which who whom "
+    "their there been being than then they them these those such over under after before "
+    "between during about other more most some many one two three first new old can could "
+    "would should will not but all any each very".split()
+)
+
+LEAD_BONUS = 1.0
+INTEREST_WEIGHT = 2.0
+MIN_TERMS = 5
+
+
+def estimate_tokens(text: str) -> int:
+    """Token count of ``text`` (exact with tiktoken, else ~4 characters per token)."""
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text))
+    return math.ceil(len(text) / 4)
+
+
+def _terms(text: str) -> set[str]:
+    return {w[:_STEM_CHARS] for w in (m.group(0).lower() for m in _WORD_RE.finditer(text)) if w not in _STOPWORDS}
+
+
+class _TextExtractor(HTMLParser):
+    """Collects ``(heading, [block text, ...])`` sections from simplified article HTML."""
+
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.sections: list[tuple[str | None, list[str]]] = [(None, [])]
+        self._buffer: list[str] = []
+        self._in_heading = False
+        self._in_title = False
+
+    def _flush(self) -> None:
+        text = " ".join("".join(self._buffer).split())
+        self._buffer = []
+        if not text or self._in_title:
+            return
+        if self._in_heading:
+            self.sections.append((text, []))
+        else:
+            self.sections[-1][1].append(text)
+
+    def handle_starttag(self, tag: str, attrs: list) -> None:
+        if tag in _HEADINGS or tag in _BLOCKS:
+            self._flush()
+            self._in_title = tag == "h1"
+            self._in_heading = tag in _HEADINGS
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag in _HEADINGS or tag in _BLOCKS:
+            self._flush()
+            self._in_heading = self._in_title = False
+
+    def handle_data(self, data: str) -> None:
+        self._buffer.append(data)
+
+    def close(self) -> None:
+        super().close()
+        self._flush()
+
+
+def html_to_sections(html: str) -> list[tuple[str | None, list[str]]]:
+    """``(heading, sentences)`` per section; the lead has heading None. ``<h1>`` titles are dropped."""
+    extractor = _TextExtractor()
+    extractor.feed(html)
+    extractor.close()
+    sections = []
+    for heading, blocks in extractor.sections:
+        sentences = [s for block in blocks for s in _SENTENCE_RE.split(block) if s.strip()]
+        if sentences:
+            sections.append((heading, sentences))
+    return sections
+
+
+def _render(sections: list[tuple[str | None, list[str]]]) -> str:
+    parts = []
+    for heading, sentences in sections:
+        body = " ".join(sentences)
+        parts.append(f"## {heading}\n{body}" if heading else body)
+    return "\n\n".join(parts)
+
+
+@dataclass(frozen=True)
+class Reduction:
+    text: str
+    tokens_before: int
+    tokens_after: int
+
+
+def reduce_context(html: str, summary: str, interest: str, title: str, budget_tokens: int) -> Reduction:
+    """Plain text of ``html`` cut down to ``budget_tokens`` of the most relevant sentences.
+
+    Sentences already in ``summary`` are dropped; a ``budget_tokens`` of 0 keeps the rest.
+    """
+    sections = html_to_sections(html or "")
+    tokens_before = estimate_tokens(_render(sections))
+    # The lead usually repeats the summary, which the prompt already contains.
+    summary_text = " ".join((summary or "").split())
+    if summary_text:
+        sections = [
+            (heading, [s for s in sentences if s not in summary_text]) for heading, sentences in sections
+        ]
+        sections = [(heading, sentences) for heading, sentences in sections if sentences]
+    full = _render(sections)
+    if budget_tokens <= 0 or estimate_tokens(full) <= budget_tokens:
+        return Reduction(full, tokens_before, estimate_tokens(full))
+
+    topic = _terms(f"{title} {summary}")
+    interest_terms = _terms(interest)
+    candidates = []
+    for s_index, (heading, sentences) in enumerate(sections):
+        heading_bonus = 0.5 if heading and _terms(heading) & interest_terms else 0.0
+        for index, sentence in enumerate(sentences):
+            terms = _terms(sentence)
+            norm = math.sqrt(len(terms) + 1)
+            score = (
+                len(terms & topic) / norm
+                + INTEREST_WEIGHT * len(terms & interest_terms) / norm
+                + heading_bonus
+                + (LEAD_BONUS if heading is None else 0.0)
+                + 0.5 / (1 + index)
+            )
+            # List captions and name-only list items carry little to narrate.
+            score *= min(1.0, len(terms) / MIN_TERMS)
+            candidates.append((score, s_index, index, sentence))
+
+    chosen: set[tuple[int, int]] = set()
+    used_headings: set[int] = set()
+    spent = 0
+    for _, s_index, index, sentence in sorted(candidates, key=lambda c: (-c[0], c[1], c[2])):
+        cost = estimate_tokens(sentence) + 1
+        heading = sections[s_index][0]
+        if heading and s_index not in used_headings:
+            cost += estimate_tokens(heading) + 2
+        if spent + cost > budget_tokens:
+            continue
+        spent += cost
+        chosen.add((s_index, index))
+        used_headings.add(s_index)
+
+    kept = [
+        (heading, [s for index, s in enumerate(sentences) if (s_index, index) in chosen])
+        for s_index, (heading, sentences) in enumerate(sections)
+    ]
+    text = _render([(heading, sentences) for heading, sentences in kept if sentences])
+    return Reduction(text, tokens_before, estimate_tokens(text))
@@ -1,25 +1,48 @@
 from __future__ import annotations
 
-from openai import OpenAI
+from collections.abc import AsyncIterator
+from functools import lru_cache
 
-from ..config import OPENAI_API_KEY, LLM_MODEL, PROMPT_DIR
+from openai import AsyncOpenAI, OpenAI
+
+from ..config import OPENAI_API_KEY, OPENAI_BASE_URL, LLM_CONTEXT_TOKENS, LLM_MODEL, PROMPT_DIR
 from ..models import Information
+from .context import reduce_context
 
 _client: OpenAI | None = None
+_async_client: AsyncOpenAI | None = None
+
+# Tokens reported by the API across all completions of this process.
+TOKEN_USAGE = {"requests": 0, "prompt_tokens": 0, "completion_tokens": 0}
 
 
 def _get_client() -> OpenAI:
     global _client
     if _client is None:
-        _client = OpenAI(api_key=OPENAI_API_KEY)
+        _client = OpenAI(api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL)
     return _client
 
 
+def _get_async_client() -> AsyncOpenAI:
+    global _async_client
+    if _async_client is None:
+        # Callers retry with services.retry, which also backs off between batch requests.
+        _async_client = AsyncOpenAI(api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL, max_retries=0)
+    return _async_client
+
+
+@lru_cache(maxsize=None)
 def _load_prompt(filename: str) -> str:
     return (PROMPT_DIR / filename).read_text()
 
 
-def _build_user_prompt(ctx: Information) -> str:
+def _reference_text(ctx: Information, budget_tokens: int | None = None) -> str:
+    """The article as plain text, cut to the most relevant ``LLM_CONTEXT_TOKENS``."""
+    budget = LLM_CONTEXT_TOKENS if budget_tokens is None else budget_tokens
+    return reduce_context(ctx.text, ctx.summary, ctx.interest, ctx.title, budget).text
+
+
+def _build_user_prompt(ctx: Information, budget_tokens: int | None = None) -> str:
     template = _load_prompt("user.md")
     return (
         template
@@ -27,21 +50,63 @@ def _build_user_prompt(ctx: Information) -> str:
         .replace("<|LATITUDE|>", str(ctx.latitude))
         .replace("<|LONGITUDE|>", str(ctx.longitude))
         .replace("<|SUMMARY|>", ctx.summary)
-        .replace("<|TEXT|>", ctx.text)
+        .replace("<|TEXT|>", _reference_text(ctx, budget_tokens))
         .replace("<|LOCATION|>", ctx.location)
         .replace("<|INTEREST|>", ctx.interest)
     )
 
 
+def build_messages(ctx: Information) -> list[dict[str, str]]:
+    """The chat messages sent for ``ctx``; the narration cache is keyed on them."""
+    return [
+        {"role": "system", "content": _load_prompt("system.md")},
+        {"role": "user", "content": _build_user_prompt(ctx)},
+    ]
+
+
+def _record_usage(response) -> None:
+    TOKEN_USAGE["requests"] += 1
+    if response.usage is not None:
+        TOKEN_USAGE["prompt_tokens"] += response.usage.prompt_tokens
+        TOKEN_USAGE["completion_tokens"] += response.usage.completion_tokens
+
+
 def generate(ctx: Information) -> str:
     """Generate a complete tour guide description."""
     client = _get_client()
     response = client.chat.completions.create(
         model=LLM_MODEL,
-        messages=[
-            {"role": "system", "content": _load_prompt("system.md")},
-            {"role": "user", "content": _build_user_prompt(ctx)},
-        ],
+        messages=build_messages(ctx),
         temperature=0.8,
     )
+    _record_usage(response)
     return response.choices[0].message.content or ""
+
+
+async def agenerate(ctx: Information) -> str:
+    """Async variant of generate(), for running many POIs concurrently."""
+    client = _get_async_client()
+    response = await client.chat.completions.create(
+        model=LLM_MODEL,
+        messages=build_messages(ctx),
+        temperature=0.8,
+    )
+    _record_usage(response)
+    return response.choices[0].message.content or ""
+
+
+async def astream(ctx: Information) -> AsyncIterator[str]:
+    """Yield the description as the model writes it, in text deltas."""
+    client = _get_async_client()
+    stream = await client.chat.completions.create(
+        model=LLM_MODEL,
+        messages=build_messages(ctx),
+        temperature=0.8,
+        stream=True,
+        stream_options={"include_usage": True},
+    )
+    async for chunk in stream:
+        if chunk.usage is not None:
+            _record_usage(chunk)
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
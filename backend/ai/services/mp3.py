@@ -0,0 +1,175 @@
+"""Split MP3 data into MPEG audio frames and join separately encoded parts.
+
+Every MP3 returned by the TTS provider is a sequence of self-contained
+Layer III frames, optionally preceded by an ID3v2 tag and a Xing/Info frame
+(frame count and seek table of that part only) and followed by an ID3v1 tag.
+Parts are joined by keeping only their audio frames. Each encoded part starts
+with an empty bit reservoir, so its first frame never refers back into the
+previous part and the joined stream decodes like one file.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterator
+from dataclasses import dataclass
+
+_MPEG1, _MPEG2, _MPEG25 = 3, 2, 0
+_BITRATES_KBPS = {
+    _MPEG1: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    _MPEG2: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+_BITRATES_KBPS[_MPEG25] = _BITRATES_KBPS[_MPEG2]
+_SAMPLE_RATES = {_MPEG1: (44100, 48000, 32000), _MPEG2: (22050, 24000, 16000), _MPEG25: (11025, 12000, 8000)}
+_MONO = 3
+
+
+@dataclass(frozen=True)
+class FrameHeader:
+    version: int
+    bitrate_kbps: int
+    sample_rate: int
+    channel_mode: int
+    length: int
+    # Offset of the Xing/Info tag in a frame, past header, CRC and side info.
+    side_info_end: int
+
+    @property
+    def format(self) -> tuple[int, int, int, int]:
+        """What every frame of a joined stream must share."""
+        return self.version, self.bitrate_kbps, self.sample_rate, self.channel_mode
+
+
+def parse_header(data: bytes | memoryview, offset: int = 0) -> FrameHeader | None:
+    """The Layer III frame header at ``offset``, or None if there is none."""
+    if offset + 4 > len(data):
+        return None
+    b0, b1, b2, b3 = data[offset : offset + 4]
+    version = (b1 >> 3) & 0b11
+    if b0 != 0xFF or (b1 & 0xE0) != 0xE0 or version == 1 or (b1 >> 1) & 0b11 != 0b01:
+        return None
+    bitrate_index, rate_index = b2 >> 4, (b2 >> 2) & 0b11
+    if bitrate_index in (0, 15) or rate_index == 3:
+        return None
+    bitrate = _BITRATES_KBPS[version][bitrate_index]
+    sample_rate = _SAMPLE_RATES[version][rate_index]
+    padding = (b2 >> 1) & 1
+    channel_mode = b3 >> 6
+    coefficient = 144 if version == _MPEG1 else 72
+    length = coefficient * bitrate * 1000 // sample_rate + padding
+    if version == _MPEG1:
+        side_info = 17 if channel_mode == _MONO else 32
+    else:
+        side_info = 9 if channel_mode == _MONO else 17
+    crc = 0 if b1 & 1 else 2
+    return FrameHeader(version, bitrate, sample_rate, channel_mode, length, 4 + crc + side_info)
+
+
+def _id3v2_size(data: bytes) -> int:
+    if len(data) < 10 or data[:3] != b"ID3":
+        return 0
+    size = 0
+    for byte in data[6:10]:
+        size = (size << 7) | (byte & 0x7F)
+    footer = 10 if data[5] & 0x10 else 0
+    return 10 + size + footer
+
+
+def _is_info_frame(frame: bytes | memoryview, header: FrameHeader) -> bool:
+    tag = bytes(frame[header.side_info_end : header.side_info_end + 4])
+    return tag in (b"Xing", b"Info") or bytes(frame[36:40]) == b"VBRI"
+
+
+def iter_frames(data: bytes) -> Iterator[tuple[FrameHeader, memoryview]]:
+    """The audio frames of ``data``, without tags and Xing/Info/VBRI frames.
+
+    Bytes that do not start a frame are skipped. After such bytes, and at the
+    start, a frame only counts if another frame header follows it, so stray
+    0xFF bytes are not mistaken for a frame.
+    """
+    view = memoryview(data)
+    end = len(data) - 128 if data[-128:-125] == b"TAG" else len(data)
+    offset = _id3v2_size(data)
+    synced = False
+    while offset < end:
+        header = parse_header(view, offset)
+        following = offset + header.length if header is not None else end + 1
+        if following > end or not (synced or following == end or parse_header(view, following)):
+            offset += 1
+            synced = False
+            continue
+        synced = True
+        frame = view[offset : offset + header.length]
+        if not _is_info_frame(frame, header):
+            yield header, frame
+        offset += header.length
+
+
+class FrameStream:
+    """iter_frames() for one MP3 part that arrives in chunks.
+
+    ``feed`` returns the audio frames completed by a chunk and ``close`` the
+    rest, joined; together they are the frames iter_frames() finds in the
+    whole part. The last 128 bytes are held back until ``close``, since they
+    may be an ID3v1 tag.
+    """
+
+    def __init__(self) -> None:
+        self._data = bytearray()
+        self._offset: int | None = None  # past the ID3v2 tag, once its size is known
+        self._synced = False
+
+    def feed(self, chunk: bytes) -> bytes:
+        self._data += chunk
+        return self._frames(final=False)
+
+    def close(self) -> bytes:
+        return self._frames(final=True)
+
+    def _frames(self, final: bool) -> bytes:
+        data = self._data
+        if self._offset is None:
+            if len(data) < 10 and not final:
+                return b""
+            self._offset = _id3v2_size(bytes(data[:10]))
+        if final:
+            end = len(data) - 128 if data[-128:-125] == b"TAG" else len(data)
+        else:
+            end = len(data) - 128
+        frames: list[bytes] = []
+        offset = self._offset
+        while offset < end:
+            header = parse_header(data, offset)
+            following = offset + header.length if header is not None else end + 1
+            if header is not None and not final and following >= end:
+                break  # whether this frame counts depends on bytes not received yet
+            if following > end or not (self._synced or following == end or parse_header(data, following)):
+                offset += 1
+                self._synced = False
+                continue
+            self._synced = True
+            frame = bytes(data[offset:following])
+            if not _is_info_frame(frame, header):
+                frames.append(frame)
+            offset = following
+        consumed = min(offset, len(data))
+        del data[:consumed]
+        self._offset = offset - consumed
+        return b"".join(frames)
+
+
+def concat(parts: list[bytes]) -> bytes:
+    """Join separately encoded MP3 ``parts`` into one stream.
+
+    Raises ValueError if the parts differ in bitrate, sample rate or channel
+    mode, which players would treat as a corrupt file.
+    """
+    frames: list[memoryview] = []
+    expected = None
+    for index, part in enumerate(parts):
+        for header, frame in iter_frames(part):
+            if expected is None:
+                expected = header.format
+            elif header.format != expected:
+                raise ValueError(f"MP3 part {index} is {header.format}, expected {expected}")
+            frames.append(frame)
+    return b"".join(frames)
@@ -0,0 +1,73 @@
+"""Retries with exponential backoff for the OpenAI and ElevenLabs calls."""
+
+from __future__ import annotations
+
+import asyncio
+import random
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, TypeVar
+
+import httpx
+import openai
+
+T = TypeVar("T")
+
+# Rate limits, timeouts and transient server errors; anything else is final.
+RETRY_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+
+
+def status_code(exc: BaseException) -> int | None:
+    return getattr(exc, "status_code", None)
+
+
+def retry_after(exc: BaseException) -> float | None:
+    """Seconds the provider asked us to wait (``Retry-After``), if it said so."""
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None) or getattr(exc, "headers", None) or {}
+    value = headers.get("retry-after") or headers.get("Retry-After")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retryable(exc: BaseException) -> bool:
+    status = status_code(exc)
+    if status is not None:
+        return status in RETRY_STATUSES or status >= 500
+    return isinstance(exc, (openai.APIConnectionError, httpx.TransportError, asyncio.TimeoutError))
+
+
+async def with_retries(
+    fn: Callable[..., Awaitable[T]],
+    *args: Any,
+    attempts: int = 5,
+    base_delay: float = 1.0,
+    max_delay: float = 60.0,
+    on_retry: Callable[[BaseException, float], None] | None = None,
+) -> T:
+    """Await ``fn(*args)``, retrying retryable errors up to ``attempts`` times in total.
+
+    The delay doubles per attempt (with jitter) unless the provider sent
+    ``Retry-After``, which is honoured as is.
+    """
+    for attempt in range(1, attempts + 1):
+        try:
+            return await fn(*args)
+        except Exception as exc:
+            if attempt == attempts or not is_retryable(exc):
+                raise
+            delay = retry_after(exc)
+            if delay is None:
+                delay = min(max_delay, base_delay * 2 ** (attempt - 1)) * random.uniform(0.5, 1.0)
+            if on_retry is not None:
+                on_retry(exc, delay)
+            await asyncio.sleep(delay)
+    raise AssertionError("unreachable")
@@ -0,0 +1,83 @@
+"""Cut streamed narration text into sentence-sized pieces for speech synthesis."""
+
+from __future__ import annotations
+
+import re
+
+# A sentence ends at . ! ? (optionally followed by a closing quote or bracket)
+# before whitespace; a blank line always ends a piece.
+_SENTENCE_END_RE = re.compile(r"[.!?…][\"')\]]*\s+|\n\s*\n")
+
+
+class SentenceChunker:
+    """Buffers text deltas and releases them in whole sentences.
+
+    Pieces shorter than ``min_chars`` are held back and joined with the next
+    sentence, so the synthesizer is not called for a lone "Yes." and
+    abbreviations such as "St. " rarely end up on their own.
+    """
+
+    def __init__(self, min_chars: int = 40):
+        self.min_chars = min_chars
+        self._buffer = ""
+
+    def feed(self, delta: str) -> list[str]:
+        """Add ``delta``; return the pieces that are complete now."""
+        self._buffer += delta
+        pieces = []
+        start = 0
+        for match in _SENTENCE_END_RE.finditer(self._buffer):
+            if match.end() - start < self.min_chars and "\n" not in match.group(0):
+                continue
+            piece = self._buffer[start : match.end()].strip()
+            if piece:
+                pieces.append(piece)
+            start = match.end()
+        self._buffer = self._buffer[start:]
+        return pieces
+
+    def flush(self) -> str | None:
+        """The remaining text once the stream has ended."""
+        piece, self._buffer = self._buffer.strip(), ""
+        return piece or None
+
+
+def _sentences(paragraph: str) -> list[str]:
+    pieces, start = [], 0
+    for match in _SENTENCE_END_RE.finditer(paragraph):
+        pieces.append(paragraph[start : match.end()].strip())
+        start = match.end()
+    pieces.append(paragraph[start:].strip())
+    return [piece for piece in pieces if piece]
+
+
+def split_text(text: str, max_chars: int) -> list[str]:
+    """Cut ``text`` into pieces of similar length, at most about ``max_chars`` each.
+
+    Pieces end at a sentence boundary and keep the paragraph breaks inside
+    them; a single sentence longer than ``max_chars`` is kept whole.
+    ``max_chars <= 0`` returns one piece.
+    """
+    text = text.strip()
+    if not text:
+        return []
+    if max_chars <= 0 or len(text) <= max_chars:
+        return [text]
+    # Aim for equal pieces rather than full ones followed by a short remainder.
+    target = len(text) / -(-len(text) // max_chars)
+
+    pieces: list[str] = []
+    current, separator = "", " "
+    for paragraph in re.split(r"\n\s*\n", text):
+        for sentence in _sentences(paragraph):
+            joined = len(current) + len(separator) + len(sentence)
+            # Cut where the piece lands closest to the target, never past max_chars.
+            if current and (joined > max_chars or joined - target > target - len(current)):
+                pieces.append(current)
+                current = ""
+            current = f"{current}{separator}{sentence}" if current else sentence
+            separator = " "
+        separator = "\n\n"
+    if current:
+        pieces.append(current)
+    return pieces
@@ -1,26 +1,142 @@
 from __future__ import annotations
 
-from elevenlabs import ElevenLabs
+import asyncio
+from collections.abc import AsyncIterator
+from concurrent.futures import ThreadPoolExecutor
 
-from ..config import ELEVENLABS_API_KEY, ELEVENLABS_VOICE_ID, TTS_MODEL
+from elevenlabs import AsyncElevenLabs, ElevenLabs
+
+from ..config import (
+    ELEVENLABS_API_KEY,
+    ELEVENLABS_BASE_URL,
+    ELEVENLABS_VOICE_ID,
+    TTS_CHUNK_CHARS,
+    TTS_CHUNK_CONCURRENCY,
+    TTS_MODEL,
+    TTS_OUTPUT_FORMAT,
+)
+from . import mp3
+from .sentences import split_text
 
 _client: ElevenLabs | None = None
+_async_client: AsyncElevenLabs | None = None
 
 
 def _get_client() -> ElevenLabs:
     global _client
     if _client is None:
-        _client = ElevenLabs(api_key=ELEVENLABS_API_KEY)
+        _client = ElevenLabs(api_key=ELEVENLABS_API_KEY, base_url=ELEVENLABS_BASE_URL)
     return _client
 
 
-def synthesize(text: str, voice_id: str | None = None) -> bytes:
+def _get_async_client() -> AsyncElevenLabs:
+    global _async_client
+    if _async_client is None:
+        _async_client = AsyncElevenLabs(api_key=ELEVENLABS_API_KEY, base_url=ELEVENLABS_BASE_URL)
+    return _async_client
+
+
+def _context(previous_text: str | None, next_text: str | None) -> dict[str, str]:
+    """The surrounding text of a piece, so intonation carries across pieces."""
+    context = {}
+    if previous_text:
+        context["previous_text"] = previous_text
+    if next_text:
+        context["next_text"] = next_text
+    return context
+
+
+def synthesize(
+    text: str, voice_id: str | None = None, previous_text: str | None = None, next_text: str | None = None
+) -> bytes:
     """Convert text to speech, returning complete MP3 audio bytes."""
     client = _get_client()
     audio_iter = client.text_to_speech.convert(
         text=text,
         voice_id=voice_id or ELEVENLABS_VOICE_ID,
         model_id=TTS_MODEL,
-        output_format="mp3_44100_128",
+        output_format=TTS_OUTPUT_FORMAT,
+        **_context(previous_text, next_text),
     )
     return b"".join(audio_iter)
+
+
+async def asynthesize(
+    text: str, voice_id: str | None = None, previous_text: str | None = None, next_text: str | None = None
+) -> bytes:
+    """Async variant of synthesize()."""
+    client = _get_async_client()
+    audio_iter = client.text_to_speech.convert(
+        text=text,
+        voice_id=voice_id or ELEVENLABS_VOICE_ID,
+        model_id=TTS_MODEL,
+        output_format=TTS_OUTPUT_FORMAT,
+        **_context(previous_text, next_text),
+    )
+    return b"".join([chunk async for chunk in audio_iter])
+
+
+def _neighbours(pieces: list[str], index: int) -> tuple[str | None, str | None]:
+    previous_text = pieces[index - 1] if index > 0 else None
+    next_text = pieces[index + 1] if index + 1 < len(pieces) else None
+    return previous_text, next_text
+
+
+def synthesize_chunked(
+    text: str,
+    voice_id: str | None = None,
+    max_chars: int = TTS_CHUNK_CHARS,
+    concurrency: int = TTS_CHUNK_CONCURRENCY,
+) -> bytes:
+    """synthesize() for long texts: pieces of ``max_chars`` synthesized in parallel.
+
+    The text is cut at sentence boundaries into pieces of similar length,
+    each piece is synthesized with its neighbours as context, and the MP3
+    frames of all pieces are joined into one file. Texts up to ``max_chars``
+    (or any text if it is 0) take a single request.
+    """
+    pieces = split_text(text, max_chars)
+    if len(pieces) <= 1:
+        return synthesize(text, voice_id)
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        parts = list(
+            pool.map(lambda i: synthesize(pieces[i], voice_id, *_neighbours(pieces, i)), range(len(pieces)))
+        )
+    return mp3.concat(parts)
+
+
+async def asynthesize_chunked(
+    text: str,
+    voice_id: str | None = None,
+    max_chars: int = TTS_CHUNK_CHARS,
+    concurrency: int = TTS_CHUNK_CONCURRENCY,
+) -> bytes:
+    """Async variant of synthesize_chunked()."""
+    pieces = split_text(text, max_chars)
+    if len(pieces) <= 1:
+        return await asynthesize(text, voice_id)
+    slots = asyncio.Semaphore(max(1, concurrency))
+
+    async def piece(index: int) -> bytes:
+        async with slots:
+            return await asynthesize(pieces[index], voice_id, *_neighbours(pieces, index))
+
+    parts = await asyncio.gather(*(piece(i) for i in range(len(pieces))))
+    return mp3.concat(parts)
+
+
+async def astream(text: str, previous_text: str | None = None, voice_id: str | None = None) -> AsyncIterator[bytes]:
+    """Yield MP3 chunks of ``text`` as they are synthesized.
+
+    ``previous_text`` is the narration spoken just before, so that intonation
+    carries over when a text is synthesized piece by piece.
+    """
+    client = _get_async_client()
+    async for chunk in client.text_to_speech.stream(
+        voice_id or ELEVENLABS_VOICE_ID,
+        text=text,
+        model_id=TTS_MODEL,
+        output_format=TTS_OUTPUT_FORMAT,
+        **_context(previous_text, None),
+    ):
+        yield chunk
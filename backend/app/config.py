@@ -13,6 +13,42 @@ class Settings(BaseSettings):
     # Minimum distance (metres) the user must move before we fetch new data
     min_move_threshold_m: float = 50
 
+    # Cap (metres) for the safe-move hint: how far past the search radius we
+    # look for the next POI before declaring the area empty
+    max_safe_radius_m: float = 1000
+
+    # Geofence trigger radius (metres) for POIs without an importance score;
+    # important POIs scale linearly up to the max radius.
+    geofence_radius_m: float = 40
+    geofence_max_radius_m: float = 120
+
+    # A POI is only left once the user is this many times its radius away
+    geofence_exit_factor: float = 1.5
+
+    # Seconds the user must stay inside a geofence before it triggers
+    geofence_dwell_s: float = 5
+
+    # Seconds before the in-process spatial index is reloaded from MongoDB
+    spatial_index_ttl_s: float = 600
+
+    # Seconds between checks for a new POI generation written by the importer
+    generation_check_s: float = 10
+
+    # Context given to the LLM when a POI's narration is generated on request
+    narration_location: str = "Stockholm, Sweden"
+    narration_interest: str = "history and culture"
+
+    # POIs without audio are narrated on request by this many concurrent
+    # generations; further requests beyond the pending limit get a 503
+    narration_workers: int = 2
+    narration_max_pending: int = 100
+
+    # Seconds an audio request waits for its narration before answering 202
+    narration_wait_s: float = 30
+
+    # Content-addressed store of generated narrations
+    narration_cache_dir: str = "narration_cache"
+
     # MongoDB connection
     mongo_url: str = "mongodb://localhost:27017"
     mongo_db: str = "guidio"
@@ -14,7 +14,7 @@ def get_db() -> AsyncIOMotorDatabase:
 
 
 async def connect() -> None:
-    """Open the MongoDB connection and ensure the 2dsphere index exists."""
+    """Open the MongoDB connection and ensure the geo indexes exist."""
     global _client
     _client = AsyncIOMotorClient(settings.mongo_url)
 
@@ -22,6 +22,11 @@ async def connect() -> None:
     db = _client[settings.mongo_db]
     await db.pois.create_index([("location", "2dsphere")])
 
+    # Serves nearby queries filtered by category / importance in one index scan
+    await db.pois.create_index(
+        [("location", "2dsphere"), ("categories", 1), ("importance", 1)]
+    )
+
 
 async def close() -> None:
     """Close the MongoDB connection."""
@@ -9,6 +9,7 @@ from fastapi.middleware.cors import CORSMiddleware
 from app import db
 from app.config import settings
 from app.routes import locations
+from app.services.narration import close_narration_queue
 
 logging.basicConfig(
     level=logging.INFO,
@@ -24,6 +25,7 @@ async def lifespan(application: FastAPI):
     """Connect to MongoDB on startup, disconnect on shutdown."""
     await db.connect()
     yield
+    await close_narration_queue()
     await db.close()
 
 
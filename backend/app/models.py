@@ -1,7 +1,43 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 
 
-class LocationRequest(BaseModel):
+class PoiFilter(BaseModel):
+    """Optional interest filters applied to POI queries."""
+
+    include_categories: list[str] | None = Field(
+        None, description="Only return POIs with at least one of these categories"
+    )
+    exclude_categories: list[str] | None = Field(
+        None, description="Never return POIs with any of these categories"
+    )
+    min_importance: float | None = Field(
+        None, ge=0, le=1, description="Only return POIs at least this important (0–1)"
+    )
+
+    @field_validator("include_categories", "exclude_categories")
+    @classmethod
+    def _normalize_categories(cls, value: list[str] | None) -> list[str] | None:
+        if value is None:
+            return None
+        normalized = [c.strip().lower() for c in value if c.strip()]
+        return normalized or None
+
+    @property
+    def is_empty(self) -> bool:
+        return not (self.include_categories or self.exclude_categories or self.min_importance is not None)
+
+    def matches(self, categories: list[str] | tuple[str, ...], importance: float | None) -> bool:
+        """Return whether a POI with these attributes passes the filter."""
+        if self.include_categories and not any(c in self.include_categories for c in categories):
+            return False
+        if self.exclude_categories and any(c in self.exclude_categories for c in categories):
+            return False
+        if self.min_importance is not None and (importance is None or importance < self.min_importance):
+            return False
+        return True
+
+
+class LocationRequest(PoiFilter):
     """Incoming request with the user's current position."""
 
     latitude: float = Field(..., ge=-90, le=90, description="User latitude")
@@ -18,6 +54,7 @@ class PointOfInterest(BaseModel):
     longitude: float
     categories: list[str] = []
     image_url: str | None = None
+    thumbnail_url: str | None = None
     summary: str | None = None
 
 
@@ -27,6 +64,49 @@ class LocationResponse(BaseModel):
     latitude: float
     longitude: float
     points_of_interest: list[PointOfInterest]
+    safe_radius_m: float | None = Field(
+        None,
+        description="Distance the user can move before any POI not in this response could come into range",
+    )
+
+
+class LocationStreamUpdate(BaseModel):
+    """POI changes pushed over the location WebSocket stream."""
+
+    type: str = "pois"
+    latitude: float
+    longitude: float
+    added: list[PointOfInterest] = []
+    removed: list[str] = []
+
+
+class RoutePoint(BaseModel):
+    """A single vertex of a planned route."""
+
+    latitude: float = Field(..., ge=-90, le=90)
+    longitude: float = Field(..., ge=-180, le=180)
+
+
+class RouteRequest(PoiFilter):
+    """A planned walking route and the corridor width to search around it."""
+
+    points: list[RoutePoint] = Field(..., min_length=1, max_length=500, description="Route polyline")
+    corridor_m: float = Field(50, gt=0, le=1000, description="Max distance (metres) from the route")
+
+
+class RoutePointOfInterest(PointOfInterest):
+    """A POI along a route, with its position relative to the route."""
+
+    distance_along_m: float
+    lateral_offset_m: float
+
+
+class RouteResponse(BaseModel):
+    """POIs within the route corridor, ordered by position along the route."""
+
+    length_m: float
+    corridor_m: float
+    points_of_interest: list[RoutePointOfInterest]
 
 
 class CategoryLocationsResponse(BaseModel):
@@ -44,3 +124,19 @@ class PoiDetail(BaseModel):
     text: str | None = None
     text_audio: str | None = None
     audio_file: str | None = None
+
+
+class GeofenceEvent(BaseModel):
+    """A geofence the user has entered and dwelled in – play it now."""
+
+    type: str = "play"
+    distance_m: float
+    poi: PoiDetail
+
+
+class GeofenceResponse(BaseModel):
+    """Geofence events triggered by a single location fix."""
+
+    latitude: float
+    longitude: float
+    events: list[GeofenceEvent]
@@ -1,22 +1,42 @@
+import asyncio
 import logging
+from dataclasses import dataclass, field
 from pathlib import Path as FilePath
 
-from fastapi import APIRouter, HTTPException, Path, Response
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, HTTPException, Path, Query, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import FileResponse, StreamingResponse
+from pydantic import ValidationError
 
 from app.config import settings
 from app.models import (
     CategoryLocationsResponse,
+    GeofenceEvent,
+    GeofenceResponse,
     LocationRequest,
     LocationResponse,
+    LocationStreamUpdate,
     PoiDetail,
+    PoiFilter,
+    PointOfInterest,
+    RoutePointOfInterest,
+    RouteRequest,
+    RouteResponse,
 )
 from app.services.database import (
     fetch_poi_detail,
     fetch_pois_by_category,
-    fetch_pois_from_db,
+    fetch_nearby_pois,
+    fetch_pois_in_polygons,
 )
-from app.utils import haversine_m
+from app.services.geofence import GeofenceSession
+from app.services.narration import (
+    NarrationQueueFull,
+    fetch_narration_input,
+    get_narration_queue,
+    open_audio_stream,
+)
+from app.services.spatial import data_version, get_index
+from app.utils import corridor_polygons, haversine_m, locate_on_polyline, polyline_length_m
 
 log = logging.getLogger(__name__)
 
@@ -26,10 +46,67 @@ router = APIRouter(prefix="/locations", tags=["locations"])
 # For a hackathon this is fine; in production you'd use Redis or similar.
 _last_positions: dict[str, tuple[float, float]] = {}
 
+# Safe-move radius computed at the last position, per session.
+_safe_radii: dict[str, float] = {}
+
+# POI data version the two caches above were computed under.
+_data_versions: dict[str, int] = {}
+
+# Interest filter the two caches above were computed under.
+_filters: dict[str, dict] = {}
+
+# Geofence state per session, same single-user caveat as above.
+_geofence_sessions: dict[str, GeofenceSession] = {}
+
 # Default session key (single-user for now; swap for a real session/user id later)
 _DEFAULT_SESSION = "default"
 
 
+@dataclass
+class _StreamSession:
+    """Per-connection state for the WebSocket location stream."""
+
+    last_position: tuple[float, float] | None = None
+    safe_radius_m: float = 0.0
+    data_version: int = 0
+    poi_filter: dict | None = None
+    sent: dict[str, PointOfInterest] = field(default_factory=dict)
+    geofences: GeofenceSession = field(default_factory=GeofenceSession)
+
+
+def _filter_of(req: LocationRequest) -> dict:
+    """The request's interest filter, comparable across requests."""
+    return req.model_dump(include=set(PoiFilter.model_fields))
+
+
+def _move_threshold_m(safe_radius_m: float) -> float:
+    """Distance the user must move before a new fetch can return anything new."""
+    return max(settings.min_move_threshold_m, safe_radius_m)
+
+
+def _diff_pois(
+    sent: dict[str, PointOfInterest], pois: list[PointOfInterest]
+) -> tuple[list[PointOfInterest], list[str]]:
+    """Return (added, removed) between the POIs already sent and the current result."""
+    current = {poi.entity_id: poi for poi in pois}
+    added = [poi for entity_id, poi in current.items() if entity_id not in sent]
+    removed = [entity_id for entity_id in sent if entity_id not in current]
+    return added, removed
+
+
+async def _evaluate_geofences(
+    geofences: GeofenceSession, lat: float, lon: float, poi_filter: PoiFilter | None = None
+) -> list[GeofenceEvent]:
+    """Run one fix through the geofence engine and load details for the hits."""
+    index = await get_index()
+    events: list[GeofenceEvent] = []
+    for hit in geofences.evaluate(index, lat, lon, poi_filter=poi_filter):
+        detail = await fetch_poi_detail(hit.entity_id)
+        if detail is not None:
+            events.append(GeofenceEvent(distance_m=round(hit.distance_m, 1), poi=detail))
+    return events
+
+
 @router.post(
     "/update",
     response_model=LocationResponse,
@@ -40,21 +117,31 @@ async def update_location(req: LocationRequest) -> LocationResponse | Response:
 
     • If the user hasn't moved significantly → **204 No Content** (nothing to do).
     • Otherwise → query the POI database and return new points of interest.
+
+    "Significantly" is the larger of ``min_move_threshold_m`` and the safe
+    radius returned last time, so sparse areas are re-queried less often.
     """
     log.info("POST /update  lat=%.6f lon=%.6f force=%s", req.latitude, req.longitude, req.force)
     session = _DEFAULT_SESSION
-    last = _last_positions.get(session)
+    version = await data_version()
+    poi_filter = _filter_of(req)
+    # A newly imported POI generation or a changed filter invalidates the safe radius.
+    fresh = _data_versions.get(session) == version and _filters.get(session) == poi_filter
+    last = _last_positions.get(session) if fresh else None
 
     # Check whether the user has moved enough to warrant a new fetch
     if not req.force and last is not None:
         distance = haversine_m(last[0], last[1], req.latitude, req.longitude)
-        if distance < settings.min_move_threshold_m:
-            log.info("  → 204 (moved %.1f m, threshold %.1f m)", distance, settings.min_move_threshold_m)
+        threshold = _move_threshold_m(_safe_radii.get(session, 0.0))
+        if distance < threshold:
+            log.info("  → 204 (moved %.1f m, threshold %.1f m)", distance, threshold)
             return Response(status_code=204)
 
     # Location changed (or first request) – fetch from internal DB
     try:
-        pois = await fetch_pois_from_db(req.latitude, req.longitude)
+        pois, safe_radius_m = await fetch_nearby_pois(
+            req.latitude, req.longitude, poi_filter=req
+        )
     except Exception as exc:
         log.error("  → 502 DB error: %s", exc)
         raise HTTPException(
@@ -63,15 +150,162 @@ async def update_location(req: LocationRequest) -> LocationResponse | Response:
 
     # Remember this position
     _last_positions[session] = (req.latitude, req.longitude)
+    _safe_radii[session] = safe_radius_m
+    _data_versions[session] = version
+    _filters[session] = poi_filter
 
-    log.info("  → 200 returning %d POIs", len(pois))
+    log.info("  → 200 returning %d POIs (safe radius %.0f m)", len(pois), safe_radius_m)
     return LocationResponse(
         latitude=req.latitude,
         longitude=req.longitude,
         points_of_interest=pois,
+        safe_radius_m=round(safe_radius_m, 1),
     )
 
 
+@router.post("/geofence", response_model=GeofenceResponse)
+async def evaluate_geofences(req: LocationRequest) -> GeofenceResponse:
+    """Evaluate the user's position against nearby POI geofences.
+
+    Returns a "play" event with the POI detail for every geofence the user has
+    entered and stayed in for the dwell time. Each geofence fires once per entry.
+    """
+    log.info("POST /geofence  lat=%.6f lon=%.6f", req.latitude, req.longitude)
+    geofences = _geofence_sessions.setdefault(_DEFAULT_SESSION, GeofenceSession())
+    try:
+        events = await _evaluate_geofences(geofences, req.latitude, req.longitude, req)
+    except Exception as exc:
+        log.error("  → 502 DB error: %s", exc)
+        raise HTTPException(
+            status_code=502, detail=f"Database service error: {exc}"
+        ) from exc
+
+    log.info("  → 200 %d geofence events", len(events))
+    return GeofenceResponse(latitude=req.latitude, longitude=req.longitude, events=events)
+
+
+@router.post("/route", response_model=RouteResponse)
+async def get_pois_along_route(req: RouteRequest) -> RouteResponse:
+    """Return every POI within ``corridor_m`` of a planned route.
+
+    The corridor is searched with a single database query, and results are
+    ordered by how far along the route they are, so the client can prefetch
+    detail and audio for the whole walk in one request.
+    """
+    polyline = [(p.latitude, p.longitude) for p in req.points]
+    log.info("POST /route  %d points, corridor %.0f m", len(polyline), req.corridor_m)
+
+    try:
+        candidates = await fetch_pois_in_polygons(
+            corridor_polygons(polyline, req.corridor_m), poi_filter=req
+        )
+    except Exception as exc:
+        log.error("  → 502 DB error: %s", exc)
+        raise HTTPException(
+            status_code=502, detail=f"Database service error: {exc}"
+        ) from exc
+
+    # The rectangles over-cover the corner joins; keep only true corridor hits.
+    pois: list[RoutePointOfInterest] = []
+    for poi in candidates:
+        along, offset = locate_on_polyline(polyline, poi.latitude, poi.longitude)
+        if offset <= req.corridor_m:
+            pois.append(
+                RoutePointOfInterest(
+                    **poi.model_dump(),
+                    distance_along_m=round(along, 1),
+                    lateral_offset_m=round(offset, 1),
+                )
+            )
+    pois.sort(key=lambda poi: (poi.distance_along_m, poi.lateral_offset_m))
+
+    log.info("  → 200 returning %d POIs along route", len(pois))
+    return RouteResponse(
+        length_m=round(polyline_length_m(polyline), 1),
+        corridor_m=req.corridor_m,
+        points_of_interest=pois,
+    )
+
+
+@router.websocket("/stream")
+async def stream_locations(websocket: WebSocket) -> None:
+    """Receive a stream of GPS fixes over one long-lived connection.
+
+    Each message is a JSON ``LocationRequest``. The server keeps the last
+    position and the POIs already sent for this connection, and only pushes a
+    ``LocationStreamUpdate`` when POIs were added or removed. Every fix is also
+    run through the geofence engine, which pushes a ``GeofenceEvent`` when a
+    POI should start playing.
+    """
+    await websocket.accept()
+    log.info("WS /stream  connected")
+    session = _StreamSession()
+
+    try:
+        while True:
+            raw = await websocket.receive_text()
+            try:
+                req = LocationRequest.model_validate_json(raw)
+            except ValidationError as exc:
+                await websocket.send_json({"type": "error", "detail": exc.errors(include_url=False)})
+                continue
+
+            # Dwell time depends on every fix, so geofences skip the move threshold.
+            try:
+                events = await _evaluate_geofences(
+                    session.geofences, req.latitude, req.longitude, req
+                )
+            except Exception as exc:
+                log.error("  WS geofence error: %s", exc)
+                events = []
+            for event in events:
+                await websocket.send_text(event.model_dump_json())
+
+            version = await data_version()
+            poi_filter = _filter_of(req)
+            if version != session.data_version or poi_filter != session.poi_filter:
+                session.data_version = version
+                session.poi_filter = poi_filter
+                session.last_position = None
+
+            # Removals inside the safe radius are reported on the next fetch.
+            last = session.last_position
+            if not req.force and last is not None:
+                distance = haversine_m(last[0], last[1], req.latitude, req.longitude)
+                if distance < _move_threshold_m(session.safe_radius_m):
+                    continue
+
+            try:
+                pois, session.safe_radius_m = await fetch_nearby_pois(
+                    req.latitude, req.longitude, poi_filter=req
+                )
+            except Exception as exc:
+                log.error("  WS DB error: %s", exc)
+                await websocket.send_json({"type": "error", "detail": f"Database service error: {exc}"})
+                continue
+
+            session.last_position = (req.latitude, req.longitude)
+            added, removed = _diff_pois(session.sent, pois)
+            if not added and not removed:
+                continue
+
+            for entity_id in removed:
+                del session.sent[entity_id]
+            for poi in added:
+                session.sent[poi.entity_id] = poi
+
+            log.info("  WS → +%d / -%d POIs", len(added), len(removed))
+            update = LocationStreamUpdate(
+                latitude=req.latitude,
+                longitude=req.longitude,
+                added=added,
+                removed=removed,
+            )
+            await websocket.send_text(update.model_dump_json())
+    except WebSocketDisconnect:
+        log.info("WS /stream  disconnected (%d POIs sent)", len(session.sent))
+
+
 @router.get("/detail/{entity_id}", response_model=PoiDetail)
 async def get_poi_detail(entity_id: str) -> PoiDetail:
     """Return the text and audio content for a single POI."""
@@ -85,21 +319,41 @@ async def get_poi_detail(entity_id: str) -> PoiDetail:
 
 
 @router.get("/audio/{entity_id}")
-async def get_poi_audio(entity_id: str) -> FileResponse:
-    """Stream the audio file for a single POI."""
+async def get_poi_audio(entity_id: str) -> Response:
+    """Stream the audio file for a single POI, narrating it first if it has none.
+
+    A missing narration is queued for generation; the request waits up to
+    ``narration_wait_s`` for it and otherwise answers ``202`` with a
+    ``Retry-After``, so the client can come back for the finished file.
+    """
     log.info("GET /audio/%s", entity_id)
     detail = await fetch_poi_detail(entity_id)
     if detail is None:
         log.warning("  → 404 POI not found")
         raise HTTPException(status_code=404, detail="POI not found")
-    if not detail.audio_file:
-        log.warning("  → 404 no audio_file field for this POI")
-        raise HTTPException(status_code=404, detail="No audio available for this POI")
 
-    audio_path = FilePath(detail.audio_file)
-    if not audio_path.is_file():
-        log.warning("  → 404 file missing on disk: %s", audio_path)
-        raise HTTPException(status_code=404, detail="Audio file not found on disk")
+    audio_path = FilePath(detail.audio_file) if detail.audio_file else None
+    if audio_path is None or not audio_path.is_file():
+        log.info("  no audio on disk (%s), narrating on demand", audio_path or "no audio_file field")
+        ctx = await fetch_narration_input(entity_id)
+        if ctx is None:
+            log.warning("  → 404 POI has no location to narrate")
+            raise HTTPException(status_code=404, detail="No audio available for this POI")
+        try:
+            task = get_narration_queue().submit(entity_id, ctx)
+        except NarrationQueueFull as exc:
+            log.warning("  → 503 %s", exc)
+            raise HTTPException(
+                status_code=503, detail="Narration queue is full", headers={"Retry-After": "30"}
+            ) from exc
+        try:
+            audio_path = await asyncio.wait_for(asyncio.shield(task), settings.narration_wait_s)
+        except TimeoutError:
+            log.info("  → 202 narration still being generated")
+            return Response(status_code=202, headers={"Retry-After": "5"})
+        except Exception as exc:
+            log.error("  → 502 narration failed: %s", exc)
+            raise HTTPException(status_code=502, detail="Narration could not be generated") from exc
 
     log.info("  → 200 serving %s (%.1f KB)", audio_path.name, audio_path.stat().st_size / 1024)
     return FileResponse(
@@ -109,6 +363,39 @@ async def get_poi_audio(entity_id: str) -> FileResponse:
     )
 
 
+@router.get("/audio/{entity_id}/stream")
+async def stream_poi_audio(
+    entity_id: str,
+    interest: str | None = Query(None, description="Client interest to narrate for"),
+) -> Response:
+    """Stream the audio for a single POI, narrating it live if none was pre-generated.
+
+    The MP3 is sent while the text is still being written and synthesized,
+    sentence by sentence, so playback can start after the first sentence.
+    """
+    log.info("GET /audio/%s/stream", entity_id)
+    detail = await fetch_poi_detail(entity_id)
+    if detail is None:
+        log.warning("  → 404 POI not found")
+        raise HTTPException(status_code=404, detail="POI not found")
+    if detail.audio_file and FilePath(detail.audio_file).is_file():
+        log.info("  → 200 serving pre-generated %s", FilePath(detail.audio_file).name)
+        return FileResponse(path=detail.audio_file, media_type="audio/mpeg", filename=f"{entity_id}.mp3")
+
+    ctx = await fetch_narration_input(entity_id, interest)
+    if ctx is None:
+        log.warning("  → 404 POI has no location to narrate")
+        raise HTTPException(status_code=404, detail="POI not found")
+    try:
+        audio = await open_audio_stream(ctx)
+    except Exception as exc:
+        log.error("  → 502 narration failed: %s", exc)
+        raise HTTPException(status_code=502, detail="Narration could not be generated") from exc
+
+    log.info("  → 200 streaming live narration of %r", ctx.title)
+    return StreamingResponse(audio, media_type="audio/mpeg")
+
+
 @router.get("/by-category/{category}", response_model=CategoryLocationsResponse)
 async def get_pois_by_category(
     category: str = Path(..., min_length=1, description="Category to filter by"),
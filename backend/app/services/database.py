@@ -5,16 +5,62 @@ from typing import Any, Mapping
 
 from app.config import settings
 from app.db import get_db
-from app.models import PoiDetail, PointOfInterest
+from app.models import PoiDetail, PoiFilter, PointOfInterest
+from app.utils import haversine_m
 
 
-async def fetch_pois_from_db(
-    lat: float, lon: float, radius_m: int | None = None
-) -> list[PointOfInterest]:
-    """Find POIs within *radius_m* metres of (lat, lon) using a 2dsphere query.
+def _poi_from_doc(doc: Mapping[str, Any]) -> PointOfInterest:
+    """Build a ``PointOfInterest`` from a ``pois`` document with a GeoJSON location."""
+    return PointOfInterest(
+        entity_id=doc["entity_id"],
+        title=doc.get("title", ""),
+        latitude=doc["location"]["coordinates"][1],
+        longitude=doc["location"]["coordinates"][0],
+        categories=doc.get("categories", []),
+        image_url=doc.get("image_url"),
+        thumbnail_url=doc.get("thumbnail_url"),
+        summary=doc.get("summary"),
+    )
 
-    Each document in the ``pois`` collection must have a GeoJSON ``location``
-    field (created by the seed script / teammate's ingestion pipeline).
+
+def _filter_query(poi_filter: PoiFilter | None) -> dict[str, Any]:
+    """Translate a ``PoiFilter`` into MongoDB query clauses.
+
+    The ``categories`` clause is served by the compound
+    ``location`` + ``categories`` index created in ``app.db.connect``.
+    """
+    if poi_filter is None:
+        return {}
+
+    query: dict[str, Any] = {}
+    categories: dict[str, Any] = {}
+    if poi_filter.include_categories:
+        categories["$in"] = poi_filter.include_categories
+    if poi_filter.exclude_categories:
+        categories["$nin"] = poi_filter.exclude_categories
+    if categories:
+        query["categories"] = categories
+    if poi_filter.min_importance is not None:
+        query["importance"] = {"$gte": poi_filter.min_importance}
+    return query
+
+
+async def fetch_nearby_pois(
+    lat: float,
+    lon: float,
+    radius_m: int | None = None,
+    poi_filter: PoiFilter | None = None,
+) -> tuple[list[PointOfInterest], float]:
+    """Find POIs within *radius_m* metres of (lat, lon) plus a safe-move radius.
+
+    The safe radius is how far the user can move before any POI outside the
+    result set could come within *radius_m*: the distance to the nearest POI
+    beyond the radius, minus the radius. Both come from one ``$nearSphere``
+    query, which returns documents nearest first, so we stop reading at the
+    first document outside the radius. If there is none within
+    ``max_safe_radius_m`` past the radius, that cap is returned. The optional
+    *poi_filter* is applied in the query, so the safe radius only considers
+    POIs the user is interested in.
     """
     radius_m = radius_m or settings.default_radius_m
     db = get_db()
@@ -27,28 +73,69 @@ async def fetch_pois_from_db(
                         "type": "Point",
                         "coordinates": [lon, lat],  # GeoJSON is [lng, lat]
                     },
-                    "$maxDistance": radius_m,
+                    "$maxDistance": radius_m + settings.max_safe_radius_m,
                 }
-            }
+            },
+            **_filter_query(poi_filter),
         }
     )
 
     pois: list[PointOfInterest] = []
+    safe_radius_m = settings.max_safe_radius_m
     async for doc in cursor:
-        pois.append(
-            PointOfInterest(
-                entity_id=doc["entity_id"],
-                title=doc.get("title", ""),
-                latitude=doc["location"]["coordinates"][1],
-                longitude=doc["location"]["coordinates"][0],
-                categories=doc.get("categories", []),
-                image_url=doc.get("image_url"),
-                summary=doc.get("summary"),
-            )
-        )
+        poi = _poi_from_doc(doc)
+        distance = haversine_m(lat, lon, poi.latitude, poi.longitude)
+        if distance > radius_m:
+            safe_radius_m = distance - radius_m
+            break
+        pois.append(poi)
+    await cursor.close()
+    return pois, safe_radius_m
+
+
+async def fetch_pois_from_db(
+    lat: float, lon: float, radius_m: int | None = None
+) -> list[PointOfInterest]:
+    """Find POIs within *radius_m* metres of (lat, lon) using a 2dsphere query.
+
+    Each document in the ``pois`` collection must have a GeoJSON ``location``
+    field (created by the seed script / teammate's ingestion pipeline).
+    """
+    pois, _ = await fetch_nearby_pois(lat, lon, radius_m)
     return pois
 
 
+async def fetch_pois_in_polygons(
+    polygons: list[list[list[float]]],
+    poi_filter: PoiFilter | None = None,
+) -> list[PointOfInterest]:
+    """Find POIs inside any of *polygons* (closed ``[lon, lat]`` rings) in one query.
+
+    Each ``$or`` branch is a ``$geoWithin`` served by the 2dsphere index; a POI
+    inside several overlapping polygons is only returned once.
+    """
+    db = get_db()
+    cursor = db.pois.find(
+        {
+            "$or": [
+                {"location": {"$geoWithin": {"$geometry": {"type": "Polygon", "coordinates": [ring]}}}}
+                for ring in polygons
+            ],
+            **_filter_query(poi_filter),
+        },
+        {
+            "entity_id": 1,
+            "title": 1,
+            "location": 1,
+            "categories": 1,
+            "image_url": 1,
+            "thumbnail_url": 1,
+            "summary": 1,
+        },
+    )
+    return [_poi_from_doc(doc) async for doc in cursor]
+
+
 async def fetch_poi_detail(entity_id: str) -> PoiDetail | None:
     """Fetch the text and audio fields for a single POI by entity_id."""
     db = get_db()
@@ -67,6 +154,24 @@ async def fetch_poi_detail(entity_id: str) -> PoiDetail | None:
     )
 
 
+async def fetch_poi_source(entity_id: str) -> dict[str, Any] | None:
+    """Fetch the fields a narration is written from for a single POI."""
+    db = get_db()
+    return await db.pois.find_one(
+        {"entity_id": entity_id},
+        {"_id": 0, "entity_id": 1, "title": 1, "summary": 1, "text": 1, "location": 1},
+    )
+
+
+async def save_poi_narration(entity_id: str, text_audio: str, audio_file: str) -> None:
+    """Record a narration generated for a POI."""
+    db = get_db()
+    await db.pois.update_one(
+        {"entity_id": entity_id},
+        {"$set": {"text_audio": text_audio, "audio_file": audio_file}},
+    )
+
+
 def _text_relevance_score(doc: Mapping[str, Any]) -> int:
     """Rank POIs by amount of textual content (text, fallback to summary)."""
     text = doc.get("text")
@@ -101,6 +206,7 @@ async def fetch_pois_by_category(
             "location": 1,
             "categories": 1,
             "image_url": 1,
+            "thumbnail_url": 1,
             "text": 1,
             "summary": 1,
         },
@@ -155,6 +261,7 @@ async def fetch_pois_by_category(
                 longitude=float(coordinates[0]),
                 categories=categories,
                 image_url=doc.get("image_url"),
+                thumbnail_url=doc.get("thumbnail_url"),
             )
         )
 
@@ -0,0 +1,81 @@
+"""Server-side geofence triggers with enter/exit hysteresis and dwell time."""
+
+import time
+from dataclasses import dataclass
+
+from app.config import settings
+from app.models import PoiFilter
+from app.services.spatial import GridIndex
+
+
+def trigger_radius_m(importance: float | None) -> float:
+    """Return the geofence radius for a POI, scaled by its 0–1 importance."""
+    if importance is None:
+        return settings.geofence_radius_m
+    importance = min(max(importance, 0.0), 1.0)
+    span = settings.geofence_max_radius_m - settings.geofence_radius_m
+    return settings.geofence_radius_m + span * importance
+
+
+@dataclass
+class _FenceState:
+    entered_at: float
+    fired: bool = False
+
+
+@dataclass(frozen=True)
+class GeofenceHit:
+    """A geofence that should start playing now."""
+
+    entity_id: str
+    distance_m: float
+
+
+class GeofenceSession:
+    """Tracks which geofences one user is inside and decides when they fire.
+
+    A POI is *entered* when the user comes within its trigger radius and only
+    *exited* once they are ``geofence_exit_factor`` times that radius away, so
+    GPS jitter around the boundary does not re-trigger it. An entered POI fires
+    once, after the user has stayed inside it for ``geofence_dwell_s`` seconds.
+    """
+
+    def __init__(self) -> None:
+        self._inside: dict[str, _FenceState] = {}
+
+    def evaluate(
+        self,
+        index: GridIndex,
+        lat: float,
+        lon: float,
+        now: float | None = None,
+        poi_filter: PoiFilter | None = None,
+    ) -> list[GeofenceHit]:
+        """Update state for a new fix and return the geofences that fire, nearest first.
+
+        POIs rejected by *poi_filter* are treated as if they did not exist.
+        """
+        now = time.monotonic() if now is None else now
+        exit_factor = settings.geofence_exit_factor
+        search_radius = max(settings.geofence_radius_m, settings.geofence_max_radius_m) * exit_factor
+
+        hits: list[GeofenceHit] = []
+        still_inside: dict[str, _FenceState] = {}
+        for poi, distance in index.query(lat, lon, search_radius, poi_filter):
+            radius = trigger_radius_m(poi.importance)
+            state = self._inside.get(poi.entity_id)
+            if state is None:
+                if distance > radius:
+                    continue
+                state = _FenceState(entered_at=now)
+            elif distance > radius * exit_factor:
+                continue
+
+            still_inside[poi.entity_id] = state
+            if not state.fired and now - state.entered_at >= settings.geofence_dwell_s:
+                state.fired = True
+                hits.append(GeofenceHit(entity_id=poi.entity_id, distance_m=distance))
+
+        # Anything not seen within the search radius has been exited.
+        self._inside = still_inside
+        return hits
@@ -0,0 +1,147 @@
+"""Narrate POIs that have no pre-generated audio, on request."""
+
+import asyncio
+import logging
+from collections.abc import AsyncIterator
+from pathlib import Path
+from typing import Any, Mapping
+
+from ai import Information, adescribe, astream_describe
+from ai.services.cache import NarrationCache, narration_key
+
+from app.config import settings
+from app.services.database import fetch_poi_source, save_poi_narration
+
+log = logging.getLogger(__name__)
+
+
+def narration_input(doc: Mapping[str, Any], interest: str | None = None) -> Information:
+    """Build the LLM input for a ``pois`` document with a GeoJSON location."""
+    longitude, latitude = doc["location"]["coordinates"][:2]
+    return Information(
+        title=doc.get("title") or "",
+        latitude=latitude,
+        longitude=longitude,
+        summary=doc.get("summary") or "",
+        text=doc.get("text") or "",
+        location=settings.narration_location,
+        interest=interest or settings.narration_interest,
+    )
+
+
+async def fetch_narration_input(entity_id: str, interest: str | None = None) -> Information | None:
+    doc = await fetch_poi_source(entity_id)
+    if doc is None or not doc.get("location"):
+        return None
+    return narration_input(doc, interest)
+
+
+async def open_audio_stream(ctx: Information) -> AsyncIterator[bytes]:
+    """Start narrating ``ctx`` and return the MP3 stream.
+
+    The first chunk is awaited here, so a provider failure is raised before
+    the caller has sent a response status.
+    """
+    stream = astream_describe(ctx)
+    try:
+        first = await anext(stream)
+    except BaseException:
+        await stream.aclose()
+        raise
+
+    async def audio() -> AsyncIterator[bytes]:
+        try:
+            yield first
+            async for chunk in stream:
+                yield chunk
+        finally:
+            await stream.aclose()
+
+    return audio()
+
+
+class NarrationQueueFull(Exception):
+    """Too many narrations are already waiting to be generated."""
+
+
+class NarrationQueue:
+    """Generates narrations in the background, at most ``workers`` at a time.
+
+    Concurrent requests for the same POI share one generation. Results are
+    looked up in and written to the content-addressed ``cache`` first, and the
+    POI's ``text_audio`` / ``audio_file`` are updated once the audio exists.
+    """
+
+    def __init__(self, cache: NarrationCache, workers: int = 2, max_pending: int = 100):
+        self.cache = cache
+        self.max_pending = max_pending
+        self._slots = asyncio.Semaphore(max(1, workers))
+        self._in_flight: dict[str, asyncio.Task[Path]] = {}
+        self.generated = 0
+        self.cache_hits = 0
+
+    @property
+    def pending(self) -> int:
+        return len(self._in_flight)
+
+    def submit(self, entity_id: str, ctx: Information) -> "asyncio.Task[Path]":
+        """The task producing the POI's audio file, started if none is running."""
+        task = self._in_flight.get(entity_id)
+        if task is not None:
+            return task
+        if len(self._in_flight) >= self.max_pending:
+            raise NarrationQueueFull(f"{len(self._in_flight)} narrations pending")
+        task = asyncio.create_task(self._narrate(entity_id, ctx))
+        self._in_flight[entity_id] = task
+        task.add_done_callback(lambda _: self._in_flight.pop(entity_id, None))
+        return task
+
+    async def _narrate(self, entity_id: str, ctx: Information) -> Path:
+        # Logged here because a caller that got a 202 never awaits the result.
+        try:
+            # Both reduce the article text and read the disk; keep them off the event loop.
+            key = await asyncio.to_thread(narration_key, ctx)
+            cached = await asyncio.to_thread(self.cache.get, key)
+            if cached is not None:
+                self.cache_hits += 1
+                text, audio_path = cached
+            else:
+                async with self._slots:
+                    log.info("Narrating %s (%r)", entity_id, ctx.title)
+                    narration = await adescribe(ctx)
+                audio_path = await asyncio.to_thread(self.cache.put, key, narration)
+                text = narration.text
+                self.generated += 1
+            await save_poi_narration(entity_id, text, str(audio_path))
+            return audio_path
+        except Exception:
+            log.exception("Narration of %s failed", entity_id)
+            raise
+
+    async def close(self) -> None:
+        """Cancel the narrations still running."""
+        tasks = list(self._in_flight.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+_queue: NarrationQueue | None = None
+
+
+def get_narration_queue() -> NarrationQueue:
+    global _queue
+    if _queue is None:
+        _queue = NarrationQueue(
+            NarrationCache(Path(settings.narration_cache_dir)),
+            workers=settings.narration_workers,
+            max_pending=settings.narration_max_pending,
+        )
+    return _queue
+
+
+async def close_narration_queue() -> None:
+    global _queue
+    if _queue is not None:
+        await _queue.close()
+        _queue = None
@@ -0,0 +1,179 @@
+"""In-process grid index over all POI coordinates.
+
+Geofence evaluation runs on every GPS fix, so instead of a MongoDB round trip
+per fix we keep a light copy of every POI (id, position, importance,
+categories) bucketed into fixed-size lat/lon cells. A radius query only looks
+at the cells overlapping the search box and computes distances for the
+candidates in one tight pass with an equirectangular projection, which is
+accurate to well under a metre at geofence scale.
+
+The index is reloaded after ``spatial_index_ttl_s`` or as soon as
+``scripts/import_parsed.py`` records a new POI generation, which is polled at
+most every ``generation_check_s``.
+"""
+
+import asyncio
+import logging
+import math
+import time
+from dataclasses import dataclass
+from typing import Iterable
+
+from app.config import settings
+from app.db import get_db
+from app.models import PoiFilter
+
+log = logging.getLogger(__name__)
+
+# Written by scripts/import_parsed.py after every import or swap.
+GENERATION_COLLECTION = "pois_generation"
+
+_METRES_PER_DEG_LAT = 111_320.0
+
+
+@dataclass(frozen=True, slots=True)
+class IndexedPoi:
+    """Minimal POI record kept in memory for spatial queries."""
+
+    entity_id: str
+    latitude: float
+    longitude: float
+    importance: float | None = None
+    categories: tuple[str, ...] = ()
+
+
+class GridIndex:
+    """Uniform lat/lon grid of POIs supporting radius queries."""
+
+    def __init__(self, pois: Iterable[IndexedPoi], cell_deg: float = 0.005):
+        self.cell_deg = cell_deg
+        self._cells: dict[tuple[int, int], list[IndexedPoi]] = {}
+        self._size = 0
+        for poi in pois:
+            self._cells.setdefault(self._cell(poi.latitude, poi.longitude), []).append(poi)
+            self._size += 1
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _cell(self, lat: float, lon: float) -> tuple[int, int]:
+        return math.floor(lat / self.cell_deg), math.floor(lon / self.cell_deg)
+
+    def query(
+        self, lat: float, lon: float, radius_m: float, poi_filter: PoiFilter | None = None
+    ) -> list[tuple[IndexedPoi, float]]:
+        """Return ``(poi, distance_m)`` for every POI within *radius_m*, nearest first.
+
+        POIs rejected by *poi_filter* are skipped before computing distances.
+        """
+        if poi_filter is not None and poi_filter.is_empty:
+            poi_filter = None
+        cos_lat = max(math.cos(math.radians(lat)), 1e-6)
+        dlat = radius_m / _METRES_PER_DEG_LAT
+        dlon = radius_m / (_METRES_PER_DEG_LAT * cos_lat)
+        row_min, col_min = self._cell(lat - dlat, lon - dlon)
+        row_max, col_max = self._cell(lat + dlat, lon + dlon)
+
+        kx = _METRES_PER_DEG_LAT * cos_lat
+        ky = _METRES_PER_DEG_LAT
+        limit_sq = radius_m * radius_m
+        hits: list[tuple[IndexedPoi, float]] = []
+        for row in range(row_min, row_max + 1):
+            for col in range(col_min, col_max + 1):
+                bucket = self._cells.get((row, col))
+                if not bucket:
+                    continue
+                for poi in bucket:
+                    if poi_filter is not None and not poi_filter.matches(poi.categories, poi.importance):
+                        continue
+                    dx = (poi.longitude - lon) * kx
+                    dy = (poi.latitude - lat) * ky
+                    d_sq = dx * dx + dy * dy
+                    if d_sq <= limit_sq:
+                        hits.append((poi, math.sqrt(d_sq)))
+
+        hits.sort(key=lambda hit: hit[1])
+        return hits
+
+
+async def _load_pois() -> list[IndexedPoi]:
+    """Read the fields needed for spatial queries from every POI document."""
+    cursor = get_db().pois.find(
+        {"location.coordinates.1": {"$type": "number"}},
+        {"entity_id": 1, "location": 1, "importance": 1, "categories": 1},
+    )
+    pois: list[IndexedPoi] = []
+    async for doc in cursor:
+        lon, lat = doc["location"]["coordinates"][:2]
+        categories = doc.get("categories") or []
+        pois.append(
+            IndexedPoi(
+                entity_id=doc["entity_id"],
+                latitude=float(lat),
+                longitude=float(lon),
+                importance=doc.get("importance"),
+                categories=tuple(c for c in categories if isinstance(c, str)),
+            )
+        )
+    return pois
+
+
+_index: GridIndex | None = None
+_loaded_at = 0.0
+_lock = asyncio.Lock()
+
+_UNKNOWN = object()
+_generation: object = _UNKNOWN
+_checked_at = -math.inf
+_data_version = 0
+
+
+async def data_version() -> int:
+    """Number of new POI generations seen since startup.
+
+    Callers that cache anything derived from the POIs (safe radii, last
+    positions) compare it with the version they cached under. The first call
+    after a change also drops the shared index.
+    """
+    global _generation, _checked_at, _data_version
+    now = time.monotonic()
+    if now - _checked_at < settings.generation_check_s:
+        return _data_version
+    _checked_at = now
+    try:
+        state = await get_db()[GENERATION_COLLECTION].find_one({"_id": "pois"}, {"generation": 1})
+    except Exception as exc:
+        log.warning("Could not read the POI generation: %s", exc)
+        return _data_version
+    generation = state.get("generation") if state else None
+    if generation != _generation:
+        if _generation is not _UNKNOWN:
+            log.info("POI generation changed to %s; dropping cached POI data", generation)
+            _data_version += 1
+            invalidate_index()
+        _generation = generation
+    return _data_version
+
+
+async def get_index() -> GridIndex:
+    """Return the shared POI index, (re)loading it from MongoDB when stale."""
+    global _index, _loaded_at
+    await data_version()
+    async with _lock:
+        age = time.monotonic() - _loaded_at
+        if _index is None or age > settings.spatial_index_ttl_s:
+            started = time.perf_counter()
+            _index = GridIndex(await _load_pois())
+            _loaded_at = time.monotonic()
+            log.info(
+                "Loaded %d POIs into spatial index (%.0f ms)",
+                len(_index),
+                (time.perf_counter() - started) * 1000,
+            )
+        return _index
+
+
+def invalidate_index() -> None:
+    """Drop the shared index so the next query reloads it."""
+    global _index
+    _index = None
@@ -12,3 +12,86 @@ def haversine_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
 
     a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlam / 2) ** 2
     return R * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+
+_METRES_PER_DEG_LAT = 111_320.0
+
+
+def _local_projection(ref_lat: float):
+    """Return a function mapping (lat, lon) to planar metres around *ref_lat*."""
+    kx = _METRES_PER_DEG_LAT * math.cos(math.radians(ref_lat))
+    ky = _METRES_PER_DEG_LAT
+    return lambda lat, lon: (lon * kx, lat * ky)
+
+
+def locate_on_polyline(
+    polyline: list[tuple[float, float]], lat: float, lon: float
+) -> tuple[float, float]:
+    """Return ``(distance_along_m, lateral_offset_m)`` of a point relative to a polyline.
+
+    *polyline* is a list of ``(lat, lon)`` vertices. The point is snapped to the
+    closest segment; distance along is measured from the first vertex. Uses an
+    equirectangular projection, which is accurate enough for walking routes.
+    """
+    project = _local_projection(sum(p[0] for p in polyline) / len(polyline))
+    px, py = project(lat, lon)
+    vertices = [project(v_lat, v_lon) for v_lat, v_lon in polyline]
+    if len(vertices) == 1:
+        return 0.0, math.hypot(px - vertices[0][0], py - vertices[0][1])
+
+    best_along, best_offset = 0.0, math.inf
+    travelled = 0.0
+    for (ax, ay), (bx, by) in zip(vertices, vertices[1:]):
+        dx, dy = bx - ax, by - ay
+        seg_len_sq = dx * dx + dy * dy
+        t = 0.0 if seg_len_sq == 0 else ((px - ax) * dx + (py - ay) * dy) / seg_len_sq
+        t = min(max(t, 0.0), 1.0)
+        offset = math.hypot(px - (ax + t * dx), py - (ay + t * dy))
+        seg_len = math.sqrt(seg_len_sq)
+        if offset < best_offset:
+            best_along, best_offset = travelled + t * seg_len, offset
+        travelled += seg_len
+    return best_along, best_offset
+
+
+def polyline_length_m(polyline: list[tuple[float, float]]) -> float:
+    """Return the length in metres of a ``(lat, lon)`` polyline."""
+    return sum(
+        haversine_m(a[0], a[1], b[0], b[1]) for a, b in zip(polyline, polyline[1:])
+    )
+
+
+def corridor_polygons(
+    polyline: list[tuple[float, float]], width_m: float
+) -> list[list[list[float]]]:
+    """Cover the corridor within *width_m* of a polyline with GeoJSON rectangles.
+
+    Each segment becomes a rectangle extended by *width_m* on every side, so
+    together they cover the full buffer including the rounded joins. Returns
+    closed ``[lon, lat]`` rings, one per segment.
+    """
+    ref_lat = sum(p[0] for p in polyline) / len(polyline)
+    kx = _METRES_PER_DEG_LAT * math.cos(math.radians(ref_lat))
+    ky = _METRES_PER_DEG_LAT
+    segments = list(zip(polyline, polyline[1:])) or [(polyline[0], polyline[0])]
+
+    rings: list[list[list[float]]] = []
+    for (a_lat, a_lon), (b_lat, b_lon) in segments:
+        dx, dy = (b_lon - a_lon) * kx, (b_lat - a_lat) * ky
+        length = math.hypot(dx, dy)
+        # Unit vectors along and across the segment (metres).
+        ux, uy = (dx / length, dy / length) if length else (1.0, 0.0)
+        nx, ny = -uy, ux
+        corners = [
+            (-width_m, -width_m),
+            (length + width_m, -width_m),
+            (length + width_m, width_m),
+            (-width_m, width_m),
+        ]
+        ring = [
+            [a_lon + (u * ux + n * nx) / kx, a_lat + (u * uy + n * ny) / ky]
+            for u, n in corners
+        ]
+        ring.append(ring[0])
+        rings.append(ring)
+    return rings
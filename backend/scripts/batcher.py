@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Micro-batching for calls that are cheaper per item when grouped.
+
+Threads call ``Batcher.submit(item)`` as if it were a single-item function.
+A dispatcher thread groups pending items into batches of up to
+``batch_size`` (waiting at most ``max_wait`` seconds for a batch to fill)
+and calls ``fn(items)`` with at most ``concurrency`` batches in flight.
+Each caller gets back the result at its item's position, or the exception
+raised for its batch.
+"""
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, List, Optional, Tuple
+
+
+class Batcher:
+    def __init__(
+        self,
+        fn: Callable[[List[Any]], List[Any]],
+        batch_size: int = 8,
+        max_wait: float = 0.05,
+        concurrency: int = 1,
+    ):
+        if batch_size < 1 or concurrency < 1:
+            raise ValueError("batch_size and concurrency must be >= 1")
+        self.fn = fn
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.concurrency = concurrency
+        self.batches = 0
+        self._pending: List[Tuple[Any, Future, float]] = []
+        self._cond = threading.Condition()
+        self._slots = threading.Semaphore(concurrency)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._dispatcher: Optional[threading.Thread] = None
+
+    def submit(self, item: Any) -> Any:
+        """Queue ``item`` for the next batch and block until its result is available."""
+        future: Future = Future()
+        with self._cond:
+            if self._dispatcher is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="batcher")
+                self._dispatcher = threading.Thread(target=self._dispatch, name="batcher-dispatch", daemon=True)
+                self._dispatcher.start()
+            self._pending.append((item, future, time.monotonic()))
+            self._cond.notify()
+        return future.result()
+
+    def _next_batch(self) -> List[Tuple[Any, Future, float]]:
+        with self._cond:
+            while not self._pending:
+                self._cond.wait()
+            deadline = self._pending[0][2] + self.max_wait
+            while len(self._pending) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch = self._pending[: self.batch_size]
+            del self._pending[: self.batch_size]
+            return batch
+
+    def _dispatch(self) -> None:
+        while True:
+            batch = self._next_batch()
+            # Blocking here (rather than queueing batches) lets the next batch fill up meanwhile.
+            self._slots.acquire()
+            self.batches += 1
+            self._executor.submit(self._run, batch)
+
+    def _run(self, batch: List[Tuple[Any, Future, float]]) -> None:
+        try:
+            results = self.fn([item for item, _, _ in batch])
+            if len(results) != len(batch):
+                raise ValueError(f"batch function returned {len(results)} results for {len(batch)} items")
+        except BaseException as exc:
+            for _, future, _ in batch:
+                future.set_exception(exc)
+        else:
+            for (_, future, _), result in zip(batch, results):
+                future.set_result(result)
+        finally:
+            self._slots.release()
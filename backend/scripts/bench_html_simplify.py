@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Benchmark html_simplify.simplify_html against the BeautifulSoup reference
+(strip_links_and_simplify_html) and check that their outputs match.
+
+Pages come from cached action=parse responses (see parse_all_entities.py
+--cache-mode); without a cache, previously parsed records are wrapped in a
+.mw-parser-output div and used instead.
+
+Usage:
+    uv run python scripts/bench_html_simplify.py
+    uv run python scripts/bench_html_simplify.py --limit 200 --repeat 3
+"""
+import argparse
+import gzip
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+
+from html_simplify import simplify_html
+from wikidata_entity_to_json import strip_links_and_simplify_html
+
+Page = Tuple[str, Optional[str]]
+
+
+def pages_from_cache(cache_dir: Path) -> List[Page]:
+    pages: List[Page] = []
+    for path in sorted(cache_dir.rglob("*.json.gz")):
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if "action=parse" not in entry.get("url", ""):
+            continue
+        parsed = (entry.get("body") or {}).get("parse") or {}
+        html = (parsed.get("text") or {}).get("*")
+        if html:
+            pages.append((html, parsed.get("title")))
+    return pages
+
+
+def pages_from_parsed(parsed_dir: Path) -> List[Page]:
+    pages: List[Page] = []
+    for path in sorted(parsed_dir.glob("Q*.json")):
+        record = json.loads(path.read_text(encoding="utf-8"))
+        if record.get("text"):
+            pages.append((f'<div class="mw-parser-output">{record["text"]}</div>', record.get("title")))
+    return pages
+
+
+def pages_per_second(fn: Callable[[str, Optional[str]], str], pages: List[Page], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for html, title in pages:
+            fn(html, title)
+        best = min(best, time.perf_counter() - started)
+    return len(pages) / best if best > 0 else float("inf")
+
+
+def parse_args() -> argparse.Namespace:
+    default_dir = Path(__file__).resolve().parent
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--cache-dir", type=Path, default=default_dir / ".http_cache")
+    parser.add_argument("--parsed-dir", type=Path, default=default_dir / "parsed")
+    parser.add_argument("--limit", type=int, default=None, help="Max pages to use.")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per engine (best is reported).")
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+
+    pages = pages_from_cache(args.cache_dir) if args.cache_dir.exists() else []
+    source = f"HTTP cache {args.cache_dir}"
+    if not pages:
+        pages = pages_from_parsed(args.parsed_dir)
+        source = f"parsed records in {args.parsed_dir}"
+    if args.limit is not None:
+        pages = pages[: max(0, args.limit)]
+    if not pages:
+        print("No pages found.", file=sys.stderr)
+        return 1
+
+    mismatches = [title for html, title in pages if simplify_html(html, title) != strip_links_and_simplify_html(html, title)]
+    mb = sum(len(html) for html, _ in pages) / 1e6
+    print(f"{len(pages)} pages ({mb:.1f} MB) from {source}")
+
+    reference = pages_per_second(strip_links_and_simplify_html, pages, args.repeat)
+    fast = pages_per_second(simplify_html, pages, args.repeat)
+    print(f"reference (BeautifulSoup): {reference:8.1f} pages/s")
+    print(f"simplify_html:             {fast:8.1f} pages/s  ({fast / reference:.1f}x)")
+
+    if mismatches:
+        print(f"{len(mismatches)} pages differ, e.g. {mismatches[:5]}", file=sys.stderr)
+        return 2
+    print("Outputs identical on all pages")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
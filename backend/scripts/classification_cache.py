@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+On-disk cache of LLM classification results.
+
+Entries are keyed by a SHA-256 of the model, the system prompt and the exact
+payload sent to the model, so a rerun only classifies entities whose title,
+summary or text changed (or all of them after a model or prompt change).
+The cache is an append-only JSON lines file; later lines win when it is
+loaded, so an interrupted run never corrupts earlier entries.
+"""
+import hashlib
+import json
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+
+def cache_key(model: str, prompt: str, payload: Dict[str, Any]) -> str:
+    blob = json.dumps(
+        {"model": model, "prompt": prompt, "payload": payload},
+        ensure_ascii=False,
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class ClassificationCache:
+    """Thread-safe ``key -> categories`` map; ``path=None`` keeps it in memory."""
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path) if path is not None else None
+        self.hits = 0
+        self.misses = 0
+        self._entries: Optional[Dict[str, List[str]]] = None
+        self._lock = threading.Lock()
+
+    def _load(self) -> Dict[str, List[str]]:
+        # Loaded on first use so importing the scripts never reads the file.
+        if self._entries is None:
+            self._entries = {}
+            if self.path is not None and self.path.exists():
+                with self.path.open(encoding="utf-8") as fh:
+                    for line in fh:
+                        try:
+                            entry = json.loads(line)
+                            self._entries[entry["key"]] = list(entry["categories"])
+                        except (ValueError, KeyError, TypeError):
+                            continue  # truncated last line of an interrupted run
+        return self._entries
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._load())
+
+    def get(self, key: str) -> Optional[List[str]]:
+        with self._lock:
+            categories = self._load().get(key)
+            if categories is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return list(categories)
+
+    def put(self, key: str, categories: List[str]) -> None:
+        with self._lock:
+            entries = self._load()
+            if entries.get(key) == categories:
+                return
+            entries[key] = list(categories)
+            if self.path is None:
+                return
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with self.path.open("a", encoding="utf-8") as fh:
+                fh.write(json.dumps({"key": key, "categories": categories}, ensure_ascii=False) + "\n")
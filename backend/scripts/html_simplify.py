@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+"""
+Single-pass simplifier for Wikipedia action=parse HTML.
+
+Produces exactly the output of ``wikidata_entity_to_json.strip_links_and_simplify_html``
+(the BeautifulSoup reference implementation) without building a document tree:
+the page is streamed once through the standard-library tokenizer, removed
+blocks are skipped while they are read, and only the kept tags are built.
+Parsing stops as soon as the content container closes or a stop section
+(References, External links, ...) starts.
+
+Parity with the reference (including its html.parser tree-building quirks)
+is checked by tests/test_html_simplify.py; scripts/bench_html_simplify.py
+reports pages/second for both.
+"""
+import re
+from html.parser import HTMLParser
+from typing import List, Optional, Tuple, Union
+
+from bs4.dammit import EntitySubstitution
+
+CONTAINER_CLASS = "mw-parser-output"
+
+# Mirrors the removal selectors of the reference implementation.
+REMOVED_TAGS = {
+    "table", "style", "script", "noscript", "figure", "img", "audio", "video", "math", "sup",
+}
+REMOVED_CLASSES = {
+    "infobox", "navbox", "vertical-navbox", "metadata", "reflist", "reference",
+    "mw-references-wrap", "mw-editsection", "toc", "hatnote", "shortdescription", "noprint",
+    "portalbox", "sistersitebox", "navbox-styles", "authority-control",
+}
+
+BLOCK_STARTS = {"h2", "h3", "h4", "p", "ul", "ol", "blockquote", "pre"}
+HEADINGS = {"h2", "h3", "h4"}
+KEPT_TAGS = {"h2", "h3", "h4", "p", "ul", "ol", "blockquote", "pre", "li", "strong", "b", "em", "i", "code", "br"}
+TAG_ALIAS = {"b": "strong", "i": "em"}
+STOP_SECTIONS = {
+    "references", "external links", "see also", "further reading", "notes",
+    "bibliography", "sources", "works cited",
+}
+
+# Tags BeautifulSoup's html.parser builder closes immediately ...
+EMPTY_ELEMENT_TAGS = {
+    "area", "base", "basefont", "bgsound", "br", "col", "command", "embed", "frame", "hr",
+    "image", "img", "input", "isindex", "keygen", "link", "menuitem", "meta", "nextid",
+    "param", "source", "spacer", "track", "wbr",
+}
+# ... and tags whose text it does not count as main content in get_text().
+SPECIAL_STRING_TAGS = {"rt", "rp", "style", "script", "template"}
+
+_WS_RE = re.compile(r"\s+")
+# Leading digits of a numeric character reference that has trailing text (as html.parser passes it).
+_CHARREF_DIGITS_RE = {10: re.compile(r"([0-9]+)(.*)"), 16: re.compile(r"([0-9a-f]+)(.*)")}
+
+# Context states (what happens to text and tags at the current position).
+_PRE = 0        # before the content container
+_IGNORE = 1     # removed subtree, or after the container
+_ACTIVE = 2     # inside the container
+_WRAPPER = 3    # inside div.mw-heading, looking for its heading
+_COLLECT = 4    # inside the heading of a div.mw-heading
+
+# Frame roles (what happens when the element closes).
+_PLAIN = 0
+_CONTAINER = 1
+_ELEMENT = 2
+_BLOCK = 3
+_HEADING_WRAPPER = 4
+_HEADING_SOURCE = 5
+
+# Output element: (name, children); children are text or elements.
+_Node = Tuple[str, List[Union[str, "_Node"]]]
+
+
+class _Finished(Exception):
+    """Raised to stop tokenizing once the rest of the page cannot change the output."""
+
+
+def _normalize(text: str) -> str:
+    if not text:
+        return ""
+    if text.isspace():
+        return " "
+    return _WS_RE.sub(" ", text)
+
+
+def _numeric_charref(name: str) -> Tuple[str, str]:
+    """Resolve ``&#<name>;`` like the reference parser: (character, trailing text).
+
+    C1 controls are read as windows-1252, which is how they usually end up
+    in a page; invalid code points become U+FFFD.
+    """
+    base = 16 if name[:1] in ("x", "X") else 10
+    digits = name[1:] if base == 16 else name
+    try:
+        code, extra = int(digits, base), ""
+    except ValueError:
+        match = _CHARREF_DIGITS_RE[base].match(digits)
+        if match is None:
+            return "", digits
+        code, extra = int(match.group(1), base), match.group(2)
+    if code == 0 or code > 0x10FFFF or 0xD800 <= code <= 0xDFFF:
+        return "\ufffd", extra
+    if 0x80 <= code <= 0x9F:
+        try:
+            return bytes([code]).decode("windows-1252"), extra
+        except UnicodeDecodeError:
+            pass
+    return chr(code), extra
+
+
+def _escape(text: str) -> str:
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+def _serialize(node: _Node) -> str:
+    name, children = node
+    if name == "br":
+        return "<br/>"
+    inner = "".join(_escape(c) if type(c) is str else _serialize(c) for c in children)
+    return f"<{name}>{inner}</{name}>"
+
+
+def _strings(node: _Node) -> List[str]:
+    out: List[str] = []
+    for child in node[1]:
+        if type(child) is str:
+            out.append(child)
+        else:
+            out.extend(_strings(child))
+    return out
+
+
+def _finish(node: _Node) -> bool:
+    """Drop-or-keep decision and edge trimming for a closed output element."""
+    name, children = node
+    if name != "br" and not any(
+        (c.strip() if type(c) is str else c[0] != "br") for c in children
+    ):
+        return False
+    if children and type(children[0]) is str:
+        children[0] = children[0].lstrip()
+    if children and type(children[-1]) is str:
+        children[-1] = children[-1].rstrip()
+    return True
+
+
+class _Simplifier(HTMLParser):
+    def __init__(self, page_title: Optional[str], use_container: bool):
+        super().__init__(convert_charrefs=False)
+        self.fragments: List[str] = []
+        if page_title:
+            self.fragments.append(f"<h1>{_escape(page_title)}</h1>")
+        self.stopped = False
+        self.found_container = not use_container
+        # Frame: (tag name, role, context for the element's content, payload)
+        self.stack: List[tuple] = []
+        self.open_counts: dict = {}
+        self.closed_empty: List[str] = []
+        self.special_depth = 0
+        # Context: (state, output children list or None, heading wrapper or None)
+        self.base_ctx: tuple = (_PRE, None, None) if use_container else (_ACTIVE, None, None)
+        self.ctx = self.base_ctx
+        self.text: List[str] = []
+
+    # -- text --------------------------------------------------------------
+
+    def _flush(self, kind: str = "text") -> None:
+        if not self.text:
+            return
+        data = "".join(self.text)
+        self.text = []
+        state, out, wrapper = self.ctx
+        if state == _ACTIVE:
+            if out is not None:
+                data = _normalize(data)
+                if data:
+                    out.append(data)
+        elif state == _COLLECT:
+            # get_text() only sees plain text and CDATA, not comments/declarations.
+            if kind in ("text", "cdata") and (kind == "cdata" or not self.special_depth):
+                data = data.strip()
+                if data:
+                    wrapper[1].append(data)
+
+    def handle_data(self, data: str) -> None:
+        self.text.append(data)
+
+    def handle_charref(self, name: str) -> None:
+        self.text.extend(_numeric_charref(name))
+
+    def handle_entityref(self, name: str) -> None:
+        character = EntitySubstitution.HTML_ENTITY_TO_CHARACTER.get(name)
+        self.text.append(character if character is not None else f"&{name}")
+
+    def _special_string(self, data: str, kind: str) -> None:
+        self._flush()
+        self.text.append(data)
+        self._flush(kind)
+
+    def handle_comment(self, data: str) -> None:
+        self._special_string(data, "comment")
+
+    def handle_decl(self, decl: str) -> None:
+        self._special_string(decl[len("DOCTYPE "):], "decl")
+
+    def unknown_decl(self, data: str) -> None:
+        if data.upper().startswith("CDATA["):
+            self._special_string(data[len("CDATA["):], "cdata")
+        else:
+            self._special_string(data, "decl")
+
+    def handle_pi(self, data: str) -> None:
+        self._special_string(data, "pi")
+
+    # -- tags --------------------------------------------------------------
+
+    def handle_startendtag(self, tag: str, attrs: list) -> None:
+        self.handle_starttag(tag, attrs, handle_empty_element=False)
+        self.handle_endtag(tag, check_already_closed=False)
+
+    def handle_starttag(self, tag: str, attrs: list, handle_empty_element: bool = True) -> None:
+        self._flush()
+        state, out, wrapper = self.ctx
+        role, payload, ctx = _PLAIN, None, self.ctx
+
+        if state != _IGNORE:
+            classes: List[str] = []
+            for key, value in attrs:
+                if key == "class":
+                    classes = (value or "").split()
+            if state == _PRE:
+                if CONTAINER_CLASS in classes:
+                    role, ctx = _CONTAINER, (_ACTIVE, None, None)
+                    self.found_container = True
+            elif (
+                tag in REMOVED_TAGS
+                or (classes and (not REMOVED_CLASSES.isdisjoint(classes) or (tag == "ol" and "references" in classes)))
+            ):
+                ctx = (_IGNORE, None, None)
+            elif state == _ACTIVE:
+                if tag == "div" and "mw-heading" in classes:
+                    # [heading name, collected strings, heading seen, parent output]
+                    payload = [None, [], False, out]
+                    role, ctx = _HEADING_WRAPPER, (_WRAPPER, None, payload)
+                elif out is None:
+                    if tag in BLOCK_STARTS:
+                        payload = (TAG_ALIAS.get(tag, tag), [])
+                        role, ctx = _BLOCK, (_ACTIVE, payload[1], None)
+                elif tag in KEPT_TAGS:
+                    payload = (TAG_ALIAS.get(tag, tag), [])
+                    role, ctx = _ELEMENT, (_ACTIVE, payload[1], None)
+            elif state == _WRAPPER and tag in HEADINGS and not wrapper[2]:
+                wrapper[0] = tag
+                role, payload, ctx = _HEADING_SOURCE, wrapper, (_COLLECT, None, wrapper)
+
+        self.stack.append((tag, role, ctx, payload))
+        self.open_counts[tag] = self.open_counts.get(tag, 0) + 1
+        if tag in SPECIAL_STRING_TAGS:
+            self.special_depth += 1
+        self.ctx = ctx
+
+        if handle_empty_element and tag in EMPTY_ELEMENT_TAGS:
+            self.handle_endtag(tag, check_already_closed=False)
+            self.closed_empty.append(tag)
+
+    def handle_endtag(self, tag: str, check_already_closed: bool = True) -> None:
+        if check_already_closed and tag in self.closed_empty:
+            self.closed_empty.remove(tag)
+            return
+        self._flush()
+        if not self.open_counts.get(tag):
+            return
+        while True:
+            name = self._pop()
+            if name == tag:
+                break
+
+    def _pop(self) -> str:
+        name, role, _, payload = self.stack.pop()
+        self.open_counts[name] -= 1
+        if name in SPECIAL_STRING_TAGS:
+            self.special_depth -= 1
+        parent_ctx = self.stack[-1][2] if self.stack else self.base_ctx
+        self.ctx = parent_ctx
+
+        if role == _ELEMENT:
+            if _finish(payload):
+                parent_ctx[1].append(payload)
+        elif role == _BLOCK:
+            self._emit(payload)
+        elif role == _HEADING_SOURCE:
+            payload[2] = True
+        elif role == _HEADING_WRAPPER:
+            heading, pieces, seen, parent_out = payload
+            if heading is not None:
+                text = _normalize(" ".join(pieces))
+                node: _Node = (heading, [text] if text else [])
+                if parent_out is None:
+                    self._emit(node)
+                elif _finish(node):
+                    parent_out.append(node)
+        elif role == _CONTAINER:
+            raise _Finished
+        return name
+
+    def _emit(self, node: _Node) -> None:
+        if not _finish(node):
+            return
+        if node[0] in HEADINGS:
+            heading = " ".join(s.strip() for s in _strings(node) if s.strip()).lower()
+            if heading in STOP_SECTIONS:
+                self.stopped = True
+                raise _Finished
+        self.fragments.append(_serialize(node))
+
+    def run(self, html: str) -> None:
+        try:
+            self.feed(html)
+            self.close()
+            self._flush()
+            while self.stack:
+                self._pop()
+        except _Finished:
+            pass
+
+
+def _simplify(full_html: str, page_title: Optional[str], use_container: bool) -> Optional[str]:
+    parser = _Simplifier(page_title, use_container)
+    parser.run(full_html)
+    if not parser.found_container:
+        return None
+    final = "\n".join(parser.fragments)
+    if parser.stopped:
+        return final
+    final = re.sub(r"\s+([,.;:!?])", r"\1", final)
+    final = re.sub(r"\(\s+", "(", final)
+    final = re.sub(r"\s+\)", ")", final)
+    return final
+
+
+def simplify_html(full_html: str, page_title: Optional[str] = None) -> str:
+    """
+    Turn Wikipedia parse HTML into basic HTML (title, section headings,
+    paragraphs and lists with bold/italics/code/br); same output as
+    ``strip_links_and_simplify_html``.
+    """
+    if CONTAINER_CLASS in full_html:
+        result = _simplify(full_html, page_title, use_container=True)
+        if result is not None:
+            return result
+    # No .mw-parser-output element: the whole document is the container.
+    return _simplify(full_html, page_title, use_container=False)
+
+
+_TAG_RE = re.compile(r"<[^>]*>")
+
+
+def simple_html_text(simple_html: str) -> str:
+    """Plain text of ``simplify_html`` output, like BeautifulSoup's get_text(" ", strip=True)."""
+    parts = (
+        part.strip().replace("&lt;", "<").replace("&gt;", ">").replace("&amp;", "&")
+        for part in _TAG_RE.split(simple_html)
+    )
+    return " ".join(part for part in parts if part)
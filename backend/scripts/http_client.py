@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""Shared HTTP client for the ingestion scripts.
+
+- one keep-alive ``requests.Session`` per thread (connection pooling)
+- per-host rate limiting via ``rate_limit.HostRateLimiter``
+- optional content-addressed on-disk response cache for GET requests:
+  entries are gzip-compressed JSON under ``<cache_dir>/<sha[:2]>/<sha>.json.gz``,
+  keyed by the full request URL (including sorted query params); POSTs whose
+  response depends only on the request body can opt in with ``cacheable=True``
+
+Cache modes:
+- ``off``        never read or write the cache
+- ``revalidate`` send If-None-Match / If-Modified-Since when the cached entry has
+                 an ETag / Last-Modified and reuse it on 304; otherwise refetch
+- ``prefer``     serve cached entries without touching the network, fetch misses
+- ``only``       offline: serve cached entries, raise ``CacheMiss`` on a miss
+"""
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from rate_limit import HostRateLimiter
+
+CACHE_MODES = ("off", "revalidate", "prefer", "only")
+
+
+class CacheMiss(RuntimeError):
+    """Raised in ``only`` mode when a response is not in the cache."""
+
+
+class ResponseCache:
+    """Content-addressed store of JSON responses plus their validators."""
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+
+    @staticmethod
+    def key(url: str) -> str:
+        return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.json.gz"
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        path = self._path(key)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, OSError, ValueError):
+            return None
+
+    def put(self, key: str, entry: Dict[str, Any]) -> None:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False)
+        tmp_path.replace(path)
+
+
+class HttpClient:
+    def __init__(
+        self,
+        rate_limiter: Optional[HostRateLimiter] = None,
+        cache_dir: Optional[Path] = None,
+        cache_mode: str = "off",
+        pool_size: int = 16,
+    ):
+        if cache_mode not in CACHE_MODES:
+            raise ValueError(f"cache_mode must be one of {', '.join(CACHE_MODES)}")
+        if cache_mode != "off" and cache_dir is None:
+            raise ValueError(f"cache_mode={cache_mode!r} needs a cache_dir")
+        self.rate_limiter = rate_limiter or HostRateLimiter()
+        self.cache = ResponseCache(cache_dir) if cache_dir is not None and cache_mode != "off" else None
+        self.cache_mode = cache_mode
+        self.pool_size = pool_size
+        self.stats = {"network": 0, "cache_hits": 0, "revalidated": 0}
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+
+    def _session(self) -> requests.Session:
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            self._local.session = session
+        return session
+
+    def _count(self, name: str) -> None:
+        with self._stats_lock:
+            self.stats[name] += 1
+
+    def _request(self, method: str, url: str, **kwargs: Any) -> requests.Response:
+        self.rate_limiter.acquire(url)
+        self._count("network")
+        return self._session().request(method, url, **kwargs)
+
+    def get_json(
+        self,
+        url: str,
+        *,
+        headers: Optional[dict] = None,
+        params: Optional[dict] = None,
+        timeout: float = 30,
+    ) -> Any:
+        if self.cache is None:
+            r = self._request("GET", url, headers=headers, params=params, timeout=timeout)
+            r.raise_for_status()
+            return r.json()
+
+        full_url = requests.Request("GET", url, params=sorted((params or {}).items())).prepare().url
+        key = ResponseCache.key(full_url)
+        cached = self.cache.get(key)
+
+        if cached is not None and self.cache_mode in ("prefer", "only"):
+            self._count("cache_hits")
+            return cached["body"]
+        if cached is None and self.cache_mode == "only":
+            raise CacheMiss(f"Not in HTTP cache: {full_url}")
+
+        request_headers = dict(headers or {})
+        if cached is not None:
+            if cached.get("etag"):
+                request_headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                request_headers["If-Modified-Since"] = cached["last_modified"]
+
+        r = self._request("GET", full_url, headers=request_headers, timeout=timeout)
+        if r.status_code == 304 and cached is not None:
+            self._count("revalidated")
+            cached["fetched_at"] = time.time()
+            self.cache.put(key, cached)
+            return cached["body"]
+        r.raise_for_status()
+        body = r.json()
+        self.cache.put(
+            key,
+            {
+                "url": full_url,
+                "etag": r.headers.get("ETag"),
+                "last_modified": r.headers.get("Last-Modified"),
+                "fetched_at": time.time(),
+                "body": body,
+            },
+        )
+        return body
+
+    def post_json(
+        self,
+        url: str,
+        *,
+        headers: Optional[dict] = None,
+        data: Optional[Any] = None,
+        json_body: Optional[Any] = None,
+        timeout: float = 30,
+        cacheable: bool = False,
+    ) -> Any:
+        """
+        POST without caching (used for non-idempotent / LLM calls), unless
+        ``cacheable``: then the response is cached under the URL and body and
+        served from the cache in every mode but ``off`` (there is nothing to
+        revalidate, the body fully determines the response).
+        """
+        if not cacheable or self.cache is None:
+            r = self._request("POST", url, headers=headers, data=data, json=json_body, timeout=timeout)
+            r.raise_for_status()
+            return r.json()
+
+        prepared = requests.Request("POST", url, data=data, json=json_body).prepare()
+        body_bytes = prepared.body.encode("utf-8") if isinstance(prepared.body, str) else prepared.body or b""
+        key = ResponseCache.key(f"POST {url} {hashlib.sha256(body_bytes).hexdigest()}")
+        cached = self.cache.get(key)
+        if cached is not None:
+            self._count("cache_hits")
+            return cached["body"]
+        if self.cache_mode == "only":
+            raise CacheMiss(f"Not in HTTP cache: POST {url}")
+
+        r = self._request("POST", url, headers=headers, data=data, json=json_body, timeout=timeout)
+        r.raise_for_status()
+        body = r.json()
+        self.cache.put(key, {"url": url, "fetched_at": time.time(), "body": body})
+        return body
@@ -1,16 +1,74 @@
-"""Import all parsed JSON files from scripts/parsed/ into the MongoDB 'pois' collection."""
+"""Import all parsed JSON files from scripts/parsed/ into the MongoDB 'pois' collection.
 
+The parsed directory may also be a record store written with
+``parse_all_entities.py --output-format shards``; its shards are then streamed
+instead of reading one file per entity.
+
+Records are read and converted by a pool of worker threads and written as
+unordered ``bulk_write`` upserts keyed by ``entity_id``, ``--batch-size`` at a
+time, while the next batch is being prepared. Every document written is stamped
+with the run's ``imported_at``; documents not written by this run are removed
+at the end, so the collection stays queryable during the import and memory
+use does not grow with the dataset.
+
+With ``--swap`` the records go into an empty ``pois_staging`` collection with
+all indexes already built. It is validated (document count, GeoJSON points),
+and only then atomically renamed over ``pois``. The replaced generation is
+kept as ``pois_previous`` and can be restored with ``--rollback``. Every
+import bumps the generation in ``pois_generation``; running app instances
+poll it and drop their cached POI index and safe radii when it changes.
+"""
+
+import argparse
 import asyncio
+import datetime as dt
 import json
+import math
 import os
+import time
 from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReplaceOne, ReturnDocument
+
+from near_duplicates import DEFAULT_MAX_DISTANCE_M, DEFAULT_MIN_SIMILARITY, NearDuplicateDetector
+from pipeline import Pipeline, Stage
+from record_store import RecordStore, is_store
 
 MONGO_URL = os.getenv("DATA_MONGO_URL", "mongodb://localhost:27017")
 DB_NAME = os.getenv("DATA_MONGO_DB", "guidio")
 PARSED_DIR = Path(__file__).parent / "parsed"
 AUDIO_OUTPUT_DIR = Path(__file__).parent.parent / "ai" / "test" / "output"
+BATCH_SIZE = 500
+WORKERS = 8
+PROGRESS_EVERY_S = 5.0
+DUPLICATES_REPORT = Path(__file__).parent / "near_duplicates.jsonl"
+
+LIVE_COLLECTION = "pois"
+STAGING_COLLECTION = "pois_staging"
+PREVIOUS_COLLECTION = "pois_previous"
+# {_id: "pois", generation, source, swapped_at}; polled by app.services.spatial.
+GENERATION_COLLECTION = "pois_generation"
+# --swap refuses a staging collection much smaller than the live one.
+MIN_RATIO = 0.9
+INVALID_LOCATION = {
+    "$nor": [
+        {
+            "location.type": "Point",
+            "location.coordinates.0": {"$gte": -180, "$lte": 180},
+            "location.coordinates.1": {"$gte": -90, "$lte": 90},
+        }
+    ]
+}
+
+
+def _importance(text: str | None) -> float:
+    """Rough 0–1 importance score from the length of the Wikipedia article."""
+    if not text:
+        return 0.0
+    # 100k characters (e.g. a capital city) saturates the score.
+    return round(min(1.0, math.log10(1 + len(text)) / 5), 3)
 
 
 def _to_doc(data: dict) -> dict:
@@ -26,73 +84,353 @@ def _to_doc(data: dict) -> dict:
             "coordinates": [lon, lat],  # GeoJSON is [lng, lat]
         }
 
+    # Used to scale geofence trigger radii
+    doc["importance"] = _importance(doc.get("text"))
+
     # Attach audio text and audio file path if available
     entity_id = doc.get("entity_id")
     if entity_id:
         txt_path = AUDIO_OUTPUT_DIR / f"{entity_id}.txt"
         mp3_path = AUDIO_OUTPUT_DIR / f"{entity_id}.mp3"
 
-        if txt_path.exists():
-            doc["text_audio"] = txt_path.read_text(encoding="utf-8")
-            print(f"  Attached audio text for {entity_id}")
-            print(doc["text_audio"][:100])  # Print first 100 characters
-        else:
-            doc["text_audio"] = None
+        doc["text_audio"] = txt_path.read_text(encoding="utf-8") if txt_path.exists() else None
+        doc["audio_file"] = str(mp3_path) if mp3_path.exists() else None
+
+    return doc
+
+
+def iter_sources(parsed_dir: Path) -> Iterator[Tuple[str, Path | dict]]:
+    """(source name, file to read or already decoded record) for every parsed entity."""
+    if is_store(parsed_dir):
+        for record in RecordStore(parsed_dir).iter_records():
+            yield record["entity_id"], record
+        return
+    for f in sorted(parsed_dir.glob("*.json")):
+        if f.name.startswith("_"):
+            continue  # _failed_entities.json, _changed_entities.json
+        yield f.name, f
+
+
+def load_source(source: Path | dict) -> dict:
+    if isinstance(source, Path):
+        return json.loads(source.read_text(encoding="utf-8"))
+    return source
 
-        if mp3_path.exists():
-            doc["audio_file"] = str(mp3_path)
-            print(f"  Attached audio file for {entity_id}: {mp3_path}")
-        else:
-            doc["audio_file"] = None
 
+def convert_source(source: Path | dict) -> Optional[dict]:
+    """The MongoDB document for one parsed entity; None if it has no coordinates."""
+    doc = _to_doc(load_source(source))
+    if "location" not in doc or not doc.get("entity_id"):
+        return None
     return doc
 
 
-async def import_all():
-    client = AsyncIOMotorClient(MONGO_URL)
-    db = client[DB_NAME]
-    collection = db.pois
+def iter_batches(
+    parsed_dir: Path,
+    batch_size: int,
+    workers: int,
+    stats: Dict[str, int],
+    detector: Optional[NearDuplicateDetector] = None,
+) -> Iterator[List[dict]]:
+    """
+    Converted documents in lists of ``batch_size``; skips are counted in
+    ``stats``. Documents that ``detector`` finds to be near duplicates of a
+    better one are left out.
+    """
+    pipeline = Pipeline([Stage("convert", convert_source, workers=workers)], queue_size=2 * batch_size)
+    batch: List[dict] = []
+    for name, doc, error in pipeline.run(iter_sources(parsed_dir)):
+        if error is not None:
+            print(f"  Skipping {name}: {error}")
+            stats["skipped"] += 1
+        elif doc is None:
+            stats["skipped"] += 1
+        elif detector is not None and (decision := detector.add(doc)) and decision.drop == doc["entity_id"]:
+            continue
+        else:
+            batch.append(doc)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
 
-    # Drop existing data
-    deleted = await collection.delete_many({})
-    print(f"Cleared {deleted.deleted_count} existing documents")
 
-    # Read all JSON files
-    files = sorted(PARSED_DIR.glob("*.json"))
-    if not files:
-        print(f"No JSON files found in {PARSED_DIR}")
-        client.close()
-        return
+async def upsert_batches(
+    collection: Any,
+    parsed_dir: Path,
+    batch_size: int = BATCH_SIZE,
+    workers: int = WORKERS,
+    progress_every_s: float = PROGRESS_EVERY_S,
+    detector: Optional[NearDuplicateDetector] = None,
+) -> Dict[str, Any]:
+    """
+    Upsert every parsed entity into ``collection`` and delete the documents
+    this run did not write, including near duplicates replaced after they were
+    written. Returns counts and the overall docs/s.
+    """
+    clock = dt.datetime.now(dt.timezone.utc)
+    imported_at = clock.replace(microsecond=clock.microsecond // 1000 * 1000)  # BSON dates are in ms
+    stats: Dict[str, Any] = {"written": 0, "inserted": 0, "updated": 0, "skipped": 0, "removed": 0}
+    await collection.create_index("entity_id", unique=True)
 
-    docs = []
-    skipped = 0
-    for f in files:
-        try:
-            data = json.loads(f.read_text(encoding="utf-8"))
-            doc = _to_doc(data)
-            if "location" not in doc:
-                skipped += 1
-                continue
-            docs.append(doc)
-        except Exception as e:
-            print(f"  Skipping {f.name}: {e}")
-            skipped += 1
-
-    if docs:
-        result = await collection.insert_many(docs)
-        print(f"Inserted {len(result.inserted_ids)} POIs into '{DB_NAME}.pois'")
-    else:
-        print("No valid documents to insert")
+    batches = iter_batches(parsed_dir, batch_size, workers, stats, detector)
+    started = last_report = time.monotonic()
+    # Convert the next batch in a thread while the current one is written.
+    pending = asyncio.ensure_future(asyncio.to_thread(next, batches, None))
+    while (batch := await pending) is not None:
+        pending = asyncio.ensure_future(asyncio.to_thread(next, batches, None))
+        operations = [
+            ReplaceOne({"entity_id": doc["entity_id"]}, {**doc, "imported_at": imported_at}, upsert=True)
+            for doc in batch
+        ]
+        result = await collection.bulk_write(operations, ordered=False)
+        stats["written"] += len(batch)
+        stats["inserted"] += result.upserted_count
+        stats["updated"] += result.matched_count
+
+        now = time.monotonic()
+        if now - last_report >= progress_every_s:
+            print(f"  {stats['written']} docs ({stats['written'] / (now - started):.0f} docs/s)", flush=True)
+            last_report = now
 
-    if skipped:
-        print(f"Skipped {skipped} files (missing coordinates or parse errors)")
+    stats["seconds"] = time.monotonic() - started
+    stats["rate"] = stats["written"] / stats["seconds"] if stats["seconds"] > 0 else 0.0
+    deleted = await collection.delete_many({"imported_at": {"$ne": imported_at}})
+    stats["removed"] = deleted.deleted_count
 
-    # Ensure geospatial index
+    replaced = [d.drop for d in detector.decisions if d.replaces_accepted] if detector is not None else []
+    stats["merged"] = len(detector.decisions) if detector is not None else 0
+    for start in range(0, len(replaced), batch_size):
+        deleted = await collection.delete_many({"entity_id": {"$in": replaced[start : start + batch_size]}})
+        stats["written"] -= deleted.deleted_count
+    return stats
+
+
+async def ensure_indexes(collection: Any) -> None:
+    await collection.create_index("entity_id", unique=True)
     await collection.create_index([("location", "2dsphere")])
-    print("Ensured 2dsphere index on 'location'")
+    await collection.create_index(
+        [("location", "2dsphere"), ("categories", 1), ("importance", 1)]
+    )
+
 
+async def bump_generation(db: Any, source: str) -> int:
+    """Record a new POI generation; running app instances poll it to drop their caches."""
+    state = await db[GENERATION_COLLECTION].find_one_and_update(
+        {"_id": LIVE_COLLECTION},
+        {"$inc": {"generation": 1}, "$set": {"source": source, "swapped_at": dt.datetime.now(dt.timezone.utc)}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    return state["generation"]
+
+
+async def validate_staging(collection: Any, written: int, live_count: int, min_ratio: float) -> List[str]:
+    """Reasons not to swap ``collection`` in; empty if it looks complete and sane."""
+    problems = []
+    count = await collection.count_documents({})
+    if count == 0:
+        problems.append("no documents")
+    if count != written:
+        problems.append(f"{count} documents but {written} were written")
+    if live_count and count < min_ratio * live_count:
+        problems.append(f"{count} documents is less than {min_ratio:.0%} of the {live_count} live ones")
+    invalid = await collection.count_documents(INVALID_LOCATION)
+    if invalid:
+        problems.append(f"{invalid} documents without a valid GeoJSON point")
+    return problems
+
+
+async def swap_in(db: Any, source: str) -> int:
+    """
+    Atomically replace the live collection with ``source``. The current
+    generation is copied to PREVIOUS_COLLECTION first (the live collection
+    keeps serving meanwhile), so it can be restored with ``--rollback``.
+    """
+    if LIVE_COLLECTION in await db.list_collection_names():
+        await db[LIVE_COLLECTION].aggregate([{"$out": PREVIOUS_COLLECTION}]).to_list(None)
+        await ensure_indexes(db[PREVIOUS_COLLECTION])
+    await db[source].rename(LIVE_COLLECTION, dropTarget=True)
+    return await bump_generation(db, source)
+
+
+def print_duplicates(detector: Optional[NearDuplicateDetector], report: Optional[Path]) -> None:
+    if detector is None:
+        return
+    print(f"Merged {len(detector.decisions)} near-duplicates ({detector.comparisons} title comparisons)")
+    if report is not None:
+        detector.write_report(report)
+        print(f"Merge decisions written to: {report}")
+
+
+async def import_swap(
+    db: Any,
+    parsed_dir: Path,
+    batch_size: int = BATCH_SIZE,
+    workers: int = WORKERS,
+    min_ratio: float = MIN_RATIO,
+    detector: Optional[NearDuplicateDetector] = None,
+    report: Optional[Path] = None,
+) -> bool:
+    """Blue/green import: build and validate STAGING_COLLECTION, then swap it in."""
+    staging = db[STAGING_COLLECTION]
+    await staging.drop()
+    await ensure_indexes(staging)
+    stats = await upsert_batches(staging, parsed_dir, batch_size, workers, detector=detector)
+    print(
+        f"Wrote {stats['written']} POIs into '{DB_NAME}.{STAGING_COLLECTION}' "
+        f"in {stats['seconds']:.1f}s ({stats['rate']:.0f} docs/s)"
+    )
+    if stats["skipped"]:
+        print(f"Skipped {stats['skipped']} files (missing coordinates or parse errors)")
+    print_duplicates(detector, report)
+
+    live_count = await db[LIVE_COLLECTION].count_documents({})
+    problems = await validate_staging(staging, stats["written"], live_count, min_ratio)
+    if problems:
+        print(f"Not swapping; '{STAGING_COLLECTION}' is kept for inspection: " + "; ".join(problems))
+        return False
+
+    generation = await swap_in(db, STAGING_COLLECTION)
+    print(
+        f"Swapped in generation {generation} ({stats['written']} POIs, previously {live_count}); "
+        f"the previous generation is kept in '{PREVIOUS_COLLECTION}'"
+    )
+    return True
+
+
+async def rollback(db: Any) -> bool:
+    """Swap the previous generation back in; the replaced one becomes the new previous."""
+    if PREVIOUS_COLLECTION not in await db.list_collection_names():
+        print(f"No previous generation in '{DB_NAME}.{PREVIOUS_COLLECTION}'")
+        return False
+    await db[PREVIOUS_COLLECTION].rename(STAGING_COLLECTION, dropTarget=True)
+    generation = await swap_in(db, STAGING_COLLECTION)
+    print(f"Rolled back to the previous generation (now generation {generation})")
+    return True
+
+
+async def import_all(
+    parsed_dir: Path = PARSED_DIR,
+    batch_size: int = BATCH_SIZE,
+    workers: int = WORKERS,
+    swap: bool = False,
+    min_ratio: float = MIN_RATIO,
+    detector: Optional[NearDuplicateDetector] = None,
+    report: Optional[Path] = None,
+) -> bool:
+    if not is_store(parsed_dir) and not any(parsed_dir.glob("*.json")):
+        print(f"No JSON files found in {parsed_dir}")
+        return False
+
+    client = AsyncIOMotorClient(MONGO_URL)
+    db = client[DB_NAME]
+    if swap:
+        ok = await import_swap(db, parsed_dir, batch_size, workers, min_ratio, detector, report)
+        client.close()
+        return ok
+
+    collection = db[LIVE_COLLECTION]
+    stats = await upsert_batches(collection, parsed_dir, batch_size, workers, detector=detector)
+    print(
+        f"Upserted {stats['written']} POIs into '{DB_NAME}.pois' "
+        f"({stats['inserted']} new, {stats['updated']} updated) "
+        f"in {stats['seconds']:.1f}s ({stats['rate']:.0f} docs/s)"
+    )
+    print(f"Removed {stats['removed']} stale documents")
+    if stats["skipped"]:
+        print(f"Skipped {stats['skipped']} files (missing coordinates or parse errors)")
+    print_duplicates(detector, report)
+
+    await ensure_indexes(collection)
+    print("Ensured 2dsphere indexes on 'location' and 'location' + 'categories'")
+    await bump_generation(db, LIVE_COLLECTION)
+
+    client.close()
+    return True
+
+
+async def rollback_all() -> bool:
+    client = AsyncIOMotorClient(MONGO_URL)
+    ok = await rollback(client[DB_NAME])
     client.close()
+    return ok
 
 
 if __name__ == "__main__":
-    asyncio.run(import_all())
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--parsed-dir",
+        type=Path,
+        default=PARSED_DIR,
+        help="Directory with <QID>.json files or a sharded record store.",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=BATCH_SIZE,
+        help="Documents per unordered bulk_write.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=WORKERS,
+        help="Threads reading and converting parsed records.",
+    )
+    parser.add_argument(
+        "--swap",
+        action="store_true",
+        help=f"Build '{STAGING_COLLECTION}', validate it and atomically swap it in for '{LIVE_COLLECTION}'.",
+    )
+    parser.add_argument(
+        "--min-ratio",
+        type=float,
+        default=MIN_RATIO,
+        help="With --swap, refuse to swap in fewer documents than this fraction of the live collection.",
+    )
+    parser.add_argument(
+        "--rollback",
+        action="store_true",
+        help=f"Swap '{PREVIOUS_COLLECTION}' back in for '{LIVE_COLLECTION}'.",
+    )
+    parser.add_argument(
+        "--no-dedup",
+        action="store_true",
+        help="Import near-duplicate POIs instead of keeping only the one with the longest text.",
+    )
+    parser.add_argument(
+        "--dedup-distance-m",
+        type=float,
+        default=DEFAULT_MAX_DISTANCE_M,
+        help="POIs at most this far apart can be near duplicates.",
+    )
+    parser.add_argument(
+        "--dedup-similarity",
+        type=float,
+        default=DEFAULT_MIN_SIMILARITY,
+        help="Minimum 0-1 title similarity of near duplicates.",
+    )
+    parser.add_argument(
+        "--dedup-report",
+        type=Path,
+        default=DUPLICATES_REPORT,
+        help="JSONL file listing every merge decision.",
+    )
+    args = parser.parse_args()
+    if args.rollback:
+        ok = asyncio.run(rollback_all())
+    else:
+        detector = None if args.no_dedup else NearDuplicateDetector(args.dedup_distance_m, args.dedup_similarity)
+        ok = asyncio.run(
+            import_all(
+                args.parsed_dir,
+                max(1, args.batch_size),
+                max(1, args.workers),
+                args.swap,
+                args.min_ratio,
+                detector,
+                args.dedup_report,
+            )
+        )
+    raise SystemExit(0 if ok else 1)
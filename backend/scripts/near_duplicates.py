@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Near-duplicate POI detection for import_parsed.py.
+
+Wikidata often has the same landmark under several items a few metres apart
+(a church and its parish, a building and the museum housed in it). The
+detector keeps the POIs accepted so far in a uniform lat/lon grid whose cells
+are as tall as the distance threshold, so every new POI is only compared with
+the few cells around it; a whole import is one pass, roughly linear in the
+number of POIs. Two POIs are near duplicates when they are at most
+``max_distance_m`` apart and their normalized titles score at least
+``min_similarity``. The one with the longer article text is kept.
+
+Only a few fields per accepted POI are held in memory, never the documents.
+"""
+import json
+import math
+import re
+import unicodedata
+from dataclasses import dataclass
+from difflib import SequenceMatcher
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+METRES_PER_DEG_LAT = 111_320.0
+DEFAULT_MAX_DISTANCE_M = 50.0
+DEFAULT_MIN_SIMILARITY = 0.85
+
+_PARENTHETICAL_RE = re.compile(r"\([^)]*\)")
+_NON_ALNUM_RE = re.compile(r"[^0-9a-z]+")
+
+
+def normalize_title(title: Optional[str]) -> str:
+    """Lowercase ASCII words of ``title``, without accents and disambiguation suffixes."""
+    if not title:
+        return ""
+    text = unicodedata.normalize("NFKD", _PARENTHETICAL_RE.sub(" ", title))
+    # Drop accents and invisible format characters such as soft hyphens.
+    text = "".join(ch for ch in text if not unicodedata.combining(ch) and unicodedata.category(ch) != "Cf").lower()
+    return " ".join(_NON_ALNUM_RE.sub(" ", text).split())
+
+
+def title_similarity(a: str, b: str) -> float:
+    """0-1 score of two normalized titles: the better of character and word overlap."""
+    if not a or not b:
+        return 0.0
+    if a == b:
+        return 1.0
+    words_a, words_b = set(a.split()), set(b.split())
+    jaccard = len(words_a & words_b) / len(words_a | words_b)
+    return max(SequenceMatcher(None, a, b).ratio(), jaccard)
+
+
+@dataclass(slots=True)
+class _Accepted:
+    entity_id: str
+    title: str
+    normalized: str
+    latitude: float
+    longitude: float
+    text_len: int
+
+
+class MergeDecision(NamedTuple):
+    keep: str
+    drop: str
+    keep_title: str
+    drop_title: str
+    distance_m: float
+    similarity: float
+    # ``drop`` had been accepted before, so it may already have been written.
+    replaces_accepted: bool
+
+
+def _preferred(a: _Accepted, b: _Accepted) -> bool:
+    """Whether ``a`` is kept over ``b``: longer text, then the smaller id for determinism."""
+    if a.text_len != b.text_len:
+        return a.text_len > b.text_len
+    return a.entity_id < b.entity_id
+
+
+class NearDuplicateDetector:
+    def __init__(
+        self, max_distance_m: float = DEFAULT_MAX_DISTANCE_M, min_similarity: float = DEFAULT_MIN_SIMILARITY
+    ):
+        if max_distance_m <= 0:
+            raise ValueError("max_distance_m must be > 0")
+        self.max_distance_m = max_distance_m
+        self.min_similarity = min_similarity
+        self.cell_deg = max_distance_m / METRES_PER_DEG_LAT
+        self._cells: Dict[Tuple[int, int], List[_Accepted]] = {}
+        self.decisions: List[MergeDecision] = []
+        self.comparisons = 0
+
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        return math.floor(lat / self.cell_deg), math.floor(lon / self.cell_deg)
+
+    def _best_match(self, poi: _Accepted) -> Optional[Tuple[_Accepted, float, float]]:
+        """The most similar accepted POI within range, with its distance and similarity."""
+        lat, lon = poi.latitude, poi.longitude
+        cos_lat = max(math.cos(math.radians(lat)), 1e-6)
+        dlat = self.max_distance_m / METRES_PER_DEG_LAT
+        dlon = self.max_distance_m / (METRES_PER_DEG_LAT * cos_lat)
+        row_min, col_min = self._cell(lat - dlat, lon - dlon)
+        row_max, col_max = self._cell(lat + dlat, lon + dlon)
+
+        best = None
+        for row in range(row_min, row_max + 1):
+            for col in range(col_min, col_max + 1):
+                for other in self._cells.get((row, col), ()):
+                    dx = (other.longitude - lon) * METRES_PER_DEG_LAT * cos_lat
+                    dy = (other.latitude - lat) * METRES_PER_DEG_LAT
+                    distance = math.hypot(dx, dy)
+                    if distance > self.max_distance_m:
+                        continue
+                    self.comparisons += 1
+                    similarity = title_similarity(poi.normalized, other.normalized)
+                    if similarity < self.min_similarity:
+                        continue
+                    if best is None or (similarity, -distance) > (best[2], -best[1]):
+                        best = (other, distance, similarity)
+        return best
+
+    def add(self, doc: Dict[str, Any]) -> Optional[MergeDecision]:
+        """
+        Register a converted document (GeoJSON ``location``). Returns None if it
+        is not a near duplicate; otherwise the decision, whose ``drop`` is either
+        this document or a previously accepted one that it replaces.
+        """
+        lon, lat = doc["location"]["coordinates"][:2]
+        poi = _Accepted(
+            entity_id=doc["entity_id"],
+            title=doc.get("title") or "",
+            normalized=normalize_title(doc.get("title")),
+            latitude=float(lat),
+            longitude=float(lon),
+            text_len=len(doc.get("text") or ""),
+        )
+        match = self._best_match(poi) if poi.normalized else None
+        if match is None:
+            self._cells.setdefault(self._cell(poi.latitude, poi.longitude), []).append(poi)
+            return None
+
+        other, distance, similarity = match
+        keep, drop = (poi, other) if _preferred(poi, other) else (other, poi)
+        if keep is poi:
+            bucket = self._cells[self._cell(other.latitude, other.longitude)]
+            bucket.remove(other)
+            self._cells.setdefault(self._cell(poi.latitude, poi.longitude), []).append(poi)
+        decision = MergeDecision(
+            keep=keep.entity_id,
+            drop=drop.entity_id,
+            keep_title=keep.title,
+            drop_title=drop.title,
+            distance_m=round(distance, 1),
+            similarity=round(similarity, 3),
+            replaces_accepted=keep is poi,
+        )
+        self.decisions.append(decision)
+        return decision
+
+    def write_report(self, path: Path) -> None:
+        """One JSON merge decision per line."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("w", encoding="utf-8") as fh:
+            for decision in self.decisions:
+                fh.write(json.dumps(decision._asdict(), ensure_ascii=False) + "\n")
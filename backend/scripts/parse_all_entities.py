@@ -1,13 +1,40 @@
 #!/usr/bin/env python3
 import argparse
 import json
+import os
 import re
 import sys
 import time
 from pathlib import Path
-from typing import Dict, List, Tuple
-
-from wikidata_entity_to_json import build_json
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+import wikidata_entity_to_json
+from http_client import CACHE_MODES
+from pipeline import Pipeline, Stage
+from rate_limit import parse_rate_spec
+from record_store import RecordStore
+from wikidata_entity_to_json import (
+    CLASSIFICATION_CACHE_PATH,
+    RATE_LIMITER,
+    USER_AGENT,
+    WBGETENTITIES_MAX_IDS,
+    TYPE_CATEGORIES_PATH,
+    WIKIPEDIA_FETCH_MODES,
+    assemble_record,
+    classify_entity,
+    commons_file_urls,
+    configure_classification,
+    configure_http,
+    configure_type_categories,
+    configure_wikipedia_fetch,
+    current_revisions,
+    extract_type_qids,
+    extract_wikidata_p18_filename,
+    fetch_sources,
+    get_wikidata_entities,
+    resolve_types,
+    simplify_sources,
+)
 
 try:
     from tqdm import tqdm
@@ -16,6 +43,8 @@ except Exception:  # pragma: no cover - fallback for environments without tqdm
 
 QID_RE = re.compile(r"(Q\d+)$")
 
+# Requests per second per upstream host, comfortably inside Wikimedia's polite-use limits.
+DEFAULT_RATE_LIMITS = "www.wikidata.org=10,en.wikipedia.org=20,commons.wikimedia.org=10"
 
 def extract_entity_ids(entities_path: Path) -> Tuple[List[str], int]:
     raw = json.loads(entities_path.read_text(encoding="utf-8"))
@@ -51,6 +80,168 @@ def write_json(path: Path, payload: Dict) -> None:
     tmp_path.replace(path)
 
 
+class Prefetched(NamedTuple):
+    """Batch-fetched inputs for one entity; None means build_json fetches it itself."""
+
+    entity_id: str
+    entity: Optional[dict] = None
+    image_info: Optional[Dict[str, Optional[str]]] = None
+
+
+def iter_prefetched(
+    entity_ids: Iterable[str], batch_size: int, thumb_width: Optional[int] = None
+) -> Iterator[Prefetched]:
+    """Yield ``Prefetched`` records, fetching Wikidata entities and their Commons
+    image URLs in batches (one request each per batch) as they are consumed.
+    The batch's P31 types are resolved in the type table at the same time.
+
+    If a batch request fails, or an id is missing from the response, the
+    corresponding field is None and build_json falls back to fetching it on
+    its own.
+    """
+    batch: List[str] = []
+
+    def flush() -> Iterator[Prefetched]:
+        entities: Dict[str, dict] = {}
+        filenames: Dict[str, Optional[str]] = {}
+        images: Optional[Dict[str, Dict[str, Optional[str]]]] = None
+        if batch_size > 1:
+            try:
+                entities = get_wikidata_entities(batch, USER_AGENT)
+            except Exception:
+                entities = {}
+            filenames = {qid: extract_wikidata_p18_filename(e) for qid, e in entities.items()}
+            try:
+                images = commons_file_urls([f for f in filenames.values() if f], USER_AGENT, thumb_width)
+            except Exception:
+                images = None
+            try:
+                # Resolve the whole batch's P31 types at once so classification is a table lookup.
+                resolve_types(sorted({t for e in entities.values() for t in extract_type_qids(e)}))
+            except Exception:
+                pass
+        for qid in batch:
+            filename = filenames.get(qid)
+            # {} marks a file that Commons could not resolve, so it is not looked up again.
+            image_info = images.get(filename, {}) if filename and images is not None else None
+            yield Prefetched(qid, entities.get(qid), image_info)
+
+    for qid in entity_ids:
+        batch.append(qid)
+        if len(batch) >= batch_size:
+            yield from flush()
+            batch = []
+    if batch:
+        yield from flush()
+
+
+def fetch_with_retries(
+    item: Prefetched,
+    retries: int,
+    retry_delay: float,
+    thumb_width: Optional[int] = None,
+) -> Dict[str, Any]:
+    """fetch_sources with exponential backoff between attempts.
+
+    Prefetched inputs are only used on the first attempt; retries fetch
+    everything again. Raises the last error once all attempts failed.
+    """
+    total_attempts = retries + 1
+    for attempt in range(1, total_attempts + 1):
+        try:
+            if attempt == 1:
+                return fetch_sources(item.entity_id, item.entity, item.image_info, thumb_width)
+            return fetch_sources(item.entity_id, thumb_width=thumb_width)
+        except Exception:
+            if attempt == total_attempts:
+                raise
+            time.sleep(retry_delay * (2 ** (attempt - 1)))
+    raise AssertionError("unreachable")
+
+
+def classify_sources(sources: Dict[str, Any]) -> Tuple[Dict[str, Any], List[str]]:
+    return sources, classify_entity(sources["title"], sources["summary"], sources["text"], sources["type_qids"])
+
+
+def build_pipeline(
+    output_dir: Path,
+    retries: int,
+    retry_delay: float,
+    thumb_width: Optional[int] = None,
+    fetch_workers: int = 1,
+    cpu_workers: int = 1,
+    classify_workers: int = 1,
+    queue_size: int = 16,
+    sleep_between: float = 0.0,
+    store: Optional[RecordStore] = None,
+) -> Pipeline:
+    """
+    fetch (threads) -> simplify (process pool if cpu_workers > 1) -> classify
+    (threads) -> write (to ``store`` if given, else one JSON file per entity).
+    """
+
+    def fetch(item: Prefetched) -> Dict[str, Any]:
+        try:
+            return fetch_with_retries(item, retries, retry_delay, thumb_width)
+        finally:
+            if sleep_between > 0:
+                time.sleep(sleep_between)
+
+    def write(classified: Tuple[Dict[str, Any], List[str]]) -> None:
+        sources, categories = classified
+        record = assemble_record(sources, categories)
+        if store is not None:
+            store.write(record)
+        else:
+            write_json(output_dir / f"{sources['entity_id']}.json", record)
+
+    return Pipeline(
+        [
+            Stage("fetch", fetch, workers=fetch_workers),
+            Stage("simplify", simplify_sources, workers=cpu_workers, processes=cpu_workers > 1),
+            Stage("classify", classify_sources, workers=classify_workers),
+            Stage("write", write),
+        ],
+        queue_size=queue_size,
+    )
+
+
+def stored_revisions(path: Path) -> Tuple[Optional[int], Optional[int]]:
+    """(wikidata_revid, wikipedia_revid) a parsed record was built from; (None, None) if unknown."""
+    try:
+        record = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None, None
+    return record.get("wikidata_revid"), record.get("wikipedia_revid")
+
+
+def changed_entities(entity_ids: List[str], output_dir: Path, store: Optional[RecordStore] = None) -> List[str]:
+    """Return the ids whose Wikidata item or enwiki page changed since they were parsed.
+
+    Current revisions are looked up in bulk (see current_revisions). Records
+    without stored revisions count as changed; entities that no longer exist
+    upstream are left alone. With a ``store``, stored revisions come from its
+    manifest instead of the per-entity files.
+    """
+    current = current_revisions(entity_ids, USER_AGENT)
+
+    def stored(qid: str) -> Tuple[Optional[int], Optional[int]]:
+        return store.revisions(qid) if store is not None else stored_revisions(output_dir / f"{qid}.json")
+
+    return [qid for qid in entity_ids if qid in current and stored(qid) != current[qid]]
+
+
+def previously_failed(output_dir: Path, store: Optional[RecordStore] = None) -> List[str]:
+    """Ids whose last attempt failed, from the store manifest or _failed_entities.json."""
+    if store is not None:
+        return store.ids_with_status("failed")
+    try:
+        failures = json.loads((output_dir / "_failed_entities.json").read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return []
+    return [f["entity_id"] for f in failures.get("failed", [])]
+
+
 def parse_args() -> argparse.Namespace:
     default_dir = Path(__file__).resolve().parent
 
@@ -67,13 +258,41 @@ def parse_args() -> argparse.Namespace:
         "--output-dir",
         type=Path,
         default=default_dir / "parsed",
-        help="Directory where <QID>.json files will be written.",
+        help="Directory where <QID>.json files (or the shards and manifest) will be written.",
+    )
+    parser.add_argument(
+        "--output-format",
+        choices=("files", "shards"),
+        default="files",
+        help=(
+            "files: one pretty-printed <QID>.json per entity; shards: compact records in "
+            "gzip-compressed JSONL shards plus a manifest.jsonl with status, hash and errors per entity."
+        ),
+    )
+    parser.add_argument(
+        "--shard-size",
+        type=int,
+        default=1000,
+        help="Records per shard with --output-format shards.",
+    )
+    parser.add_argument(
+        "--retry-failed",
+        action="store_true",
+        help="Only process entities whose last attempt failed.",
     )
     parser.add_argument(
         "--force",
         action="store_true",
         help="Reparse entities even if output JSON already exists.",
     )
+    parser.add_argument(
+        "--refresh",
+        action="store_true",
+        help=(
+            "Reparse existing entities only if their Wikidata item or Wikipedia page has a new "
+            "revision; refreshed ids are written to <output-dir>/_changed_entities.json."
+        ),
+    )
     parser.add_argument(
         "--limit",
         type=int,
@@ -102,7 +321,106 @@ def parse_args() -> argparse.Namespace:
         "--sleep-between",
         type=float,
         default=0.3,
-        help="Extra delay in seconds between entities (polite pacing).",
+        help="Extra delay in seconds between entities (polite pacing). Only used with --workers 1.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Threads fetching entities concurrently. Above 1, pacing comes from --rate-limits.",
+    )
+    parser.add_argument(
+        "--cpu-workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Processes simplifying page HTML (default: number of cores; 1 keeps it in-process).",
+    )
+    parser.add_argument(
+        "--classify-workers",
+        type=int,
+        default=None,
+        help="Threads sending classification requests to Ollama (default: --llm-batch-size x --llm-concurrency).",
+    )
+    parser.add_argument(
+        "--llm-batch-size",
+        type=int,
+        default=1,
+        help="Entities classified per Ollama request (1 sends one request per entity).",
+    )
+    parser.add_argument(
+        "--llm-concurrency",
+        type=int,
+        default=1,
+        help="Batched Ollama requests in flight at once.",
+    )
+    parser.add_argument(
+        "--classify-cache",
+        type=Path,
+        default=CLASSIFICATION_CACHE_PATH,
+        help="JSON lines cache of LLM classifications, keyed by model, prompt and input.",
+    )
+    parser.add_argument(
+        "--no-classify-cache",
+        action="store_true",
+        help="Send every uncovered entity to the LLM, even if it was classified before.",
+    )
+    parser.add_argument(
+        "--max-in-flight",
+        type=int,
+        default=None,
+        help="Capacity of each queue between pipeline stages (default: 2 x --workers).",
+    )
+    parser.add_argument(
+        "--rate-limits",
+        default=DEFAULT_RATE_LIMITS,
+        help=f"Per-host request rates as host=req_per_sec,... (default: {DEFAULT_RATE_LIMITS}).",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=WBGETENTITIES_MAX_IDS,
+        help=f"Wikidata entities fetched per wbgetentities call (1 disables batching, max {WBGETENTITIES_MAX_IDS}).",
+    )
+    parser.add_argument(
+        "--thumb-width",
+        type=int,
+        default=None,
+        help="Also store a thumbnail_url scaled to at most this many pixels wide.",
+    )
+    parser.add_argument(
+        "--wikipedia-fetch",
+        choices=WIKIPEDIA_FETCH_MODES,
+        default="full",
+        help=(
+            "full: rendered page + REST summary; lean: render only the sections that are kept "
+            "(same text, smaller downloads) and take the summary from the lead paragraph."
+        ),
+    )
+    parser.add_argument(
+        "--type-cache",
+        type=Path,
+        default=TYPE_CATEGORIES_PATH,
+        help="JSON cache of Wikidata P279 parents used by the type -> category table.",
+    )
+    parser.add_argument(
+        "--no-type-table",
+        action="store_true",
+        help="Classify every entity with the LLM instead of mapping known P31 types.",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        type=Path,
+        default=default_dir / ".http_cache",
+        help="Directory for the compressed on-disk HTTP response cache.",
+    )
+    parser.add_argument(
+        "--cache-mode",
+        choices=CACHE_MODES,
+        default="off",
+        help=(
+            "off: no cache; revalidate: conditional requests against cached ETag/Last-Modified; "
+            "prefer: serve cached responses, fetch misses; only: offline, fail on misses."
+        ),
     )
     return parser.parse_args()
 
@@ -124,69 +442,157 @@ def main() -> int:
         print(f"--start ({args.start}) is out of range for {total_unique} entities.", file=sys.stderr)
         return 1
 
+    if args.classify_workers is None:
+        args.classify_workers = args.llm_batch_size * args.llm_concurrency
+    for name in ("workers", "cpu_workers", "classify_workers", "llm_batch_size", "llm_concurrency"):
+        if getattr(args, name) < 1:
+            print(f"--{name.replace('_', '-')} must be >= 1", file=sys.stderr)
+            return 1
+    if not 1 <= args.batch_size <= WBGETENTITIES_MAX_IDS:
+        print(f"--batch-size must be between 1 and {WBGETENTITIES_MAX_IDS}", file=sys.stderr)
+        return 1
+    try:
+        rates = parse_rate_spec(args.rate_limits)
+    except ValueError as exc:
+        print(str(exc), file=sys.stderr)
+        return 1
+
     ids_to_process = entity_ids[args.start:]
     if args.limit is not None:
         ids_to_process = ids_to_process[: max(0, args.limit)]
 
     args.output_dir.mkdir(parents=True, exist_ok=True)
+    store = RecordStore(args.output_dir, shard_size=args.shard_size) if args.output_format == "shards" else None
+    if args.retry_failed:
+        retry = set(previously_failed(args.output_dir, store))
+        ids_to_process = [qid for qid in ids_to_process if qid in retry]
 
     print(f"Loaded {total_unique} unique entity IDs from {args.input}")
     if invalid_rows:
         print(f"Skipped {invalid_rows} rows without a valid Wikidata entity URL in 'item'.")
     print(f"Processing {len(ids_to_process)} entities into {args.output_dir}")
 
+    RATE_LIMITER.clear()
+    for host, rate in rates.items():
+        RATE_LIMITER.set_rate(host, rate)
+    configure_http(args.cache_dir, args.cache_mode)
+    configure_wikipedia_fetch(args.wikipedia_fetch)
+    configure_type_categories(args.type_cache, enabled=not args.no_type_table)
+    configure_classification(
+        args.classify_cache,
+        cache_enabled=not args.no_classify_cache,
+        batch_size=args.llm_batch_size,
+        concurrency=args.llm_concurrency,
+    )
+
     failed: List[Dict[str, str]] = []
     created = 0
-    skipped_existing = 0
 
+    pending_ids: List[str] = []
+    existing_ids: List[str] = []
+    for qid in ids_to_process:
+        done = store.status(qid) == "ok" if store is not None else (args.output_dir / f"{qid}.json").exists()
+        if done and not args.force and not args.retry_failed:
+            existing_ids.append(qid)
+        else:
+            pending_ids.append(qid)
+
+    refreshed_ids: List[str] = []
+    if args.refresh and existing_ids:
+        try:
+            refreshed_ids = changed_entities(existing_ids, args.output_dir, store)
+        except Exception as exc:
+            print(f"Could not check current revisions: {exc}", file=sys.stderr)
+            return 1
+        print(f"{len(refreshed_ids)} of {len(existing_ids)} existing entities changed upstream")
+        pending_ids.extend(refreshed_ids)
+    skipped_existing = len(existing_ids) - len(refreshed_ids)
+
+    pipeline = build_pipeline(
+        args.output_dir,
+        args.retries,
+        args.retry_delay,
+        thumb_width=args.thumb_width,
+        fetch_workers=args.workers,
+        cpu_workers=args.cpu_workers,
+        classify_workers=args.classify_workers,
+        queue_size=args.max_in_flight or 2 * args.workers,
+        sleep_between=args.sleep_between if args.workers == 1 else 0.0,
+        store=store,
+    )
+
+    total = len(ids_to_process)
     use_tqdm = tqdm is not None
-    iterator = tqdm(ids_to_process, desc="Parsing entities", unit="entity") if use_tqdm else ids_to_process
+    progress = tqdm(total=total, initial=skipped_existing, desc="Parsing entities", unit="entity") if use_tqdm else None
     fallback_start = time.time()
+    last_report = 0.0
     if not use_tqdm:
         print("tqdm is not available; install with `uv add tqdm` for a live progress bar.")
 
-    total = len(ids_to_process)
-    for idx, qid in enumerate(iterator, start=1):
-        out_path = args.output_dir / f"{qid}.json"
-        if out_path.exists() and not args.force:
-            skipped_existing += 1
+    prefetched = iter_prefetched(pending_ids, args.batch_size, args.thumb_width)
+    for idx, (qid, _, error) in enumerate(
+        pipeline.run((item.entity_id, item) for item in prefetched),
+        start=skipped_existing + 1,
+    ):
+        if error is None:
+            created += 1
         else:
-            last_error = None
-            total_attempts = args.retries + 1
-            for attempt in range(1, total_attempts + 1):
-                try:
-                    data = build_json(qid)
-                    write_json(out_path, data)
-                    created += 1
-                    last_error = None
-                    break
-                except Exception as exc:
-                    last_error = exc
-                    if attempt < total_attempts:
-                        delay = args.retry_delay * (2 ** (attempt - 1))
-                        time.sleep(delay)
-
-            if last_error is not None:
-                failed.append({"entity_id": qid, "error": str(last_error)})
-
-        if args.sleep_between > 0 and idx < total:
-            time.sleep(args.sleep_between)
-
-        if not use_tqdm and (idx == 1 or idx % 25 == 0 or idx == total):
+            failed.append({"entity_id": qid, "error": error})
+            if store is not None:
+                store.mark_failed(qid, error)
+
+        if progress is not None:
+            progress.update(1)
+            if time.time() - last_report >= 1:
+                progress.set_postfix_str(pipeline.report(), refresh=False)
+                last_report = time.time()
+        elif idx == skipped_existing + 1 or idx % 25 == 0 or idx == total:
             elapsed = time.time() - fallback_start
-            rate = (idx / elapsed) if elapsed > 0 else 0.0
+            done_here = idx - skipped_existing
+            rate = (done_here / elapsed) if elapsed > 0 else 0.0
             eta = ((total - idx) / rate) if rate > 0 else 0.0
             print(f"[{idx}/{total}] elapsed={elapsed/60:.1f}m eta={eta/60:.1f}m rate={rate:.2f} entities/s")
+            print(f"  {pipeline.report()}")
+
+    if progress is not None:
+        progress.close()
+    if store is not None:
+        store.close()
 
     print("\nRun finished")
     print(f"Created: {created}")
     print(f"Skipped existing: {skipped_existing}")
+    if args.refresh:
+        failed_ids = {f["entity_id"] for f in failed}
+        changed = [qid for qid in refreshed_ids if qid not in failed_ids]
+        write_json(args.output_dir / "_changed_entities.json", {"changed": changed})
+        print(f"Refreshed: {len(changed)} (audio can be regenerated with `ai/test/test_batch.py --changed`)")
     print(f"Failed: {len(failed)}")
+    for stage in pipeline.stages:
+        stats = stage.stats()
+        print(
+            f"Stage {stats['name']}: {stats['processed']} items, {stats['failed']} failed, "
+            f"{stats['rate']:.2f}/s, busy {stats['busy_s']:.1f}s"
+        )
+    classify_stats = wikidata_entity_to_json.CLASSIFY_STATS
+    print(
+        f"Classified: {classify_stats['type_table']} by type table, {classify_stats['cache']} from cache, "
+        f"{classify_stats['llm']} by LLM"
+    )
+    http_stats = wikidata_entity_to_json.HTTP.stats
+    print(
+        f"HTTP: {http_stats['network']} network requests, {http_stats['cache_hits']} cache hits, "
+        f"{http_stats['revalidated']} revalidated (304)"
+    )
 
-    if failed:
-        failures_path = args.output_dir / "_failed_entities.json"
+    failures_path = args.output_dir / "_failed_entities.json"
+    if failed and store is not None:
+        print(f"Failure details recorded in: {args.output_dir / 'manifest.jsonl'}")
+    elif failed:
         write_json(failures_path, {"failed": failed})
         print(f"Failure details written to: {failures_path}")
+    elif args.retry_failed and failures_path.exists():
+        failures_path.unlink()
 
     return 0 if not failed else 2
 
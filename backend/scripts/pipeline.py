@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Staged pipeline for the ingestion scripts.
+
+Items flow through a list of stages connected by bounded queues, so a slow
+stage applies backpressure to the ones before it instead of letting work pile
+up in memory. Each stage runs on its own worker threads; a stage with
+``processes=True`` hands its items to a process pool (the function and its
+argument must be picklable), so CPU-bound work uses all cores while I/O
+stages keep requests in flight.
+
+An item that fails in one stage carries its error to the end and is not
+passed to the remaining stage functions.
+"""
+import multiprocessing
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, Hashable, Iterable, Iterator, List, Optional, Tuple
+
+_DONE = object()
+
+
+def _process_context():
+    # Forking a process that already runs threads can deadlock the child;
+    # forkserver children are forked from a clean single-threaded server.
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else None)
+
+
+class Stage:
+    def __init__(self, name: str, fn: Callable[[Any], Any], workers: int = 1, processes: bool = False):
+        if workers < 1:
+            raise ValueError(f"Stage {name!r} needs at least one worker")
+        self.name = name
+        self.fn = fn
+        self.workers = workers
+        self.processes = processes
+        self.processed = 0
+        self.failed = 0
+        self.busy_s = 0.0
+        self.started_at: Optional[float] = None
+        self.inbox: "queue.Queue" = queue.Queue()
+        self._lock = threading.Lock()
+        self._running = 0
+
+    def _record(self, elapsed: float, ok: bool) -> None:
+        with self._lock:
+            self.processed += 1
+            self.failed += 0 if ok else 1
+            self.busy_s += elapsed
+
+    def stats(self) -> Dict[str, Any]:
+        """Items done, items/s since the stage started, and current input queue depth."""
+        elapsed = time.monotonic() - self.started_at if self.started_at is not None else 0.0
+        return {
+            "name": self.name,
+            "processed": self.processed,
+            "failed": self.failed,
+            "rate": self.processed / elapsed if elapsed > 0 else 0.0,
+            "busy_s": self.busy_s,
+            "queue": self.inbox.qsize(),
+        }
+
+
+class Pipeline:
+    """Run ``(key, value)`` items through ``stages``; ``run`` yields ``(key, value, error)``."""
+
+    def __init__(self, stages: List[Stage], queue_size: int = 32):
+        if not stages:
+            raise ValueError("Pipeline needs at least one stage")
+        self.stages = stages
+        self.queue_size = max(1, queue_size)
+
+    def report(self) -> str:
+        return " | ".join(
+            f"{s['name']} {s['processed']} ({s['rate']:.1f}/s, q={s['queue']})"
+            for s in (stage.stats() for stage in self.stages)
+        )
+
+    def run(self, items: Iterable[Tuple[Hashable, Any]]) -> Iterator[Tuple[Hashable, Any, Optional[str]]]:
+        results: "queue.Queue" = queue.Queue(maxsize=self.queue_size)
+        for stage in self.stages:
+            stage.inbox = queue.Queue(maxsize=self.queue_size)
+            stage.started_at = time.monotonic()
+            stage._running = stage.workers
+        outboxes = [stage.inbox for stage in self.stages[1:]] + [results]
+
+        pools: Dict[int, ProcessPoolExecutor] = {}
+        for index, stage in enumerate(self.stages):
+            if stage.processes:
+                pools[index] = ProcessPoolExecutor(max_workers=stage.workers, mp_context=_process_context())
+                # Start the worker processes up front so startup is not billed to the first item.
+                pools[index].submit(int).result()
+
+        feed_error: List[BaseException] = []
+
+        def feed() -> None:
+            try:
+                for key, value in items:
+                    self.stages[0].inbox.put((key, value, None))
+            except BaseException as exc:  # surfaced to the caller after draining
+                feed_error.append(exc)
+            finally:
+                for _ in range(self.stages[0].workers):
+                    self.stages[0].inbox.put(_DONE)
+
+        def work(index: int) -> None:
+            stage, outbox = self.stages[index], outboxes[index]
+            pool = pools.get(index)
+            next_workers = self.stages[index + 1].workers if index + 1 < len(self.stages) else 1
+            while True:
+                item = stage.inbox.get()
+                if item is _DONE:
+                    break
+                key, value, error = item
+                if error is None:
+                    started = time.monotonic()
+                    try:
+                        value = pool.submit(stage.fn, value).result() if pool else stage.fn(value)
+                    except Exception as exc:
+                        error = f"{stage.name}: {exc}"
+                    stage._record(time.monotonic() - started, error is None)
+                outbox.put((key, value, error))
+            with stage._lock:
+                stage._running -= 1
+                last = stage._running == 0
+            if last:
+                for _ in range(next_workers):
+                    outbox.put(_DONE)
+
+        threads = [threading.Thread(target=feed, name="pipeline-feed", daemon=True)]
+        for index, stage in enumerate(self.stages):
+            threads.extend(
+                threading.Thread(target=work, args=(index,), name=f"pipeline-{stage.name}-{n}", daemon=True)
+                for n in range(stage.workers)
+            )
+        for thread in threads:
+            thread.start()
+
+        try:
+            while True:
+                item = results.get()
+                if item is _DONE:
+                    break
+                yield item
+            if feed_error:
+                raise feed_error[0]
+        finally:
+            for pool in pools.values():
+                pool.shutdown(cancel_futures=True)
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""Thread-safe per-host token-bucket rate limiting for the ingestion scripts."""
+import threading
+import time
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+
+class TokenBucket:
+    """Classic token bucket: ``rate`` tokens per second, up to ``burst`` banked.
+
+    ``acquire`` reserves a token immediately and sleeps outside the lock, so
+    concurrent callers are spaced out evenly instead of waking up together.
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        if rate <= 0:
+            raise ValueError("rate must be > 0")
+        self.rate = rate
+        self.capacity = burst if burst is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Take one token, blocking until it is available. Returns seconds waited."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+class HostRateLimiter:
+    """Maps URL hosts to token buckets. Hosts without a configured rate are not limited."""
+
+    def __init__(self, rates: Optional[Dict[str, float]] = None):
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+        for host, rate in (rates or {}).items():
+            self.set_rate(host, rate)
+
+    def set_rate(self, host: str, rate: float, burst: Optional[float] = None) -> None:
+        with self._lock:
+            self._buckets[host.lower()] = TokenBucket(rate, burst)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+
+    def acquire(self, url: str) -> float:
+        """Block until a request to ``url``'s host is allowed. Returns seconds waited."""
+        host = (urlsplit(url).hostname or "").lower()
+        with self._lock:
+            bucket = self._buckets.get(host)
+        return bucket.acquire() if bucket is not None else 0.0
+
+
+def parse_rate_spec(spec: str) -> Dict[str, float]:
+    """Parse ``host=rate[,host=rate...]`` (requests per second) into a dict."""
+    rates: Dict[str, float] = {}
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        host, sep, value = part.partition("=")
+        if not sep or not host.strip():
+            raise ValueError(f"Invalid rate limit {part!r}; expected host=requests_per_second")
+        rate = float(value)
+        if rate <= 0:
+            raise ValueError(f"Rate for {host.strip()!r} must be > 0")
+        rates[host.strip().lower()] = rate
+    return rates
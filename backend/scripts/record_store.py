@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Sharded, compressed store for parsed entity records.
+
+Layout of a store directory:
+
+- ``records-NNNNN.jsonl.gz``: one compact JSON record per line. Every writer
+  session starts a new shard and rotates after ``shard_size`` records.
+- ``manifest.jsonl``: append-only log with one line per entity outcome:
+  ``{"entity_id", "status": "ok"|"failed", "shard", "index", "sha256",
+  "wikidata_revid", "wikipedia_revid", "error", "updated_at"}``. Replaying
+  it (later lines win) gives the current state of every entity.
+
+Resume, retry-failed-only and refresh decisions come from the manifest alone,
+and readers stream the shards sequentially, skipping records that a later
+write superseded. Manifest lines are only appended after the shard data they
+point to has been flushed, so after a crash the manifest never references a
+record that cannot be read; unflushed records are simply parsed again.
+"""
+import datetime as dt
+import gzip
+import hashlib
+import json
+import re
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+MANIFEST_NAME = "manifest.jsonl"
+SHARD_RE = re.compile(r"^records-(\d{5})\.jsonl\.gz$")
+
+
+def is_store(path: Path) -> bool:
+    return (path / MANIFEST_NAME).exists()
+
+
+class RecordStore:
+    def __init__(self, root: Path, shard_size: int = 1000, flush_every: int = 50):
+        self.root = Path(root)
+        self.shard_size = max(1, shard_size)
+        self.flush_every = max(1, flush_every)
+        self._manifest: Optional[Dict[str, Dict[str, Any]]] = None
+        self._lock = threading.Lock()
+        self._shard: Optional[gzip.GzipFile] = None
+        self._shard_name: Optional[str] = None
+        self._shard_count = 0
+        self._unflushed: List[Dict[str, Any]] = []
+
+    # -- manifest ----------------------------------------------------------
+
+    @property
+    def manifest(self) -> Dict[str, Dict[str, Any]]:
+        """entity_id -> latest manifest entry (loaded on first use)."""
+        if self._manifest is None:
+            self._manifest = {}
+            path = self.root / MANIFEST_NAME
+            if path.exists():
+                with path.open(encoding="utf-8") as fh:
+                    for line in fh:
+                        try:
+                            entry = json.loads(line)
+                            self._manifest[entry["entity_id"]] = entry
+                        except (ValueError, KeyError, TypeError):
+                            continue  # partial last line of an interrupted run
+        return self._manifest
+
+    def status(self, entity_id: str) -> Optional[str]:
+        entry = self.manifest.get(entity_id)
+        return entry["status"] if entry else None
+
+    def ids_with_status(self, status: str) -> List[str]:
+        return [entity_id for entity_id, entry in self.manifest.items() if entry["status"] == status]
+
+    def revisions(self, entity_id: str) -> Tuple[Optional[int], Optional[int]]:
+        """(wikidata_revid, wikipedia_revid) of the stored record; (None, None) if there is none."""
+        entry = self.manifest.get(entity_id)
+        if not entry or "shard" not in entry:
+            return None, None
+        return entry.get("wikidata_revid"), entry.get("wikipedia_revid")
+
+    def _append_manifest(self, entries: List[Dict[str, Any]]) -> None:
+        if not entries:
+            return
+        self.root.mkdir(parents=True, exist_ok=True)
+        with (self.root / MANIFEST_NAME).open("a", encoding="utf-8") as fh:
+            fh.write("".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in entries))
+        for entry in entries:
+            self.manifest[entry["entity_id"]] = entry
+
+    # -- writing -----------------------------------------------------------
+
+    def _next_shard_name(self) -> str:
+        numbers = [int(m.group(1)) for p in self.root.glob("records-*.jsonl.gz") if (m := SHARD_RE.match(p.name))]
+        return f"records-{max(numbers, default=-1) + 1:05d}.jsonl.gz"
+
+    def _flush(self) -> None:
+        if self._shard is not None:
+            self._shard.flush()  # Z_SYNC_FLUSH: everything written so far is readable
+        self._append_manifest(self._unflushed)
+        self._unflushed = []
+
+    def _close_shard(self) -> None:
+        self._flush()
+        if self._shard is not None:
+            self._shard.close()
+        self._shard = None
+
+    def write(self, record: Dict[str, Any]) -> None:
+        line = json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        with self._lock:
+            if self._shard is None or self._shard_count >= self.shard_size:
+                self._close_shard()
+                self.root.mkdir(parents=True, exist_ok=True)
+                self._shard_name = self._next_shard_name()
+                self._shard = gzip.open(self.root / self._shard_name, "wb")
+                self._shard_count = 0
+            self._shard.write(line + b"\n")
+            self._unflushed.append(
+                {
+                    "entity_id": record["entity_id"],
+                    "status": "ok",
+                    "shard": self._shard_name,
+                    "index": self._shard_count,
+                    "sha256": hashlib.sha256(line).hexdigest(),
+                    "wikidata_revid": record.get("wikidata_revid"),
+                    "wikipedia_revid": record.get("wikipedia_revid"),
+                    "updated_at": dt.datetime.now(dt.timezone.utc).isoformat(),
+                }
+            )
+            self._shard_count += 1
+            if len(self._unflushed) >= self.flush_every:
+                self._flush()
+
+    def mark_failed(self, entity_id: str, error: str) -> None:
+        """Record a failure; a record stored by an earlier run stays readable."""
+        with self._lock:
+            entry = dict(self.manifest.get(entity_id) or {"entity_id": entity_id})
+            entry.update(status="failed", error=error, updated_at=dt.datetime.now(dt.timezone.utc).isoformat())
+            self._unflushed.append(entry)
+
+    def close(self) -> None:
+        with self._lock:
+            self._close_shard()
+
+    def __enter__(self) -> "RecordStore":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    # -- reading -----------------------------------------------------------
+
+    def iter_records(self) -> Iterator[Dict[str, Any]]:
+        """
+        Latest stored record of every entity, streamed shard by shard. Entities
+        whose last attempt failed yield the record of an earlier run, if any.
+        """
+        wanted: Dict[str, Dict[int, str]] = {}
+        for entry in self.manifest.values():
+            if "shard" in entry:
+                wanted.setdefault(entry["shard"], {})[entry["index"]] = entry["sha256"]
+
+        for shard in sorted(wanted):
+            positions = wanted[shard]
+            try:
+                with gzip.open(self.root / shard, "rb") as fh:
+                    for index, line in enumerate(fh):
+                        line = line.rstrip(b"\n")
+                        if positions.get(index) == hashlib.sha256(line).hexdigest():
+                            yield json.loads(line)
+            except EOFError:
+                continue  # shard of an interrupted run; its flushed part was read
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Deterministic Wikidata type -> category mapping.
+
+SEED_CATEGORIES maps well-known classes (church building, museum, park,
+stadium, ...) to categories. An entity's P31 types are mapped by walking up
+their P279 (subclass of) chain to the nearest seeded classes, so e.g.
+"Lutheran church" inherits the categories of "church building". The walk is
+done level by level with one batched lookup per level, and the discovered
+P279 parents are cached in a local JSON file so later runs resolve known
+types without any request.
+
+Types that reach no seed within MAX_DEPTH levels are left to the LLM classifier.
+"""
+import json
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+# Classes reachable from most things (building, structure, ...) are deliberately not seeded.
+SEED_CATEGORIES: Dict[str, Tuple[str, ...]] = {
+    # religious buildings
+    "Q16970": ("historic", "culture"),    # church building
+    "Q2977": ("historic", "culture"),     # cathedral
+    "Q24398318": ("historic", "culture"), # religious building
+    "Q44613": ("historic", "culture"),    # monastery
+    "Q32815": ("historic", "culture"),    # mosque
+    "Q34627": ("historic", "culture"),    # synagogue
+    "Q39614": ("historic",),              # cemetery
+    # heritage
+    "Q23413": ("historic",),              # castle
+    "Q751876": ("historic",),             # château
+    "Q16560": ("historic",),              # palace
+    "Q57821": ("historic",),              # fortification
+    "Q1785071": ("historic",),            # fort
+    "Q4989906": ("historic",),            # monument
+    "Q839954": ("historic",),             # archaeological site
+    "Q179700": ("historic", "culture"),   # statue
+    # culture
+    "Q33506": ("culture",),               # museum
+    "Q207694": ("culture",),              # art museum
+    "Q24354": ("culture",),               # theatre
+    "Q153562": ("culture",),              # opera house
+    "Q1060829": ("culture",),             # concert hall
+    "Q41253": ("culture", "activity"),    # movie theater
+    "Q7075": ("culture",),                # library
+    "Q3918": ("culture",),                # university
+    # nature
+    "Q22698": ("nature",),                # park
+    "Q1107656": ("nature",),              # garden
+    "Q167346": ("nature",),               # botanical garden
+    "Q23397": ("nature",),                # lake
+    "Q4022": ("nature",),                 # river
+    "Q23442": ("nature",),                # island
+    "Q8502": ("nature",),                 # mountain
+    "Q40080": ("nature",),                # beach
+    "Q43501": ("nature", "activity"),     # zoo
+    # sport
+    "Q1076486": ("sport",),               # sports venue
+    "Q483110": ("sport",),                # stadium
+    "Q641226": ("sport",),                # arena
+    "Q847017": ("sport",),                # sports club
+    "Q476028": ("sport",),                # association football club
+    # activity / nightlife
+    "Q194195": ("activity",),             # amusement park
+    "Q2416723": ("activity",),            # theme park
+    "Q11707": ("trendy",),                # restaurant
+    "Q30022": ("trendy",),                # café
+    "Q187456": ("trendy",),               # bar
+    "Q622425": ("trendy",),               # nightclub
+    # economy / politics
+    "Q11315": ("economic",),              # shopping center
+    "Q213441": ("economic",),             # shop
+    "Q22687": ("economic",),              # bank
+    "Q11691": ("economic",),              # stock exchange
+    "Q4830453": ("economic",),            # business
+    "Q16831714": ("political",),          # government building
+    "Q327333": ("political",),            # government agency
+    "Q3917681": ("political",),           # embassy
+}
+
+# How many P279 levels above a P31 type are searched for a seeded class.
+MAX_DEPTH = 5
+
+
+class TypeCategoryTable:
+    """Seeded type -> categories table with a cached P279 parent map.
+
+    ``path`` is the JSON cache of P279 parents (None keeps it in memory).
+    ``order`` fixes the order of returned categories.
+    """
+
+    def __init__(
+        self,
+        path: Optional[Path] = None,
+        seeds: Optional[Dict[str, Tuple[str, ...]]] = None,
+        order: Sequence[str] = (),
+        max_depth: int = MAX_DEPTH,
+    ):
+        self.path = Path(path) if path is not None else None
+        self.seeds = SEED_CATEGORIES if seeds is None else seeds
+        self.order = {category: index for index, category in enumerate(order)}
+        self.max_depth = max_depth
+        self._parents: Dict[str, List[str]] = {}
+        self._resolved: Dict[str, Tuple[str, ...]] = {}
+        self._lock = threading.Lock()
+        if self.path is not None and self.path.exists():
+            try:
+                self._parents = json.loads(self.path.read_text(encoding="utf-8")).get("parents", {})
+            except (OSError, ValueError):
+                self._parents = {}
+
+    def _save(self) -> None:
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        tmp_path.write_text(json.dumps({"parents": self._parents}, sort_keys=True), encoding="utf-8")
+        tmp_path.replace(self.path)
+
+    def _walk(self, type_qid: str) -> Tuple[Tuple[str, ...], Set[str]]:
+        """Categories of the nearest seeded ancestors, and classes whose parents are still unknown."""
+        level, seen = [type_qid], {type_qid}
+        for depth in range(self.max_depth + 1):
+            seeded = [qid for qid in level if qid in self.seeds]
+            if seeded:
+                return tuple({c for qid in seeded for c in self.seeds[qid]}), set()
+            if depth == self.max_depth:
+                break
+            unknown = {qid for qid in level if qid not in self._parents}
+            if unknown:
+                return (), unknown
+            level = [p for qid in level for p in self._parents[qid] if p not in seen]
+            seen.update(level)
+            if not level:
+                break
+        return (), set()
+
+    def missing(self, type_qids: Iterable[str]) -> List[str]:
+        """Classes whose P279 parents are needed to resolve ``type_qids``."""
+        with self._lock:
+            todo: Set[str] = set()
+            for type_qid in type_qids:
+                todo |= self._walk(type_qid)[1]
+        return sorted(todo)
+
+    def resolve(
+        self, type_qids: Iterable[str], fetch_parents: Callable[[List[str]], Dict[str, List[str]]]
+    ) -> int:
+        """Fetch P279 parents level by level until ``type_qids`` resolve; returns lookups made."""
+        type_qids = list(type_qids)
+        lookups = 0
+        for _ in range(self.max_depth + 1):
+            todo = self.missing(type_qids)
+            if not todo:
+                break
+            fetched = fetch_parents(todo)
+            lookups += 1
+            with self._lock:
+                for qid in todo:
+                    # Unknown or deleted classes get no parents, so they are not asked for again.
+                    self._parents[qid] = list(fetched.get(qid, []))
+                self._resolved.clear()
+                self._save()
+        return lookups
+
+    def categories_for(self, type_qids: Iterable[str]) -> Optional[List[str]]:
+        """Union of the categories of ``type_qids``, or None if none of them is covered."""
+        categories: Set[str] = set()
+        with self._lock:
+            for type_qid in type_qids:
+                if type_qid not in self._resolved:
+                    found, unknown = self._walk(type_qid)
+                    if unknown:
+                        continue
+                    self._resolved[type_qid] = found
+                categories.update(self._resolved[type_qid])
+        if not categories:
+            return None
+        return sorted(categories, key=lambda c: (self.order.get(c, len(self.order)), c))
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+Offline ingestion from a local Wikidata JSON dump (latest-all.json[.gz|.bz2]).
+
+The dump is one entity per line inside a top-level JSON array. Lines are
+streamed in chunks, so memory use does not grow with the dump. Entities
+whose P625 coordinates lie in a bounding box are written as parsed records
+in the same format as build_json; only Wikidata fields are filled (image URLs
+are derived from the Commons file name, categories come from the type table
+when its cache already covers the entity's types). The Wikipedia summary and
+text are left empty and ``wikipedia_revid`` is None, so
+``parse_all_entities.py --input dump_entities.json --refresh`` later
+fetches exactly those entities that have an English article.
+
+Plain dumps are split into byte ranges that the worker processes read
+themselves. Compressed dumps cannot be seeked, so they are decompressed by
+the main process and the decompressed chunks are parsed by the workers.
+
+    uv run python scripts/wikidata_dump.py latest-all.json.gz --bbox 17.8,59.2,18.3,59.45
+"""
+import argparse
+import bz2
+import gzip
+import hashlib
+import json
+import os
+import sys
+import time
+from functools import partial
+from pathlib import Path
+from typing import IO, Any, Dict, Iterator, List, NamedTuple, Optional
+from urllib.parse import quote
+
+import wikidata_entity_to_json as w2j
+from parse_all_entities import write_json
+from pipeline import Pipeline, Stage
+
+COMMONS_UPLOAD_URL = "https://upload.wikimedia.org/wikipedia/commons"
+# Bytes of dump per work item; large enough to amortize process hand-off.
+CHUNK_BYTES = 32 * 1024 * 1024
+# Every entity with coordinates has this in its line; checked before json.loads.
+_P625_MARKER = b'"P625"'
+
+
+class BoundingBox(NamedTuple):
+    min_lon: float
+    min_lat: float
+    max_lon: float
+    max_lat: float
+
+    def contains(self, lat: Optional[float], lon: Optional[float]) -> bool:
+        if lat is None or lon is None:
+            return False
+        return self.min_lat <= lat <= self.max_lat and self.min_lon <= lon <= self.max_lon
+
+
+def parse_bbox(spec: str) -> BoundingBox:
+    """Parse "min_lon,min_lat,max_lon,max_lat" (west,south,east,north)."""
+    try:
+        values = [float(part) for part in spec.split(",")]
+    except ValueError:
+        values = []
+    if len(values) != 4:
+        raise ValueError(f"Invalid bounding box {spec!r}; expected min_lon,min_lat,max_lon,max_lat")
+    bbox = BoundingBox(*values)
+    if bbox.min_lon > bbox.max_lon or bbox.min_lat > bbox.max_lat:
+        raise ValueError(f"Invalid bounding box {spec!r}; minimum exceeds maximum")
+    return bbox
+
+
+class DumpChunk(NamedTuple):
+    """Work item: bytes ``start``-``end`` of a plain dump at ``path``, or already read ``data``."""
+
+    path: Optional[str]
+    start: int
+    end: int
+    data: Optional[bytes] = None
+
+
+def is_compressed(path: Path) -> bool:
+    return path.suffix in (".gz", ".bz2")
+
+
+def open_dump(path: Path) -> IO[bytes]:
+    if path.suffix == ".gz":
+        return gzip.open(path, "rb")
+    if path.suffix == ".bz2":
+        return bz2.open(path, "rb")
+    return open(path, "rb")
+
+
+def iter_range_lines(path: Path, start: int, end: int) -> Iterator[bytes]:
+    """Lines of a plain dump that begin in [start, end); each line belongs to exactly one range."""
+    with open(path, "rb") as fh:
+        if start > 0:
+            # Finish the line that straddles ``start``; it belongs to the previous range.
+            fh.seek(start - 1)
+            fh.readline()
+        while fh.tell() < end:
+            line = fh.readline()
+            if not line:
+                break
+            yield line
+
+
+def iter_chunks(path: Path, chunk_bytes: int = CHUNK_BYTES) -> Iterator[DumpChunk]:
+    if not is_compressed(path):
+        size = path.stat().st_size
+        for start in range(0, size, chunk_bytes):
+            yield DumpChunk(str(path), start, min(start + chunk_bytes, size))
+        return
+
+    with open_dump(path) as fh:
+        offset = 0
+        while True:
+            data = fh.read(chunk_bytes)
+            if not data:
+                break
+            data += fh.readline()  # end on a line boundary
+            yield DumpChunk(None, offset, offset + len(data), data)
+            offset += len(data)
+
+
+def parse_dump_line(line: bytes) -> Optional[dict]:
+    """The entity on one dump line, or None for the array brackets and blank lines."""
+    line = line.strip()
+    if line.endswith(b","):
+        line = line[:-1]
+    if not line or line in (b"[", b"]"):
+        return None
+    return json.loads(line)
+
+
+def commons_upload_url(filename: str) -> str:
+    """Direct upload.wikimedia.org URL of a Commons file, without an API request."""
+    name = filename.strip().replace(" ", "_")
+    name = name[:1].upper() + name[1:]
+    digest = hashlib.md5(name.encode("utf-8")).hexdigest()
+    # Same characters MediaWiki leaves unescaped in file URLs.
+    return f"{COMMONS_UPLOAD_URL}/{digest[0]}/{digest[:2]}/{quote(name, safe=';@$!*(),/~:')}"
+
+
+def dump_sources(entity: dict) -> Dict[str, Any]:
+    """Like fetch_sources, but only from the Wikidata entity (no requests)."""
+    lat, lon = w2j.extract_lat_lon(entity)
+    p18_filename = w2j.extract_wikidata_p18_filename(entity)
+    return {
+        "entity_id": entity["id"],
+        "title": w2j.extract_enwiki_title(entity),
+        "latitude": lat,
+        "longitude": lon,
+        "type_qids": w2j.extract_type_qids(entity),
+        "image_url": commons_upload_url(p18_filename) if p18_filename else None,
+        "thumbnail_url": None,
+        "summary": None,
+        "text": None,
+        "wikidata_revid": entity.get("lastrevid"),
+        "wikipedia_revid": None,
+    }
+
+
+def dump_record(sources: Dict[str, Any]) -> Dict[str, Any]:
+    """A parsed record from dump_sources; see the module docstring for what is left empty."""
+    table = w2j.TYPE_CATEGORIES
+    categories = table.categories_for(sources["type_qids"]) if table is not None else None
+    return w2j.assemble_record(sources, categories or ["other"])
+
+
+def entity_row(record: Dict[str, Any]) -> Dict[str, str]:
+    """A row in the all_entities.json format read by parse_all_entities.py."""
+    row = {
+        "item": f"http://www.wikidata.org/entity/{record['entity_id']}",
+        "coord": f"Point({record['longitude']} {record['latitude']})",
+    }
+    if record["title"]:
+        row["itemLabel"] = record["title"]
+        row["article"] = "https://en.wikipedia.org/wiki/" + quote(record["title"].replace(" ", "_"))
+    return row
+
+
+def scan_chunk(chunk: DumpChunk, bbox: BoundingBox) -> List[Dict[str, Any]]:
+    """dump_sources of the entities of ``chunk`` located inside ``bbox``."""
+    if chunk.data is not None:
+        lines: Any = chunk.data.splitlines()
+    else:
+        lines = iter_range_lines(Path(chunk.path), chunk.start, chunk.end)
+
+    found = []
+    for line in lines:
+        if _P625_MARKER not in line:
+            continue
+        entity = parse_dump_line(line)
+        if entity is None or entity.get("type", "item") != "item":
+            continue
+        if bbox.contains(*w2j.extract_lat_lon(entity)):
+            found.append(dump_sources(entity))
+    return found
+
+
+def iter_region(
+    path: Path, bbox: BoundingBox, processes: int = 1, chunk_bytes: int = CHUNK_BYTES
+) -> Iterator[Dict[str, Any]]:
+    """
+    Stream the records of all entities inside ``bbox``. Chunks are scanned by
+    ``processes`` workers; records are assembled here, so the type table
+    configured in this process is used.
+    """
+    stage = Stage("scan", partial(scan_chunk, bbox=bbox), workers=processes, processes=processes > 1)
+    # Two chunks per worker keep the workers busy while bounding decompressed data in memory.
+    pipeline = Pipeline([stage], queue_size=2 * processes)
+    for start, found, error in pipeline.run((chunk.start, chunk) for chunk in iter_chunks(path, chunk_bytes)):
+        if error is not None:
+            raise RuntimeError(f"{path} at byte {start}: {error}")
+        for sources in found:
+            yield dump_record(sources)
+
+
+def parse_args() -> argparse.Namespace:
+    default_dir = Path(__file__).resolve().parent
+
+    parser = argparse.ArgumentParser(
+        description="Build parsed JSON files for the entities of a Wikidata JSON dump inside a bounding box."
+    )
+    parser.add_argument("dump", type=Path, help="Wikidata JSON dump (.json, .json.gz or .json.bz2).")
+    parser.add_argument(
+        "--bbox",
+        required=True,
+        help="Region as min_lon,min_lat,max_lon,max_lat (west,south,east,north).",
+    )
+    parser.add_argument(
+        "--output-dir",
+        type=Path,
+        default=default_dir / "parsed",
+        help="Directory where <QID>.json files will be written.",
+    )
+    parser.add_argument(
+        "--entities-file",
+        type=Path,
+        default=default_dir / "dump_entities.json",
+        help="Where to list the region's entities, for parse_all_entities.py --input.",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Overwrite records that already exist (e.g. with Wikipedia text from an earlier run).",
+    )
+    parser.add_argument(
+        "--processes",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Processes parsing dump chunks (default: number of cores).",
+    )
+    parser.add_argument(
+        "--type-cache",
+        type=Path,
+        default=w2j.TYPE_CATEGORIES_PATH,
+        help="JSON cache of Wikidata P279 parents used by the type -> category table (read only).",
+    )
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+
+    if not args.dump.exists():
+        print(f"Dump not found: {args.dump}", file=sys.stderr)
+        return 1
+    if args.processes < 1:
+        print("--processes must be >= 1", file=sys.stderr)
+        return 1
+    try:
+        bbox = parse_bbox(args.bbox)
+    except ValueError as exc:
+        print(str(exc), file=sys.stderr)
+        return 1
+
+    w2j.configure_type_categories(args.type_cache)
+    args.output_dir.mkdir(parents=True, exist_ok=True)
+
+    started = time.time()
+    created = 0
+    skipped_existing = 0
+    rows: List[Dict[str, str]] = []
+    for record in iter_region(args.dump, bbox, args.processes):
+        rows.append(entity_row(record))
+        path = args.output_dir / f"{record['entity_id']}.json"
+        if path.exists() and not args.force:
+            skipped_existing += 1
+            continue
+        write_json(path, record)
+        created += 1
+
+    write_json(args.entities_file, rows)
+
+    print(f"Scanned {args.dump} in {(time.time() - started) / 60:.1f}m")
+    print(f"Found {len(rows)} entities in the bounding box, listed in {args.entities_file}")
+    print(f"Created: {created}")
+    print(f"Skipped existing: {skipped_existing}")
+    print(
+        "Fetch their Wikipedia text with "
+        f"`scripts/parse_all_entities.py --input {args.entities_file} --refresh`."
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -3,12 +3,22 @@ import sys
 import json
 import re
 import datetime as dt
+import threading
+from html import unescape
+from pathlib import Path
 from typing import Optional, Tuple, Any, Dict, List, Set
 
-import requests
 from bs4 import BeautifulSoup, Tag, NavigableString
 
+from batcher import Batcher
+from classification_cache import ClassificationCache, cache_key
+from html_simplify import STOP_SECTIONS, simple_html_text, simplify_html
+from http_client import HttpClient
+from rate_limit import HostRateLimiter
+from type_categories import TypeCategoryTable
+
 WIKIDATA_ENTITYDATA_URL = "https://www.wikidata.org/wiki/Special:EntityData/{entity_id}.json"
+WIKIDATA_API_URL = "https://www.wikidata.org/w/api.php"
 WIKIPEDIA_API_URL = "https://en.wikipedia.org/w/api.php"
 WIKIPEDIA_REST_SUMMARY_URL = "https://en.wikipedia.org/api/rest_v1/page/summary/{title}"
 COMMONS_API_URL = "https://commons.wikimedia.org/w/api.php"
@@ -27,21 +37,92 @@ ALLOWED_CATEGORIES_ORDER: List[str] = [
 ]
 ALLOWED_CATEGORIES: Set[str] = set(ALLOWED_CATEGORIES_ORDER)
 
+# Put your contact email/team page if you have it
+USER_AGENT = "wikidata-wikipedia-hackathon-script/1.1 (contact: you@example.com)"
+
+# wbgetentities accepts at most 50 ids per request.
+WBGETENTITIES_MAX_IDS = 50
+# imageinfo accepts at most 50 titles per request.
+COMMONS_MAX_TITLES = 50
+# action=query accepts at most 50 titles per request.
+WIKIPEDIA_MAX_TITLES = 50
+# "full": rendered page + REST summary; "lean": only the sections that are kept
+# (see wikipedia_lean_page), summary from the lead. Set by configure_wikipedia_fetch.
+WIKIPEDIA_FETCH_MODES = ("full", "lean")
+WIKIPEDIA_FETCH_MODE = "full"
+# Claims read by build_json (coordinates, instance of, image).
+USED_CLAIMS = ("P625", "P31", "P18")
+
+# Shared by all threads; hosts without a configured rate are not limited.
+RATE_LIMITER = HostRateLimiter()
+
+# Pooled keep-alive sessions + optional on-disk response cache (see configure_http).
+HTTP = HttpClient(rate_limiter=RATE_LIMITER)
+
+# P31 type -> categories, with P279 parents cached on disk (see configure_type_categories).
+TYPE_CATEGORIES_PATH = Path(__file__).resolve().parent / ".type_hierarchy.json"
+TYPE_CATEGORIES: Optional[TypeCategoryTable] = TypeCategoryTable(TYPE_CATEGORIES_PATH, order=ALLOWED_CATEGORIES_ORDER)
+
+# LLM results keyed by model + system prompt + payload sent (see configure_classification).
+CLASSIFICATION_CACHE_PATH = Path(__file__).resolve().parent / ".classification_cache.jsonl"
+CLASSIFICATION_CACHE: Optional[ClassificationCache] = ClassificationCache(CLASSIFICATION_CACHE_PATH)
+# Set by configure_classification(batch_size > 1); None sends one request per entity.
+LLM_BATCHER: Optional[Batcher] = None
+
+# How entities were classified in this process.
+CLASSIFY_STATS = {"type_table": 0, "cache": 0, "llm": 0}
+_CLASSIFY_STATS_LOCK = threading.Lock()
+
 
 def utc_now_iso() -> str:
     return dt.datetime.now(dt.timezone.utc).isoformat()
 
 
+def configure_http(cache_dir: Optional[Path] = None, cache_mode: str = "off") -> HttpClient:
+    """Replace the shared HTTP client, e.g. to enable the on-disk response cache."""
+    global HTTP
+    HTTP = HttpClient(rate_limiter=RATE_LIMITER, cache_dir=cache_dir, cache_mode=cache_mode)
+    return HTTP
+
+
+def configure_type_categories(path: Optional[Path] = TYPE_CATEGORIES_PATH, enabled: bool = True) -> Optional[TypeCategoryTable]:
+    """Replace the shared type table (``path=None`` keeps it in memory); ``enabled=False`` always uses the LLM."""
+    global TYPE_CATEGORIES
+    TYPE_CATEGORIES = TypeCategoryTable(path, order=ALLOWED_CATEGORIES_ORDER) if enabled else None
+    return TYPE_CATEGORIES
+
+
+def configure_wikipedia_fetch(mode: str = "full") -> None:
+    global WIKIPEDIA_FETCH_MODE
+    if mode not in WIKIPEDIA_FETCH_MODES:
+        raise ValueError(f"Wikipedia fetch mode must be one of {', '.join(WIKIPEDIA_FETCH_MODES)}")
+    WIKIPEDIA_FETCH_MODE = mode
+
+
+def configure_classification(
+    cache_path: Optional[Path] = CLASSIFICATION_CACHE_PATH,
+    cache_enabled: bool = True,
+    batch_size: int = 1,
+    concurrency: int = 1,
+    max_wait: float = 0.05,
+) -> Optional[ClassificationCache]:
+    """Replace the LLM result cache (``cache_path=None`` keeps it in memory) and batching setup."""
+    global CLASSIFICATION_CACHE, LLM_BATCHER
+    CLASSIFICATION_CACHE = ClassificationCache(cache_path) if cache_enabled else None
+    LLM_BATCHER = (
+        Batcher(classify_payloads_with_ollama, batch_size=batch_size, max_wait=max_wait, concurrency=concurrency)
+        if batch_size > 1
+        else None
+    )
+    return CLASSIFICATION_CACHE
+
+
 def http_get_json(url: str, *, headers: Optional[dict] = None, params: Optional[dict] = None) -> dict:
-    r = requests.get(url, headers=headers, params=params, timeout=30)
-    r.raise_for_status()
-    return r.json()
+    return HTTP.get_json(url, headers=headers, params=params)
 
 
 def http_post_json(url: str, *, headers: Optional[dict] = None, data: Optional[str] = None) -> dict:
-    r = requests.post(url, headers=headers, data=data.encode("utf-8") if isinstance(data, str) else data, timeout=30)
-    r.raise_for_status()
-    return r.json()
+    return HTTP.post_json(url, headers=headers, data=data.encode("utf-8") if isinstance(data, str) else data)
 
 
 def coerce_entity_categories(candidate: Any) -> List[str]:
@@ -91,27 +172,7 @@ def coerce_entity_categories(candidate: Any) -> List[str]:
     return ["other"]
 
 
-def classify_categories_with_ollama(title: Optional[str], summary: Optional[str], text_html: Optional[str]) -> List[str]:
-    """
-    Multi-label classify entity into:
-    historic, trendy, political, economic, sport, culture, nature, activity.
-    Returns ["other"] on parsing/model/runtime ambiguity or no fit.
-    """
-    if not (title or summary or text_html):
-        return ["other"]
-
-    text_for_model = ""
-    if text_html:
-        text_for_model = BeautifulSoup(text_html, "html.parser").get_text(" ", strip=True)
-
-    payload = {
-        "title": title or "",
-        "summary": summary or "",
-        # Keep a bounded context window for fast + stable local inference.
-        "text": text_for_model[:9000],
-    }
-
-    system_prompt = """
+CLASSIFY_POLICY = """
 You are a strict multi-label classifier for travel/content entities.
 
 Your task:
@@ -136,6 +197,9 @@ Rules:
 - If evidence is weak/ambiguous or none fit clearly, return only ["other"].
 - If at least one specific category applies, do not include "other".
 - Never invent facts beyond the input.
+""".strip()
+
+CLASSIFY_SYSTEM_PROMPT = CLASSIFY_POLICY + """
 
 Output format requirements:
 - Return valid JSON only.
@@ -144,62 +208,308 @@ Output format requirements:
 - "categories" must be lowercase labels from the allowed set.
 - Never return an empty categories array.
 - It is acceptable and often correct to output ["other"] when uncertain.
-""".strip()
+"""
 
-    try:
-        r = requests.post(
-            OLLAMA_CHAT_URL,
-            headers={"Content-Type": "application/json"},
-            json={
-                "model": OLLAMA_MODEL,
-                "stream": False,
-                "format": "json",
-                "messages": [
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": json.dumps(payload, ensure_ascii=False)},
-                ],
-                "options": {"temperature": 0},
+CLASSIFY_BATCH_SYSTEM_PROMPT = CLASSIFY_POLICY + """
+
+Batch input:
+- The input is {"entities":[...]} where every entity has an "id" plus "title", "summary" and "text".
+- Classify every entity independently; never let one entity influence another.
+
+Output format requirements:
+- Return valid JSON only.
+- Use this exact schema, with exactly one result per input id:
+  {"results":[{"id":"<input id>","categories":["<allowed label 1>","<allowed label 2>"]}]}
+- "categories" must be lowercase labels from the allowed set.
+- Never return an empty categories array.
+- It is acceptable and often correct to output ["other"] when uncertain.
+"""
+
+# Ollama structured output: constrains the batched reply to the multi-result schema.
+CLASSIFY_BATCH_FORMAT = {
+    "type": "object",
+    "properties": {
+        "results": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "id": {"type": "string"},
+                    "categories": {"type": "array", "items": {"type": "string", "enum": ALLOWED_CATEGORIES_ORDER}},
+                },
+                "required": ["id", "categories"],
             },
-            timeout=60,
-        )
-        r.raise_for_status()
-        data = r.json()
-        content = (data.get("message", {}) or {}).get("content", "")
-        if not content:
-            return ["other"]
+        }
+    },
+    "required": ["results"],
+}
 
-        parsed: Any = {}
-        try:
-            parsed = json.loads(content)
-        except json.JSONDecodeError:
-            # Support occasional fenced/non-strict outputs.
-            m = re.search(r"\{.*\}", content, flags=re.DOTALL)
-            if m:
-                try:
-                    parsed = json.loads(m.group(0))
-                except json.JSONDecodeError:
-                    parsed = {}
-
-        if isinstance(parsed, dict):
-            if "categories" in parsed:
-                return coerce_entity_categories(parsed.get("categories"))
-            if "type" in parsed:
-                # Backward-compatible fallback if model drifts to previous schema.
-                return coerce_entity_categories(parsed.get("type"))
-            return coerce_entity_categories(json.dumps(parsed, ensure_ascii=False))
-        if isinstance(parsed, list):
-            return coerce_entity_categories(parsed)
-
-        return coerce_entity_categories(content)
-    except Exception:
+# Keep a bounded context window for fast + stable local inference.
+CLASSIFY_TEXT_CHARS = 9000
+# Per entity in a batched request, so several entities fit in one context window.
+CLASSIFY_BATCH_TEXT_CHARS = 3000
+
+
+def classification_payload(title: Optional[str], summary: Optional[str], text_html: Optional[str]) -> Dict[str, str]:
+    return {
+        "title": title or "",
+        "summary": summary or "",
+        "text": simple_html_text(text_html)[:CLASSIFY_TEXT_CHARS] if text_html else "",
+    }
+
+
+def parse_model_json(content: str) -> Any:
+    try:
+        return json.loads(content)
+    except json.JSONDecodeError:
+        # Support occasional fenced/non-strict outputs.
+        m = re.search(r"\{.*\}", content, flags=re.DOTALL)
+        if m:
+            try:
+                return json.loads(m.group(0))
+            except json.JSONDecodeError:
+                pass
+    return {}
+
+
+def ollama_chat(system_prompt: str, user_content: str, response_format: Any = "json") -> str:
+    data = HTTP.post_json(
+        OLLAMA_CHAT_URL,
+        headers={"Content-Type": "application/json"},
+        json_body={
+            "model": OLLAMA_MODEL,
+            "stream": False,
+            "format": response_format,
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_content},
+            ],
+            "options": {"temperature": 0},
+        },
+        timeout=60,
+    )
+    return (data.get("message", {}) or {}).get("content", "")
+
+
+def batch_entity_payload(payload: Dict[str, str]) -> Dict[str, str]:
+    """What a batched request sends for one entity: the payload with a shorter text."""
+    return {**payload, "text": payload["text"][:CLASSIFY_BATCH_TEXT_CHARS]}
+
+
+def classification_cache_key(payload: Dict[str, str], batched: bool = False) -> str:
+    """Cache key of ``payload`` sent on its own, or as one entity of a batched request."""
+    if batched:
+        return cache_key(OLLAMA_MODEL, CLASSIFY_BATCH_SYSTEM_PROMPT, batch_entity_payload(payload))
+    return cache_key(OLLAMA_MODEL, CLASSIFY_SYSTEM_PROMPT, payload)
+
+
+def remember_classification(payload: Dict[str, str], categories: List[str], batched: bool = False) -> None:
+    cache = CLASSIFICATION_CACHE
+    if cache is not None:
+        cache.put(classification_cache_key(payload, batched), categories)
+
+
+def categories_from_reply(content: str) -> List[str]:
+    if not content:
         return ["other"]
 
+    parsed = parse_model_json(content)
+    if isinstance(parsed, dict):
+        if "categories" in parsed:
+            return coerce_entity_categories(parsed.get("categories"))
+        if "type" in parsed:
+            # Backward-compatible fallback if model drifts to previous schema.
+            return coerce_entity_categories(parsed.get("type"))
+        return coerce_entity_categories(json.dumps(parsed, ensure_ascii=False))
+    if isinstance(parsed, list):
+        return coerce_entity_categories(parsed)
+
+    return coerce_entity_categories(content)
+
+
+def classify_payload_with_ollama(payload: Dict[str, str]) -> List[str]:
+    """One chat request for one entity; the answer is cached, request errors are raised."""
+    content = ollama_chat(CLASSIFY_SYSTEM_PROMPT, json.dumps(payload, ensure_ascii=False))
+    categories = categories_from_reply(content)
+    remember_classification(payload, categories)
+    return categories
+
+
+def classify_payloads_with_ollama(payloads: List[Dict[str, str]]) -> List[List[str]]:
+    """
+    One chat request for several entities. Entities the model leaves out of
+    its reply are classified with a single-entity request instead.
+    """
+    if len(payloads) == 1:
+        return [classify_payload_with_ollama(payloads[0])]
+
+    entities = [{"id": str(index), **batch_entity_payload(payload)} for index, payload in enumerate(payloads)]
+    content = ollama_chat(
+        CLASSIFY_BATCH_SYSTEM_PROMPT,
+        json.dumps({"entities": entities}, ensure_ascii=False),
+        response_format=CLASSIFY_BATCH_FORMAT,
+    )
+    parsed = parse_model_json(content) if content else {}
+
+    by_id: Dict[str, List[str]] = {}
+    results = parsed.get("results") if isinstance(parsed, dict) else None
+    for result in results if isinstance(results, list) else []:
+        if isinstance(result, dict) and "id" in result:
+            by_id.setdefault(str(result["id"]), coerce_entity_categories(result.get("categories")))
+
+    out: List[List[str]] = []
+    for index, payload in enumerate(payloads):
+        categories = by_id.get(str(index))
+        if categories is None:
+            out.append(classify_payload_with_ollama(payload))
+        else:
+            remember_classification(payload, categories, batched=True)
+            out.append(categories)
+    return out
+
+
+def classify_with_llm(
+    title: Optional[str], summary: Optional[str], text_html: Optional[str]
+) -> Tuple[List[str], bool]:
+    """Categories from the classification cache or the LLM, and whether they were cached."""
+    if not (title or summary or text_html):
+        return ["other"], False
+
+    payload = classification_payload(title, summary, text_html)
+    cache = CLASSIFICATION_CACHE
+    batcher = LLM_BATCHER
+    if cache is not None:
+        # Answers are cached under what was sent. A batched run may reuse a
+        # single-request answer, but not the other way round: batched
+        # entities were sent with a different prompt and a shorter text.
+        for batched in (True, False) if batcher is not None else (False,):
+            cached = cache.get(classification_cache_key(payload, batched))
+            if cached is not None:
+                return cached, True
+
+    try:
+        categories = batcher.submit(payload) if batcher is not None else classify_payload_with_ollama(payload)
+    except Exception:
+        # Not cached, so the entity is classified again on the next run.
+        return ["other"], False
+    return categories, False
+
+
+def classify_categories_with_ollama(title: Optional[str], summary: Optional[str], text_html: Optional[str]) -> List[str]:
+    """
+    Multi-label classify entity into:
+    historic, trendy, political, economic, sport, culture, nature, activity.
+    Returns ["other"] on parsing/model/runtime ambiguity or no fit.
+    """
+    return classify_with_llm(title, summary, text_html)[0]
+
 
 def get_wikidata_entity(entity_id: str, user_agent: str) -> dict:
     url = WIKIDATA_ENTITYDATA_URL.format(entity_id=entity_id)
     return http_get_json(url, headers={"User-Agent": user_agent, "Accept": "application/json"})
 
 
+def get_wikidata_entities(entity_ids: List[str], user_agent: str) -> Dict[str, dict]:
+    """
+    Batch-fetch entities via wbgetentities, up to 50 ids per request.
+    Only page info (lastrevid), claims and the enwiki sitelink are requested
+    (no labels/descriptions/aliases or other sitelinks), and claims are
+    trimmed to USED_CLAIMS.
+    Missing entities are left out of the result.
+    """
+    out: Dict[str, dict] = {}
+    for start in range(0, len(entity_ids), WBGETENTITIES_MAX_IDS):
+        batch = entity_ids[start:start + WBGETENTITIES_MAX_IDS]
+        params = {
+            "action": "wbgetentities",
+            "format": "json",
+            "ids": "|".join(batch),
+            "props": "info|claims|sitelinks",
+            "sitefilter": "enwiki",
+        }
+        data = http_get_json(
+            WIKIDATA_API_URL,
+            headers={"User-Agent": user_agent, "Accept": "application/json"},
+            params=params,
+        )
+        for entity_id, entity in (data.get("entities") or {}).items():
+            if "missing" in entity:
+                continue
+            claims = entity.get("claims") or {}
+            entity["claims"] = {pid: claims[pid] for pid in USED_CLAIMS if pid in claims}
+            out[entity_id] = entity
+    return out
+
+
+def current_revisions(entity_ids: List[str], user_agent: str) -> Dict[str, Tuple[Optional[int], Optional[int]]]:
+    """
+    Look up the current revisions of many entities without downloading them:
+    wbgetentities (props=info|sitelinks) for the Wikidata lastrevid and enwiki
+    title, then action=query (prop=info) for the Wikipedia page lastrevid, 50
+    ids/titles per request. Returns {qid: (wikidata_revid, wikipedia_revid)};
+    missing entities are left out, and entities without an (existing) enwiki
+    page get None as their Wikipedia revision.
+    """
+    wikidata_revids: Dict[str, Optional[int]] = {}
+    titles: Dict[str, str] = {}
+    for start in range(0, len(entity_ids), WBGETENTITIES_MAX_IDS):
+        batch = entity_ids[start:start + WBGETENTITIES_MAX_IDS]
+        params = {
+            "action": "wbgetentities",
+            "format": "json",
+            "ids": "|".join(batch),
+            "props": "info|sitelinks",
+            "sitefilter": "enwiki",
+        }
+        data = http_get_json(
+            WIKIDATA_API_URL,
+            headers={"User-Agent": user_agent, "Accept": "application/json"},
+            params=params,
+        )
+        for entity_id, entity in (data.get("entities") or {}).items():
+            if "missing" in entity:
+                continue
+            wikidata_revids[entity_id] = entity.get("lastrevid")
+            title = extract_enwiki_title(entity)
+            if title:
+                titles[entity_id] = title
+
+    page_revids: Dict[str, int] = {}
+    unique_titles = list(dict.fromkeys(titles.values()))
+    for start in range(0, len(unique_titles), WIKIPEDIA_MAX_TITLES):
+        batch = unique_titles[start:start + WIKIPEDIA_MAX_TITLES]
+        params = {
+            "action": "query",
+            "format": "json",
+            "prop": "info",
+            "redirects": "1",
+            "titles": "|".join(batch),
+        }
+        data = http_get_json(
+            WIKIPEDIA_API_URL,
+            headers={"User-Agent": user_agent, "Accept": "application/json"},
+            params=params,
+        )
+        query = data.get("query", {})
+        # Map the answered (normalized, then redirect-resolved) titles back to what was asked.
+        aliases: Dict[str, str] = {}
+        for key in ("normalized", "redirects"):
+            for n in query.get(key, []):
+                aliases[n.get("to")] = aliases.get(n.get("from"), n.get("from"))
+        for _, page in query.get("pages", {}).items():
+            if "missing" in page or page.get("lastrevid") is None:
+                continue
+            title = page.get("title")
+            page_revids[title] = page["lastrevid"]
+            if title in aliases:
+                page_revids[aliases[title]] = page["lastrevid"]
+
+    return {
+        entity_id: (revid, page_revids.get(titles[entity_id]) if entity_id in titles else None)
+        for entity_id, revid in wikidata_revids.items()
+    }
+
+
 def extract_lat_lon(entity: dict) -> Tuple[Optional[float], Optional[float]]:
     try:
         claims = entity.get("claims", {})
@@ -223,6 +533,80 @@ def extract_type_qid(entity: dict) -> Optional[str]:
         return None
 
 
+def extract_type_qids(entity: dict) -> List[str]:
+    """All P31 (instance of) values."""
+    out: List[str] = []
+    for claim in entity.get("claims", {}).get("P31") or []:
+        try:
+            out.append(claim["mainsnak"]["datavalue"]["value"]["id"])
+        except (KeyError, TypeError):
+            continue
+    return out
+
+
+def get_subclass_parents(class_ids: List[str], user_agent: str) -> Dict[str, List[str]]:
+    """
+    P279 (subclass of) values for many classes via wbgetentities, 50 ids per
+    request. Missing classes are left out of the result.
+    """
+    out: Dict[str, List[str]] = {}
+    for start in range(0, len(class_ids), WBGETENTITIES_MAX_IDS):
+        batch = class_ids[start:start + WBGETENTITIES_MAX_IDS]
+        params = {
+            "action": "wbgetentities",
+            "format": "json",
+            "ids": "|".join(batch),
+            "props": "claims",
+        }
+        data = http_get_json(
+            WIKIDATA_API_URL,
+            headers={"User-Agent": user_agent, "Accept": "application/json"},
+            params=params,
+        )
+        for class_id, entity in (data.get("entities") or {}).items():
+            if "missing" in entity:
+                continue
+            parents = []
+            for claim in (entity.get("claims") or {}).get("P279") or []:
+                try:
+                    parents.append(claim["mainsnak"]["datavalue"]["value"]["id"])
+                except (KeyError, TypeError):
+                    continue
+            out[class_id] = parents
+    return out
+
+
+def resolve_types(type_qids: List[str]) -> None:
+    """Look up P279 parents the type table still needs for ``type_qids`` (batched, cached)."""
+    if TYPE_CATEGORIES is not None and type_qids:
+        TYPE_CATEGORIES.resolve(type_qids, lambda ids: get_subclass_parents(ids, USER_AGENT))
+
+
+def type_categories(type_qids: List[str]) -> Optional[List[str]]:
+    """Categories for P31 types from the type table, or None if it does not cover them."""
+    if TYPE_CATEGORIES is None or not type_qids:
+        return None
+    try:
+        resolve_types(type_qids)
+    except Exception:
+        pass  # whatever is already known still applies; the rest falls back to the LLM
+    return TYPE_CATEGORIES.categories_for(type_qids)
+
+
+def classify_entity(
+    title: Optional[str], summary: Optional[str], text_html: Optional[str], type_qids: List[str]
+) -> List[str]:
+    """Categories from the P31 type table, falling back to the (cached) LLM for uncovered types."""
+    categories = type_categories(type_qids)
+    source = "type_table"
+    if not categories:
+        categories, cached = classify_with_llm(title, summary, text_html)
+        source = "cache" if cached else "llm"
+    with _CLASSIFY_STATS_LOCK:
+        CLASSIFY_STATS[source] += 1
+    return categories
+
+
 def get_entity_label(entity_id: str, user_agent: str) -> Optional[str]:
     try:
         data = get_wikidata_entity(entity_id, user_agent)
@@ -254,46 +638,76 @@ def extract_wikidata_p18_filename(entity: dict) -> Optional[str]:
         return None
 
 
-def commons_file_url(filename: str, user_agent: str) -> Optional[str]:
+def commons_file_urls(
+    filenames: List[str], user_agent: str, thumb_width: Optional[int] = None
+) -> Dict[str, Dict[str, Optional[str]]]:
     """
-    Resolve a Commons filename to a direct URL via imageinfo.
+    Resolve many Commons filenames via imageinfo, up to 50 titles per request.
+    Returns {filename: {"url": ..., "thumburl": ...}} for every filename that
+    resolved; "thumburl" is a scaled URL at most ``thumb_width`` px wide, and
+    is only set when ``thumb_width`` is given.
     """
-    try:
+    titles: Dict[str, str] = {}
+    for filename in filenames:
         title = filename
         if not title.lower().startswith("file:"):
             title = "File:" + title
+        titles[filename] = title
 
+    unique_titles = list(dict.fromkeys(titles.values()))
+    by_title: Dict[str, Dict[str, Optional[str]]] = {}
+    for start in range(0, len(unique_titles), COMMONS_MAX_TITLES):
+        batch = unique_titles[start:start + COMMONS_MAX_TITLES]
         params = {
             "action": "query",
             "format": "json",
             "prop": "imageinfo",
             "iiprop": "url",
-            "titles": title,
+            "titles": "|".join(batch),
         }
+        if thumb_width:
+            params["iiurlwidth"] = str(thumb_width)
         data = http_get_json(
             COMMONS_API_URL,
             headers={"User-Agent": user_agent, "Accept": "application/json"},
             params=params,
         )
-        pages = data.get("query", {}).get("pages", {})
-        for _, page in pages.items():
+        query = data.get("query", {})
+        # The API answers with normalized titles (e.g. underscores -> spaces).
+        normalized = {n.get("to"): n.get("from") for n in query.get("normalized", [])}
+        for _, page in query.get("pages", {}).items():
             ii = page.get("imageinfo")
-            if ii and isinstance(ii, list) and ii[0].get("url"):
-                return ii[0]["url"]
-        return None
+            if not (ii and isinstance(ii, list) and ii[0].get("url")):
+                continue
+            title = page.get("title")
+            info = {"url": ii[0]["url"], "thumburl": ii[0].get("thumburl") if thumb_width else None}
+            by_title[title] = info
+            if title in normalized:
+                by_title[normalized[title]] = info
+
+    return {filename: by_title[title] for filename, title in titles.items() if title in by_title}
+
+
+def commons_file_url(filename: str, user_agent: str) -> Optional[str]:
+    """
+    Resolve a Commons filename to a direct URL via imageinfo.
+    """
+    try:
+        info = commons_file_urls([filename], user_agent).get(filename)
+        return info["url"] if info else None
     except Exception:
         return None
 
 
-def wikipedia_parse_full_html(title: str, user_agent: str) -> str:
+def wikipedia_parse_page(title: str, user_agent: str) -> Tuple[str, Optional[int]]:
     """
-    action=parse -> full rendered HTML.
+    action=parse -> (full rendered HTML, revision id of the rendered page).
     """
     params = {
         "action": "parse",
         "format": "json",
         "page": title,
-        "prop": "text",
+        "prop": "text|revid",
         "redirects": "1",
         "disabletoc": "1",
         "disableeditsection": "1",
@@ -303,10 +717,18 @@ def wikipedia_parse_full_html(title: str, user_agent: str) -> str:
         headers={"User-Agent": user_agent, "Accept": "application/json"},
         params=params,
     )
-    html = data.get("parse", {}).get("text", {}).get("*")
+    parsed = data.get("parse", {})
+    html = parsed.get("text", {}).get("*")
     if not html:
         raise RuntimeError("Could not retrieve parsed HTML for the page.")
-    return html
+    return html, parsed.get("revid")
+
+
+def wikipedia_parse_full_html(title: str, user_agent: str) -> str:
+    """
+    action=parse -> full rendered HTML.
+    """
+    return wikipedia_parse_page(title, user_agent)[0]
 
 
 def wikipedia_rest_summary(title: str, user_agent: str) -> dict:
@@ -315,6 +737,105 @@ def wikipedia_rest_summary(title: str, user_agent: str) -> dict:
     return http_get_json(url, headers={"User-Agent": user_agent, "Accept": "application/json"})
 
 
+def wikipedia_page_source(title: str, user_agent: str) -> dict:
+    """action=parse -> wikitext, section list (with byte offsets) and revision id, without rendering."""
+    params = {
+        "action": "parse",
+        "format": "json",
+        "page": title,
+        "prop": "wikitext|sections|revid",
+        "redirects": "1",
+    }
+    data = http_get_json(
+        WIKIPEDIA_API_URL,
+        headers={"User-Agent": user_agent, "Accept": "application/json"},
+        params=params,
+    )
+    parsed = data.get("parse", {})
+    if "wikitext" not in parsed:
+        raise RuntimeError("Could not retrieve wikitext for the page.")
+    return parsed
+
+
+def _section_heading(line: str) -> str:
+    """Section "line" (heading HTML) as the simplifier compares it to STOP_SECTIONS."""
+    return re.sub(r"\s+", " ", unescape(re.sub(r"<[^>]+>", " ", line))).strip().lower()
+
+
+def kept_wikitext(wikitext: str, sections: List[dict]) -> str:
+    """
+    ``wikitext`` up to the first h2-h4 section the simplifier stops at
+    (References, External links, ...), i.e. everything that can reach the
+    output. Sections produced by templates have no byte offset in the page;
+    if the stop section is one of those, the whole page is kept.
+    """
+    for section in sections:
+        if not 2 <= int(section.get("level") or 0) <= 4:
+            continue
+        if _section_heading(section.get("line", "")) not in STOP_SECTIONS:
+            continue
+        offset = section.get("byteoffset")
+        if offset is None:
+            return wikitext
+        # byteoffset counts UTF-8 bytes.
+        return wikitext.encode("utf-8")[:offset].decode("utf-8", errors="ignore")
+    return wikitext
+
+
+def wikipedia_render_wikitext(title: str, wikitext: str, user_agent: str) -> str:
+    """action=parse on supplied wikitext, rendered as page ``title`` -> HTML."""
+    data = HTTP.post_json(
+        WIKIPEDIA_API_URL,
+        headers={"User-Agent": user_agent, "Accept": "application/json"},
+        data={
+            "action": "parse",
+            "format": "json",
+            "title": title,
+            "text": wikitext,
+            "contentmodel": "wikitext",
+            "prop": "text",
+            "disabletoc": "1",
+            "disableeditsection": "1",
+            "disablelimitreport": "1",
+        },
+        timeout=60,
+        cacheable=True,
+    )
+    html = data.get("parse", {}).get("text", {}).get("*")
+    if html is None:
+        raise RuntimeError("Could not render wikitext for the page.")
+    return html
+
+
+def wikipedia_lean_page(title: str, user_agent: str) -> Tuple[str, Optional[int]]:
+    """
+    Same result as wikipedia_parse_page for everything simplify_html keeps,
+    without downloading the rendered references, navboxes and other tail
+    sections: the wikitext is fetched, cut before the first stop section and
+    only that part is rendered.
+    """
+    source = wikipedia_page_source(title, user_agent)
+    wikitext = source["wikitext"].get("*", "") if isinstance(source["wikitext"], dict) else source["wikitext"]
+    html = wikipedia_render_wikitext(
+        source.get("title") or title, kept_wikitext(wikitext, source.get("sections") or []), user_agent
+    )
+    return html, source.get("revid")
+
+
+def lead_summary(simple_html: Optional[str]) -> Optional[str]:
+    """Plain text of the first lead paragraph of simplified HTML (the lean-mode summary)."""
+    if not simple_html:
+        return None
+    for block in simple_html.split("\n"):
+        if block.startswith("<h2>") or block.startswith("<h3>") or block.startswith("<h4>"):
+            break
+        if block.startswith("<p>"):
+            text = simple_html_text(block).strip()
+            if text:
+                return text
+    return None
+
+
 def strip_links_and_simplify_html(full_html: str, page_title: Optional[str] = None) -> str:
     """
     Turn Wikipedia parse HTML into custom basic HTML:
@@ -322,6 +843,9 @@ def strip_links_and_simplify_html(full_html: str, page_title: Optional[str] = No
     - keeps basic inline formatting: bold/italics/code/br
     - removes links, references, infobox/nav templates, styles/scripts/media
     - drops noisy tail sections (references/external links/etc.)
+
+    Reference implementation: build_json uses html_simplify.simplify_html,
+    which produces the same output in a single streaming pass.
     """
     soup = BeautifulSoup(full_html, "html.parser")
 
@@ -445,56 +969,134 @@ def strip_links_and_simplify_html(full_html: str, page_title: Optional[str] = No
     return final
 
 
-def build_json(entity_id: str) -> Dict[str, Any]:
-    # Put your contact email/team page if you have it
-    user_agent = "wikidata-wikipedia-hackathon-script/1.1 (contact: you@example.com)"
+def fetch_sources(
+    entity_id: str,
+    entity: Optional[dict] = None,
+    image_info: Optional[Dict[str, Optional[str]]] = None,
+    thumb_width: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Network part of build_json: Wikidata entity, image URLs, Wikipedia summary
+    and the raw parse HTML (under "html"), plus the revision ids they came from.
+    Pass ``entity`` and ``image_info`` (from get_wikidata_entities /
+    commons_file_urls) when they were already fetched in a batch to skip the
+    per-entity downloads. With ``thumb_width``, a scaled image URL at most
+    that wide is returned as ``thumbnail_url``.
+    """
+    user_agent = USER_AGENT
 
-    wd_data = get_wikidata_entity(entity_id, user_agent)
-    entity = wd_data["entities"][entity_id]
+    if entity is None:
+        wd_data = get_wikidata_entity(entity_id, user_agent)
+        entity = wd_data["entities"][entity_id]
 
     lat, lon = extract_lat_lon(entity)
 
     # image_url (prefer Wikidata P18)
     image_url = None
+    thumbnail_url = None
     p18_filename = extract_wikidata_p18_filename(entity)
-    if p18_filename:
-        image_url = commons_file_url(p18_filename, user_agent)
+    if p18_filename and image_info is None:
+        try:
+            image_info = commons_file_urls([p18_filename], user_agent, thumb_width).get(p18_filename)
+        except Exception:
+            image_info = None
+    if p18_filename and image_info:
+        image_url = image_info.get("url")
+        thumbnail_url = image_info.get("thumburl")
 
     en_title = extract_enwiki_title(entity)
 
     summary = None
-    text_basic_html = None
+    full_html = None
+    wikipedia_revid = None
+    lean = WIKIPEDIA_FETCH_MODE == "lean"
 
-    if en_title:
+    # Lean mode only asks the REST summary for a fallback image; the summary
+    # itself then comes from the page lead (see simplify_sources).
+    if en_title and (not lean or image_url is None):
         # summary + fallback image
         try:
             summ = wikipedia_rest_summary(en_title, user_agent)
             summary = summ.get("extract")
             if image_url is None:
                 image_url = (summ.get("originalimage") or {}).get("source") or (summ.get("thumbnail") or {}).get("source")
+                if thumb_width:
+                    thumbnail_url = (summ.get("thumbnail") or {}).get("source")
         except Exception:
             summary = None
 
-        # full page html -> simplified html without links
-        full_html = wikipedia_parse_full_html(en_title, user_agent)
-        text_basic_html = strip_links_and_simplify_html(full_html, page_title=en_title)
-
-    entity_categories = classify_categories_with_ollama(en_title, summary, text_basic_html)
+    if en_title:
+        fetch_page = wikipedia_lean_page if lean else wikipedia_parse_page
+        full_html, wikipedia_revid = fetch_page(en_title, user_agent)
 
-    out = {
+    return {
         "entity_id": entity_id,
         "title": en_title,
         "latitude": lat,
         "longitude": lon,
-        "categories": entity_categories,
+        "type_qids": extract_type_qids(entity),
         "image_url": image_url,
-        "text": text_basic_html,   # full page (basic HTML, no hyperlinks)
+        "thumbnail_url": thumbnail_url,
+        "summary": summary,
+        "summary_from_lead": lean and summary is None,
+        "html": full_html,
+        "wikidata_revid": entity.get("lastrevid"),
+        "wikipedia_revid": wikipedia_revid,
+    }
+
+
+def simplify_sources(sources: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    CPU part of build_json: replace the raw "html" with simplified "text" (no
+    network). In lean fetch mode the summary is taken from the text's lead.
+    """
+    sources = dict(sources)
+    full_html = sources.pop("html", None)
+    # full page html -> simplified html without links
+    sources["text"] = simplify_html(full_html, page_title=sources["title"]) if full_html else None
+    if sources.pop("summary_from_lead", False):
+        sources["summary"] = lead_summary(sources["text"])
+    return sources
+
+
+def assemble_record(sources: Dict[str, Any], categories: List[str]) -> Dict[str, Any]:
+    return {
+        "entity_id": sources["entity_id"],
+        "title": sources["title"],
+        "latitude": sources["latitude"],
+        "longitude": sources["longitude"],
+        "categories": categories,
+        "image_url": sources["image_url"],
+        "thumbnail_url": sources["thumbnail_url"],
+        "text": sources["text"],   # full page (basic HTML, no hyperlinks)
         "text_audio": "",
         "audio_file": "",
-        "summary": summary,        # intro summary
+        "summary": sources["summary"],        # intro summary
+        "wikidata_revid": sources["wikidata_revid"],
+        "wikipedia_revid": sources["wikipedia_revid"],
         "created_at": utc_now_iso(),
     }
-    return out
+
+
+def build_json(
+    entity_id: str,
+    entity: Optional[dict] = None,
+    image_info: Optional[Dict[str, Optional[str]]] = None,
+    thumb_width: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Build the parsed record for one entity in the calling thread: fetch
+    (fetch_sources), simplify (simplify_sources), classify (classify_entity),
+    assemble.
+    parse_all_entities.py runs the same steps as a pipeline instead.
+    The Wikidata and Wikipedia revision ids the record was built from are
+    stored so later runs can skip unchanged entities (see current_revisions).
+    """
+    sources = simplify_sources(fetch_sources(entity_id, entity, image_info, thumb_width))
+    entity_categories = classify_entity(
+        sources["title"], sources["summary"], sources["text"], sources["type_qids"]
+    )
+    return assemble_record(sources, entity_categories)
 
 
 def main():
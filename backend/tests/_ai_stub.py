@@ -0,0 +1,212 @@
+"""Local HTTP stub of the OpenAI chat and ElevenLabs text-to-speech endpoints used by ai/."""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+from elevenlabs import AsyncElevenLabs, ElevenLabs
+from openai import AsyncOpenAI, OpenAI
+
+from ai.services import llm, mp3, tts
+
+
+_BITRATES_KBPS = (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320)
+_SAMPLE_RATE = 44100
+_SIDE_INFO = 17  # MPEG-1 mono
+
+
+def narration_for(title: str) -> str:
+    return f"{title} is worth a visit. It has a long history."
+
+
+def mp3_for(text: str, bitrate_kbps: int = 128) -> bytes:
+    """Real MPEG-1 Layer III audio (44.1 kHz mono CBR) as the stub's TTS returns it.
+
+    Like an encoder's output it starts with an Info frame, and padding bytes
+    keep the exact bitrate. All side info is zero, so every frame decodes as
+    silence; ``text`` is carried in the frames' ancillary data (see text_of).
+    """
+    index = _BITRATES_KBPS.index(bitrate_kbps)
+    payload = text.encode("utf-8")
+    remainder = 0
+
+    def frame(data: bytes) -> bytes:
+        nonlocal remainder
+        remainder += 144 * bitrate_kbps * 1000 % _SAMPLE_RATE
+        padding = int(remainder >= _SAMPLE_RATE)
+        remainder -= padding * _SAMPLE_RATE
+        length = 144 * bitrate_kbps * 1000 // _SAMPLE_RATE + padding
+        header = bytes([0xFF, 0xFB, index << 4 | padding << 1, 0xC4])
+        return header + bytes(_SIDE_INFO) + data.ljust(length - 4 - _SIDE_INFO, b"\0")
+
+    capacity = 144 * bitrate_kbps * 1000 // _SAMPLE_RATE - 4 - _SIDE_INFO
+    frames = [frame(b"Info" + bytes(8))]
+    frames += [frame(payload[i : i + capacity]) for i in range(0, max(len(payload), 1), capacity)]
+    return b"".join(frames)
+
+
+def text_of(audio: bytes) -> str:
+    """The text carried by the audio frames of mp3_for() output, in order."""
+    return b"".join(bytes(frame[header.side_info_end :]).rstrip(b"\0") for header, frame in mp3.iter_frames(audio)).decode()
+
+
+class AiStub:
+    """Threaded stub server; swaps the ``ai.services`` clients for ones pointed at it.
+
+    ``llm_delay`` / ``tts_delay`` are added to every response. ``failures``
+    maps "llm" / "tts" to statuses returned (with ``Retry-After: 0``) before
+    requests succeed. ``intervals`` records ``(kind, start, end)`` of every
+    request, so tests can check what ran concurrently. Streamed completions
+    send one word per event, ``token_delay`` apart; ``narrations`` overrides
+    the text written for a title.
+    """
+
+    def __init__(self, llm_delay: float = 0.0, tts_delay: float = 0.0, token_delay: float = 0.0):
+        self.delays = {"llm": llm_delay, "tts": tts_delay}
+        self.token_delay = token_delay
+        self.narrations: dict[str, str] = {}
+        self.failures: dict[str, list[int]] = {"llm": [], "tts": []}
+        self.requests: list[tuple[str, dict[str, Any]]] = []
+        self.intervals: list[tuple[str, float, float]] = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._saved: list[tuple[Any, str, Any]] = []
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self) -> "AiStub":
+        self._thread.start()
+        clients = [
+            (llm, "_client", OpenAI(api_key="test", base_url=f"{self.base_url}/v1", max_retries=0)),
+            (llm, "_async_client", AsyncOpenAI(api_key="test", base_url=f"{self.base_url}/v1", max_retries=0)),
+            (tts, "_client", ElevenLabs(api_key="test", base_url=self.base_url)),
+            (tts, "_async_client", AsyncElevenLabs(api_key="test", base_url=self.base_url)),
+        ]
+        for module, name, client in clients:
+            self._saved.append((module, name, getattr(module, name)))
+            setattr(module, name, client)
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        for module, name, client in self._saved:
+            setattr(module, name, client)
+        self._server.shutdown()
+        self._server.server_close()
+
+    def count(self, kind: str) -> int:
+        return sum(1 for k, _ in self.requests if k == kind)
+
+    def max_concurrent(self, kind: str) -> int:
+        spans = [(start, end) for k, start, end in self.intervals if k == kind]
+        return max((sum(1 for s, e in spans if s <= start < e) for start, _ in spans), default=0)
+
+    def overlapped(self, first: str, second: str) -> bool:
+        """Whether any ``first`` request was in flight while a ``second`` one was."""
+        a = [(s, e) for k, s, e in self.intervals if k == first]
+        b = [(s, e) for k, s, e in self.intervals if k == second]
+        return any(s1 < e2 and s2 < e1 for s1, e1 in a for s2, e2 in b)
+
+    # -- request handling -------------------------------------------------
+
+    def narration(self, title: str) -> str:
+        return self.narrations.get(title) or narration_for(title)
+
+    def _stream_events(self, request: dict[str, Any], text: str, usage: dict[str, int]) -> list[bytes]:
+        def event(choices: list[dict[str, Any]], **extra: Any) -> bytes:
+            chunk = {"id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": 0, "model": request["model"]}
+            return f"data: {json.dumps({**chunk, 'choices': choices, **extra})}\n\n".encode()
+
+        def delta(content: dict[str, str], finish_reason: str | None = None) -> bytes:
+            return event([{"index": 0, "delta": content, "finish_reason": finish_reason}])
+
+        words = text.split(" ")
+        events = [delta({"role": "assistant", "content": ""})]
+        events += [delta({"content": word if i == 0 else f" {word}"}) for i, word in enumerate(words)]
+        events += [delta({}, "stop"), event([], usage=usage), b"data: [DONE]\n\n"]
+        return events
+
+    def handle(self, kind: str, request: dict[str, Any]) -> tuple[int, bytes | list[bytes], str]:
+        """Return ``(status, body, content type)``; a streamed body is a list of events."""
+        with self._lock:
+            failures = self.failures[kind]
+            status = failures.pop(0) if failures else 200
+        if status != 200:
+            return status, json.dumps({"error": {"message": "rate limited"}}).encode(), "application/json"
+
+        if kind == "llm":
+            user = request["messages"][-1]["content"]
+            title = user.splitlines()[0].rsplit(": ", 1)[-1]
+            text = self.narration(title)
+            usage = {
+                "prompt_tokens": sum(len(m["content"]) for m in request["messages"]) // 4,
+                "completion_tokens": len(text) // 4,
+                "total_tokens": 0,
+            }
+            if request.get("stream"):
+                return 200, self._stream_events(request, text, usage), "text/event-stream"
+            body = {
+                "id": "chatcmpl-stub",
+                "object": "chat.completion",
+                "created": 0,
+                "model": request["model"],
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": text},
+                        "finish_reason": "stop",
+                    }
+                ],
+                "usage": usage,
+            }
+            return 200, json.dumps(body).encode(), "application/json"
+        return 200, mp3_for(request["text"]), "audio/mpeg"
+
+    def _handler_class(self) -> type[BaseHTTPRequestHandler]:
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self) -> None:  # noqa: N802
+                path = self.path.split("?", 1)[0]
+                if path == "/v1/chat/completions":
+                    kind = "llm"
+                elif path.startswith("/v1/text-to-speech/"):
+                    kind = "tts"
+                else:
+                    self.send_error(404)
+                    return
+                length = int(self.headers.get("Content-Length") or 0)
+                request = json.loads(self.rfile.read(length) or b"{}")
+                started = time.monotonic()
+                with stub._lock:
+                    stub.requests.append((kind, request))
+                if stub.delays[kind]:
+                    time.sleep(stub.delays[kind])
+                status, body, content_type = stub.handle(kind, request)
+                self.send_response(status)
+                if status != 200:
+                    self.send_header("Retry-After", "0")
+                self.send_header("Content-Type", content_type)
+                if isinstance(body, list):
+                    # Streamed: no length, the response ends when the connection closes.
+                    self.end_headers()
+                    for event in body:
+                        self.wfile.write(event)
+                        self.wfile.flush()
+                        time.sleep(stub.token_delay)
+                else:
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                with stub._lock:
+                    stub.intervals.append((kind, started, time.monotonic()))
+
+            def log_message(self, format: str, *args: Any) -> None:  # noqa: A002
+                pass
+
+        return Handler
@@ -0,0 +1,288 @@
+"""Local HTTP stub of the Wikidata / Wikipedia / Commons / Ollama endpoints used by scripts/."""
+
+import json
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Optional
+from urllib.parse import parse_qs, unquote, urlsplit
+
+SCRIPTS_DIR = Path(__file__).resolve().parents[1] / "scripts"
+if str(SCRIPTS_DIR) not in sys.path:
+    sys.path.insert(0, str(SCRIPTS_DIR))
+
+import wikidata_entity_to_json as w2j  # noqa: E402
+
+
+def make_entity(qid: str, index: int) -> dict[str, Any]:
+    """Build a minimal Wikidata entity with coordinates, type, image and enwiki link."""
+    return {
+        "id": qid,
+        "lastrevid": 1000 + index,
+        "labels": {"en": {"language": "en", "value": f"Place {index}"}},
+        "claims": {
+            "P625": [{"mainsnak": {"datavalue": {"value": {"latitude": 59.0 + index / 1000, "longitude": 18.0}}}}],
+            "P31": [{"mainsnak": {"datavalue": {"value": {"id": "Q16970"}}}}],
+            "P18": [{"mainsnak": {"datavalue": {"value": f"Place_{index}.jpg"}}}],
+        },
+        "sitelinks": {"enwiki": {"site": "enwiki", "title": f"Place {index}"}},
+    }
+
+
+def make_class(qid: str, *parents: str) -> dict[str, Any]:
+    """A Wikidata class item that is a P279 subclass of ``parents``."""
+    return {
+        "id": qid,
+        "claims": {"P279": [{"mainsnak": {"datavalue": {"value": {"id": p}}}} for p in parents]},
+    }
+
+
+# A page is a list of (heading, level, body HTML); the lead has heading None.
+Section = tuple[Optional[str], int, str]
+
+
+def make_sections(title: str) -> list[Section]:
+    return [
+        (
+            None,
+            0,
+            '<table class="infobox"><tr><td>Infobox</td></tr></table>'
+            f"<p><b>{title}</b> is a <a href=\"/wiki/Church\">church</a> in Stockholm.<sup class=\"reference\">[1]</sup></p>",
+        ),
+        ("History", 2, "<p>It was built in 1650.</p>"),
+        ("References", 2, "<p>Reference list.</p>"),
+    ]
+
+
+def render_sections(sections: list[Section]) -> str:
+    """action=parse HTML of a page."""
+    parts = ['<div class="mw-parser-output">']
+    for heading, level, body in sections:
+        if heading is not None:
+            anchor = re.sub(r"<[^>]+>", "", heading).replace(" ", "_")
+            parts.append(f'<div class="mw-heading mw-heading{level}"><h{level} id="{anchor}">{heading}</h{level}></div>')
+        parts.append(body)
+    parts.append("</div>")
+    return "".join(parts)
+
+
+def make_page_html(title: str) -> str:
+    return render_sections(make_sections(title))
+
+
+def make_wikitext(sections: list[Section]) -> tuple[str, list[dict[str, Any]]]:
+    """Wikitext of a page (bodies are literal HTML) and its action=parse section list."""
+    wikitext, listed = "", []
+    for index, (heading, level, body) in enumerate(sections):
+        if heading is not None:
+            listed.append({"index": str(index), "level": str(level), "line": heading, "byteoffset": len(wikitext.encode())})
+            wikitext += f"{'=' * level} {heading} {'=' * level}\n"
+        wikitext += body + "\n"
+    return wikitext, listed
+
+
+def render_wikitext(wikitext: str) -> str:
+    """The stub's wiki parser: the inverse of make_wikitext."""
+    sections: list[Section] = [(None, 0, "")]
+    for line in wikitext.splitlines():
+        match = re.fullmatch(r"(={2,6}) (.*) \1", line)
+        if match:
+            sections.append((match.group(2), len(match.group(1)), ""))
+        else:
+            heading, level, body = sections[-1]
+            sections[-1] = (heading, level, body + line)
+    return render_sections(sections)
+
+
+class WikimediaStub:
+    """Threaded stub server; point the ``wikidata_entity_to_json`` URL constants at it.
+
+    ``delay`` is added to every response so concurrency is observable, and
+    ``max_concurrent`` records the highest number of requests served at once.
+    Wikipedia pages are at revision ``page_revids.get(title, 500)`` and have
+    the sections ``pages.get(title, make_sections(title))``;
+    ``chat_batches`` lists the size of every batched classification request.
+    """
+
+    def __init__(self, entities: dict[str, dict[str, Any]], delay: float = 0.0):
+        self.entities = entities
+        self.delay = delay
+        self.page_revids: dict[str, int] = {}
+        self.pages: dict[str, list[Section]] = {}
+        self.chat_batches: list[int] = []
+        self.requests: list[tuple[str, str, dict[str, list[str]]]] = []
+        self.max_concurrent = 0
+        self._active = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._saved: dict[str, Any] = {}
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self) -> "WikimediaStub":
+        self._thread.start()
+        urls = {
+            "WIKIDATA_ENTITYDATA_URL": f"{self.base_url}/wiki/Special:EntityData/{{entity_id}}.json",
+            "WIKIDATA_API_URL": f"{self.base_url}/wikidata/w/api.php",
+            "WIKIPEDIA_API_URL": f"{self.base_url}/w/api.php",
+            "WIKIPEDIA_REST_SUMMARY_URL": f"{self.base_url}/api/rest_v1/page/summary/{{title}}",
+            "COMMONS_API_URL": f"{self.base_url}/commons/w/api.php",
+            "OLLAMA_CHAT_URL": f"{self.base_url}/api/chat",
+        }
+        for name, url in urls.items():
+            self._saved[name] = getattr(w2j, name)
+            setattr(w2j, name, url)
+        # Keep the P279 cache in memory so tests never touch scripts/.type_hierarchy.json.
+        self._saved["TYPE_CATEGORIES"] = w2j.TYPE_CATEGORIES
+        w2j.configure_type_categories(None)
+        # Likewise for LLM results; batching stays off unless a test configures it.
+        for name in ("CLASSIFICATION_CACHE", "LLM_BATCHER"):
+            self._saved[name] = getattr(w2j, name)
+        w2j.configure_classification(None)
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        for name, value in self._saved.items():
+            setattr(w2j, name, value)
+        self._server.shutdown()
+        self._server.server_close()
+
+    def count(self, path_prefix: str) -> int:
+        return sum(1 for _, path, _ in self.requests if path.startswith(path_prefix))
+
+    # -- request handling -------------------------------------------------
+
+    def handle(
+        self, method: str, path: str, query: dict[str, list[str]], body: bytes, headers: Any
+    ) -> tuple[Any, ...]:
+        """Return ``(status, payload)`` or ``(status, payload, extra_headers)``."""
+        if path.startswith("/wiki/Special:EntityData/"):
+            qid = path.rsplit("/", 1)[-1].removesuffix(".json")
+            if qid not in self.entities:
+                return 404, {"error": "no such entity"}
+            return 200, {"entities": {qid: self.entities[qid]}}
+
+        if path == "/wikidata/w/api.php" and query.get("action") == ["wbgetentities"]:
+            props = query["props"][0].split("|")
+            entities: dict[str, Any] = {}
+            for qid in query["ids"][0].split("|"):
+                if qid not in self.entities:
+                    entities[qid] = {"id": qid, "missing": ""}
+                    continue
+                entity = self.entities[qid]
+                entities[qid] = {"id": qid, **{prop: entity[prop] for prop in props if prop in entity}}
+                if "info" in props:
+                    entities[qid]["lastrevid"] = entity["lastrevid"]
+            return 200, {"entities": entities, "success": 1}
+
+        if path == "/commons/w/api.php":
+            # Like the real API: underscores are normalized to spaces, unknown files are "missing".
+            width = query.get("iiurlwidth", [None])[0]
+            normalized, pages = [], {}
+            for index, title in enumerate(query["titles"][0].split("|")):
+                canonical = title.replace("_", " ")
+                if canonical != title:
+                    normalized.append({"from": title, "to": canonical})
+                if "Missing" in canonical:
+                    pages[str(-index - 1)] = {"title": canonical, "missing": ""}
+                    continue
+                info = {"url": f"https://upload.example/{title[5:]}"}
+                if width:
+                    info["thumburl"] = f"https://upload.example/thumb/{width}px-{title[5:]}"
+                pages[str(index + 1)] = {"title": canonical, "imageinfo": [info]}
+            return 200, {"query": {"normalized": normalized, "pages": pages}}
+
+        if path == "/w/api.php" and query.get("action") == ["parse"]:
+            title = query["page"][0]
+            revid = self.page_revids.get(title, 500)
+            sections = self.pages.get(title, make_sections(title))
+            if "wikitext" in query.get("prop", ["text"])[0].split("|"):
+                wikitext, listed = make_wikitext(sections)
+                return 200, {"parse": {"title": title, "revid": revid, "wikitext": {"*": wikitext}, "sections": listed}}
+            return 200, {"parse": {"title": title, "revid": revid, "text": {"*": render_sections(sections)}}}
+
+        if path == "/w/api.php" and method == "POST":
+            form = parse_qs(body.decode("utf-8"))
+            if form.get("action") == ["parse"] and "text" in form:
+                html = render_wikitext(form["text"][0])
+                return 200, {"parse": {"title": form["title"][0], "text": {"*": html}}}
+
+        if path == "/w/api.php" and query.get("action") == ["query"]:
+            pages = {
+                str(index): {"title": title, "lastrevid": self.page_revids.get(title, 500)}
+                for index, title in enumerate(query["titles"][0].split("|"), 1)
+            }
+            return 200, {"query": {"pages": pages}}
+
+        if path.startswith("/api/rest_v1/page/summary/"):
+            title = unquote(path.rsplit("/", 1)[-1]).replace("_", " ")
+            etag = f'"summary-{title}"'
+            if headers.get("If-None-Match") == etag:
+                return 304, b"", {"ETag": etag}
+            return 200, {"title": title, "extract": f"{title} is a church in Stockholm."}, {"ETag": etag}
+
+        if path == "/api/chat" and method == "POST":
+            request = json.loads(body)
+            user = json.loads(request["messages"][-1]["content"])
+            if "entities" in user:
+                # Batched request: entities titled "Skipped ..." are left out of the reply.
+                with self._lock:
+                    self.chat_batches.append(len(user["entities"]))
+                results = [
+                    {"id": entity["id"], "categories": ["historic", "culture"]}
+                    for entity in user["entities"]
+                    if not entity["title"].startswith("Skipped")
+                ]
+                content = json.dumps({"results": results})
+            else:
+                content = json.dumps({"categories": ["historic", "culture"], "confidence": 0.9, "reason": "church"})
+            return 200, {"message": {"role": "assistant", "content": content}}
+
+        return 404, {"error": f"unhandled {method} {path}"}
+
+    def _handler_class(self) -> type[BaseHTTPRequestHandler]:
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _serve(self, method: str) -> None:
+                parts = urlsplit(self.path)
+                query = parse_qs(parts.query)
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                with stub._lock:
+                    stub.requests.append((method, parts.path, query))
+                    stub._active += 1
+                    stub.max_concurrent = max(stub.max_concurrent, stub._active)
+                try:
+                    if stub.delay:
+                        time.sleep(stub.delay)
+                    status, payload, *extra = stub.handle(method, parts.path, query, body, self.headers)
+                finally:
+                    with stub._lock:
+                        stub._active -= 1
+                data = payload if isinstance(payload, bytes) else json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                for name, value in (extra[0] if extra else {}).items():
+                    self.send_header(name, value)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self) -> None:  # noqa: N802
+                self._serve("GET")
+
+            def do_POST(self) -> None:  # noqa: N802
+                self._serve("POST")
+
+            def log_message(self, format: str, *args: Any) -> None:  # noqa: A002
+                pass
+
+        return Handler
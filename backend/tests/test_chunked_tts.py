@@ -0,0 +1,107 @@
+import asyncio
+import time
+import unittest
+
+from _ai_stub import AiStub, mp3_for, text_of
+
+from ai.services import mp3, tts
+from ai.services.sentences import split_text
+
+PARAGRAPHS = [
+    " ".join(f"Paragraph {p}, sentence {s} tells a little more about the royal palace." for s in range(10))
+    for p in range(4)
+]
+LONG_TEXT = "\n\n".join(PARAGRAPHS)
+
+
+def _frame_offsets(audio: bytes) -> list[int]:
+    """Offsets of back-to-back frames; fails if anything but frames is in between."""
+    offsets, offset = [], 0
+    while offset < len(audio):
+        header = mp3.parse_header(audio, offset)
+        assert header is not None, f"no frame at byte {offset}"
+        offsets.append(offset)
+        offset += header.length
+    return offsets
+
+
+class SplitTextTests(unittest.TestCase):
+    def test_pieces_are_balanced_and_cut_at_sentence_ends(self) -> None:
+        pieces = split_text(LONG_TEXT, 800)
+        lengths = [len(piece) for piece in pieces]
+
+        self.assertEqual(len(pieces), 4)
+        self.assertLessEqual(max(lengths), 800)
+        self.assertLess(max(lengths) - min(lengths), 100)
+        self.assertTrue(all(piece.endswith("palace.") for piece in pieces))
+        self.assertEqual(" ".join(pieces).split(), LONG_TEXT.split())
+        self.assertIn("palace.\n\nParagraph 1, sentence 0", split_text(LONG_TEXT, 1500)[0])
+
+    def test_short_text_and_disabled_chunking_give_one_piece(self) -> None:
+        self.assertEqual(split_text("  One sentence.  ", 800), ["One sentence."])
+        self.assertEqual(split_text(LONG_TEXT, 0), [LONG_TEXT])
+        self.assertEqual(split_text("", 800), [])
+
+
+class Mp3FrameTests(unittest.TestCase):
+    def test_frames_skip_tags_info_frames_and_junk(self) -> None:
+        audio = mp3_for("hello " * 200)
+        id3v2 = b"ID3\x04\x00\x00\x00\x00\x00\x05" + b"\x00" * 5
+        id3v1 = b"TAG" + b"\x00" * 125
+        framed = [(header, bytes(frame)) for header, frame in mp3.iter_frames(id3v2 + audio[:3] + audio + id3v1)]
+
+        self.assertEqual(b"".join(frame for _, frame in framed), b"".join(f for _, f in mp3.iter_frames(audio)))
+        self.assertEqual(len(framed), len(_frame_offsets(audio)) - 1)
+        self.assertEqual({header.format for header, _ in framed}, {(3, 128, 44100, 3)})
+        self.assertEqual(text_of(audio), "hello " * 200)
+
+    def test_frame_stream_matches_iter_frames_for_any_chunking(self) -> None:
+        id3v2 = b"ID3\x04\x00\x00\x00\x00\x01\x05" + b"\x00" * 133
+        id3v1 = b"TAG" + b"\x00" * 125
+        audio = mp3_for("hello " * 200)
+        for data in (audio, id3v2 + audio[:3] + audio + id3v1):
+            expected = b"".join(frame for _, frame in mp3.iter_frames(data))
+            for size in (1, 7, 417, len(data)):
+                with self.subTest(size=size):
+                    stream = mp3.FrameStream()
+                    fed = [stream.feed(data[i : i + size]) for i in range(0, len(data), size)]
+                    self.assertEqual(b"".join(fed) + stream.close(), expected)
+
+    def test_concat_joins_parts_at_frame_boundaries(self) -> None:
+        joined = mp3.concat([mp3_for("first part. "), mp3_for("second part.")])
+
+        self.assertEqual(text_of(joined), "first part. second part.")
+        self.assertEqual(len(_frame_offsets(joined)), 2)
+        with self.assertRaises(ValueError):
+            mp3.concat([mp3_for("first"), mp3_for("second", bitrate_kbps=64)])
+
+
+class ChunkedSynthesisTests(unittest.TestCase):
+    def test_pieces_are_synthesized_concurrently_and_joined_in_order(self) -> None:
+        pieces = split_text(LONG_TEXT, 800)
+
+        with AiStub(tts_delay=0.2) as stub:
+            started = time.monotonic()
+            audio = asyncio.run(tts.asynthesize_chunked(LONG_TEXT, max_chars=800, concurrency=4))
+            elapsed = time.monotonic() - started
+
+        requests = sorted((r for kind, r in stub.requests if kind == "tts"), key=lambda r: pieces.index(r["text"]))
+        self.assertEqual(text_of(audio), "".join(pieces))
+        self.assertEqual(stub.max_concurrent("tts"), 4)
+        self.assertLess(elapsed, 0.6)
+        _frame_offsets(audio)
+        self.assertNotIn("previous_text", requests[0])
+        self.assertEqual((requests[1]["previous_text"], requests[1]["next_text"]), (pieces[0], pieces[2]))
+
+    def test_sync_variant_and_short_texts(self) -> None:
+        with AiStub() as stub:
+            audio = tts.synthesize_chunked(LONG_TEXT, max_chars=800, concurrency=2)
+            short = tts.synthesize_chunked("A short narration.")
+
+        self.assertEqual(text_of(audio), "".join(split_text(LONG_TEXT, 800)))
+        self.assertEqual(stub.count("tts"), 5)
+        self.assertEqual(short, mp3_for("A short narration."))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,143 @@
+import tempfile
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from _wikimedia_stub import WikimediaStub
+
+import wikidata_entity_to_json as w2j
+from batcher import Batcher
+from classification_cache import ClassificationCache, cache_key
+
+
+class ClassificationCacheTests(unittest.TestCase):
+    def test_key_covers_model_prompt_and_payload(self) -> None:
+        payload = {"title": "A", "summary": "B", "text": "C"}
+        key = cache_key("llama3.2", "prompt", payload)
+
+        self.assertEqual(key, cache_key("llama3.2", "prompt", dict(reversed(payload.items()))))
+        self.assertNotEqual(key, cache_key("llama3.1", "prompt", payload))
+        self.assertNotEqual(key, cache_key("llama3.2", "prompt v2", payload))
+        self.assertNotEqual(key, cache_key("llama3.2", "prompt", {**payload, "text": "C2"}))
+
+    def test_entries_survive_a_reload(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "cache.jsonl"
+            cache = ClassificationCache(path)
+            cache.put("a", ["nature"])
+            cache.put("b", ["sport"])
+            cache.put("a", ["nature", "activity"])
+            with path.open("a", encoding="utf-8") as fh:
+                fh.write('{"key": "c", "categ')  # interrupted write
+
+            reloaded = ClassificationCache(path)
+
+            self.assertEqual(reloaded.get("a"), ["nature", "activity"])
+            self.assertEqual(reloaded.get("b"), ["sport"])
+            self.assertIsNone(reloaded.get("c"))
+            self.assertEqual((reloaded.hits, reloaded.misses), (2, 1))
+
+
+class BatcherTests(unittest.TestCase):
+    def test_items_are_grouped_with_bounded_concurrency(self) -> None:
+        active = 0
+        peak = 0
+        sizes = []
+        lock = threading.Lock()
+
+        def square_all(items):
+            nonlocal active, peak
+            with lock:
+                active += 1
+                peak = max(peak, active)
+                sizes.append(len(items))
+            time.sleep(0.02)
+            with lock:
+                active -= 1
+            return [item * item for item in items]
+
+        batcher = Batcher(square_all, batch_size=4, max_wait=0.05, concurrency=2)
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            results = list(pool.map(batcher.submit, range(16)))
+
+        self.assertEqual(results, [i * i for i in range(16)])
+        self.assertLessEqual(max(sizes), 4)
+        self.assertLess(len(sizes), 16)
+        self.assertLessEqual(peak, 2)
+
+    def test_batch_errors_reach_every_caller(self) -> None:
+        def fail(items):
+            raise RuntimeError("model offline")
+
+        batcher = Batcher(fail, batch_size=2, max_wait=0.01)
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            futures = [pool.submit(batcher.submit, i) for i in range(2)]
+
+        for future in futures:
+            with self.assertRaisesRegex(RuntimeError, "model offline"):
+                future.result()
+
+
+class LlmClassificationTests(unittest.TestCase):
+    def test_unchanged_entities_are_not_classified_again(self) -> None:
+        with WikimediaStub({}) as stub:
+            first = w2j.classify_with_llm("Storkyrkan", "A church.", "<p>Built in 1279.</p>")
+            second = w2j.classify_with_llm("Storkyrkan", "A church.", "<p>Built in 1279.</p>")
+            changed = w2j.classify_with_llm("Storkyrkan", "A church.", "<p>Rebuilt in 1740.</p>")
+
+            self.assertEqual(stub.count("/api/chat"), 2)
+
+        self.assertEqual(first, (["historic", "culture"], False))
+        self.assertEqual(second, (["historic", "culture"], True))
+        self.assertEqual(changed, (["historic", "culture"], False))
+
+    def test_failed_requests_are_not_cached(self) -> None:
+        with WikimediaStub({}) as stub:
+            w2j.OLLAMA_CHAT_URL = f"{stub.base_url}/api/offline"
+            self.assertEqual(w2j.classify_with_llm("A", "B", None), (["other"], False))
+            self.assertEqual(len(w2j.CLASSIFICATION_CACHE), 0)
+
+    def test_batched_requests_classify_several_entities(self) -> None:
+        titles = [f"Place {i}" for i in range(7)] + ["Skipped place"]
+
+        with WikimediaStub({}) as stub:
+            w2j.configure_classification(None, batch_size=4, concurrency=2, max_wait=0.2)
+            with ThreadPoolExecutor(max_workers=8) as pool:
+                results = list(pool.map(lambda title: w2j.classify_with_llm(title, "Summary", None), titles))
+
+            requests = stub.count("/api/chat")
+
+        self.assertEqual(results, [(["historic", "culture"], False)] * len(titles))
+        self.assertEqual(stub.chat_batches, [4, 4])
+        # The entity missing from its batch reply is asked about on its own.
+        self.assertEqual(requests, 3)
+
+    def test_batched_answers_are_not_reused_by_single_requests(self) -> None:
+        titles = ["Place 0", "Place 1", "Skipped place"]
+        text = "<p>" + "Built in 1279. " * 400 + "</p>"
+
+        def classify_all():
+            with ThreadPoolExecutor(max_workers=len(titles)) as pool:
+                return list(pool.map(lambda title: w2j.classify_with_llm(title, "Summary", text), titles))
+
+        with tempfile.TemporaryDirectory() as tmp, WikimediaStub({}) as stub:
+            path = Path(tmp) / "cache.jsonl"
+            w2j.configure_classification(path, batch_size=3, max_wait=0.2)
+            classify_all()
+            w2j.configure_classification(path)
+            unbatched = classify_all()
+            w2j.configure_classification(path, batch_size=3, max_wait=0.2)
+            rebatched = classify_all()
+
+            requests = stub.count("/api/chat")
+
+        # The batch and the skipped entity on its own, then the two batched entities again, unbatched.
+        self.assertEqual(requests, 2 + 2)
+        self.assertEqual([cached for _, cached in unbatched], [False, False, True])
+        self.assertEqual([cached for _, cached in rebatched], [True, True, True])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+
+from _ai_stub import AiStub
+
+from ai import Information
+from ai.services import llm
+from ai.services.context import estimate_tokens, html_to_sections, reduce_context
+
+ARTICLE = """<h1>Gamla Stan</h1>
+<p><strong>Gamla Stan</strong> is the old town of Stockholm. It dates from the 13th century.</p>
+<h2>History</h2>
+<p>The town was founded around 1252 by Birger Jarl. Its medieval street plan survives to this day.
+The Stockholm Bloodbath of 1520 took place on the main square.</p>
+<h2>Transport</h2>
+<p>The metro station opened in 1957. Buses stop at the eastern quay every ten minutes.
+Parking is limited and expensive for visitors arriving by car.</p>
+<h2>Sport</h2>
+<ul><li>Football club founded in 1990 plays in the lower divisions of the league.</li><li>Bandy</li></ul>
+"""
+SUMMARY = "Gamla Stan is the old town of Stockholm."
+
+
+class ContextReductionTests(unittest.TestCase):
+    def test_html_is_split_into_sections_of_sentences(self) -> None:
+        sections = html_to_sections(ARTICLE)
+
+        self.assertEqual([heading for heading, _ in sections], [None, "History", "Transport", "Sport"])
+        self.assertEqual(sections[0][1], ["Gamla Stan is the old town of Stockholm.", "It dates from the 13th century."])
+        self.assertEqual(len(sections[1][1]), 3)
+        self.assertEqual(sections[3][1][1], "Bandy")
+
+    def test_text_under_budget_is_kept_apart_from_the_summary(self) -> None:
+        reduced = reduce_context(ARTICLE, SUMMARY, "history", "Gamla Stan", 10_000)
+
+        self.assertNotIn("<p>", reduced.text)
+        self.assertNotIn("old town of Stockholm", reduced.text)
+        self.assertIn("## Transport\nThe metro station opened in 1957.", reduced.text)
+        self.assertLess(reduced.tokens_after, reduced.tokens_before)
+
+    def test_budget_keeps_the_sentences_matching_the_interest(self) -> None:
+        reduced = reduce_context(ARTICLE, SUMMARY, "medieval history", "Gamla Stan", 60)
+
+        self.assertLessEqual(reduced.tokens_after, 60)
+        self.assertIn("## History", reduced.text)
+        self.assertIn("medieval street plan", reduced.text)
+        self.assertNotIn("Parking", reduced.text)
+        self.assertNotIn("Bandy", reduced.text)
+        # Kept sentences stay in article order.
+        self.assertLess(reduced.text.index("13th century"), reduced.text.index("Birger Jarl"))
+
+    def test_prompt_uses_the_reduced_text_and_reports_usage(self) -> None:
+        text = ARTICLE + "".join(f"<h2>Part {i}</h2><p>{'Filler words about nothing. ' * 40}</p>" for i in range(20))
+        ctx = Information("Gamla Stan", 59.32, 18.07, SUMMARY, text, "Stockholm, Sweden", "history")
+        before = dict(llm.TOKEN_USAGE)
+
+        prompt = llm._build_user_prompt(ctx, 100)
+        with AiStub():
+            llm.generate(ctx)
+
+        self.assertIn("Birger Jarl", prompt)
+        self.assertLess(estimate_tokens(prompt), estimate_tokens(text) // 10)
+        self.assertEqual(llm.TOKEN_USAGE["requests"] - before["requests"], 1)
+        self.assertGreater(llm.TOKEN_USAGE["prompt_tokens"], before["prompt_tokens"])
+        self.assertIs(llm._load_prompt("user.md"), llm._load_prompt("user.md"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,129 @@
+import math
+import unittest
+from typing import Any
+from unittest.mock import patch
+
+from app.config import settings
+from app.services import spatial
+from app.services.geofence import GeofenceSession, trigger_radius_m
+from app.services.spatial import GridIndex, IndexedPoi
+
+# ~1 m of latitude in degrees
+_M = 1 / 111_320
+
+
+def _index(*pois: IndexedPoi) -> GridIndex:
+    return GridIndex(pois)
+
+
+class GridIndexTests(unittest.TestCase):
+    def test_query_returns_nearest_first_within_radius(self) -> None:
+        index = _index(
+            IndexedPoi("Q-far", 59.0 + 500 * _M, 18.0),
+            IndexedPoi("Q-near", 59.0 + 10 * _M, 18.0),
+            IndexedPoi("Q-mid", 59.0 - 80 * _M, 18.0),
+        )
+
+        hits = index.query(59.0, 18.0, 100)
+
+        self.assertEqual([poi.entity_id for poi, _ in hits], ["Q-near", "Q-mid"])
+        self.assertAlmostEqual(hits[0][1], 10, delta=0.1)
+
+    def test_query_spans_cell_boundaries(self) -> None:
+        pois = [IndexedPoi(f"Q{i}", 59.0 + i * 0.001, 18.0 + i * 0.001) for i in range(-50, 51)]
+        index = _index(*pois)
+
+        hits = index.query(59.0, 18.0, 1000)
+
+        self.assertEqual(len(hits), 15)
+
+
+class GeofenceSessionTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.index = _index(IndexedPoi("Q1", 59.0, 18.0))
+        self.radius = trigger_radius_m(None)
+        self.dwell = settings.geofence_dwell_s
+
+    def _at(self, metres: float) -> float:
+        return 59.0 + metres * _M
+
+    def test_fires_once_after_dwell(self) -> None:
+        session = GeofenceSession()
+
+        self.assertEqual(session.evaluate(self.index, self._at(5), 18.0, now=0), [])
+        hits = session.evaluate(self.index, self._at(5), 18.0, now=self.dwell)
+        self.assertEqual([hit.entity_id for hit in hits], ["Q1"])
+        self.assertEqual(session.evaluate(self.index, self._at(5), 18.0, now=self.dwell * 2), [])
+
+    def test_jitter_around_boundary_does_not_retrigger(self) -> None:
+        session = GeofenceSession()
+        session.evaluate(self.index, self._at(0), 18.0, now=0)
+        session.evaluate(self.index, self._at(0), 18.0, now=self.dwell)
+
+        # Just outside the trigger radius but within the exit hysteresis.
+        session.evaluate(self.index, self._at(self.radius * 1.2), 18.0, now=self.dwell + 1)
+        hits = session.evaluate(self.index, self._at(0), 18.0, now=self.dwell * 3)
+        self.assertEqual(hits, [])
+
+        # A real exit resets the geofence so it can fire on the next visit.
+        session.evaluate(self.index, self._at(self.radius * 3), 18.0, now=self.dwell * 4)
+        session.evaluate(self.index, self._at(0), 18.0, now=self.dwell * 5)
+        hits = session.evaluate(self.index, self._at(0), 18.0, now=self.dwell * 6)
+        self.assertEqual([hit.entity_id for hit in hits], ["Q1"])
+
+    def test_important_pois_have_larger_radius(self) -> None:
+        self.assertEqual(trigger_radius_m(None), settings.geofence_radius_m)
+        self.assertEqual(trigger_radius_m(1.0), settings.geofence_max_radius_m)
+
+        index = _index(IndexedPoi("Q-big", 59.0, 18.0, importance=1.0))
+        session = GeofenceSession()
+        distance = (settings.geofence_radius_m + settings.geofence_max_radius_m) / 2
+        session.evaluate(index, self._at(distance), 18.0, now=0)
+        hits = session.evaluate(index, self._at(distance), 18.0, now=self.dwell)
+        self.assertEqual([hit.entity_id for hit in hits], ["Q-big"])
+
+
+
+class _FakeGenerations:
+    def __init__(self) -> None:
+        self.state: dict[str, Any] | None = None
+        self.reads = 0
+
+    async def find_one(self, query: dict[str, Any], projection: dict[str, int]) -> dict[str, Any] | None:
+        self.reads += 1
+        return self.state
+
+
+class PoiGenerationTests(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.generations = _FakeGenerations()
+        db = {spatial.GENERATION_COLLECTION: self.generations}
+        for target, value in (
+            ("get_db", lambda: db),
+            ("_generation", spatial._UNKNOWN),
+            ("_checked_at", -math.inf),
+            ("_data_version", 0),
+            ("_index", GridIndex([])),
+        ):
+            patcher = patch.object(spatial, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    async def test_new_generation_drops_the_index(self) -> None:
+        self.assertEqual(await spatial.data_version(), 0)
+        self.assertIsNotNone(spatial._index)
+
+        # Within generation_check_s the state is not read again.
+        self.generations.state = {"_id": "pois", "generation": 1}
+        self.assertEqual(await spatial.data_version(), 0)
+        self.assertEqual(self.generations.reads, 1)
+
+        with patch.object(settings, "generation_check_s", 0):
+            self.assertEqual(await spatial.data_version(), 1)
+            self.assertIsNone(spatial._index)
+            self.assertEqual(await spatial.data_version(), 1)
+        self.assertEqual(self.generations.reads, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,126 @@
+import json
+import random
+import unittest
+
+from _wikimedia_stub import SCRIPTS_DIR, make_page_html
+from bs4 import BeautifulSoup
+
+from html_simplify import simple_html_text, simplify_html
+from wikidata_entity_to_json import strip_links_and_simplify_html
+
+PAGE = """<!DOCTYPE html><html><body>
+<div class="mw-content-ltr mw-parser-output" lang="en" dir="ltr">
+<div class="shortdescription nomobile noexcerpt noprint searchaux" style="display:none">Church in Stockholm</div>
+<style data-mw-deduplicate="TemplateStyles:r1">.mw-parser-output .hatnote{font-style:italic}</style>
+<div role="note" class="hatnote navigation-not-searchable">For other uses, see <a href="/wiki/X">X</a>.</div>
+<table class="infobox vcard"><tbody><tr><th>Church</th></tr></tbody></table>
+<p class="mw-empty-elt">
+</p>
+<p><b>Storkyrkan</b> (<small>Swedish:</small> <span title="Swedish"><i lang="sv">Sankt Nikolai kyrka</i></span>,
+&quot;St. Nicholas&#39;s&nbsp;Church&quot;) is the oldest church in <a href="/wiki/Gamla_stan">Gamla stan</a> ,
+the old town<sup id="cite_ref-1" class="reference"><a href="#cite_note-1">&#91;1&#93;</a></sup> ( in central Stockholm ) .
+<!-- hidden comment --> A &amp; B &lt;c&gt; AT&T &copy &#x27; &#150;</p>
+<meta property="mw:PageProp/toc" />
+<div class="mw-heading mw-heading2"><h2 id="History"><span>History</span> <span class="mw-editsection">
+<span class="mw-editsection-bracket">[</span><a href="/edit">edit</a>]</span></h2></div>
+<p>It was built<br>in 1279.<br/>Rebuilt <code>twice</code><em></em>.<b> </b></p>
+<ul><li>One <i>two</i></li><li>   </li><li><ul><li>nested</li></ul></li></ul>
+<div class="thumb"><div><p>Paragraph inside div</p></div></div>
+<figure typeof="mw:File/Thumb"><a href="/f"><img src="x.jpg"></a><figcaption>Caption</figcaption></figure>
+<blockquote><p>Quoted <b>text</b></p></blockquote>
+<pre>  code   block
+ here </pre>
+<h3><span class="mw-headline" id="Legacy">Legacy  heading</span><span class="mw-editsection">[edit]</span></h3>
+<p>Unclosed <b>bold <i>italic</p><p>after</p></b>
+<span>stray text outside blocks</span>
+<div class="mw-heading mw-heading3"><h3 id="Empty"></h3></div>
+<ol class="references"><li>ref</li></ol>
+<div class="mw-heading mw-heading2"><h2 id="See_also">See also</h2></div>
+<ul><li>Other church</li></ul>
+<div class="mw-heading mw-heading2"><h2 id="References">References</h2></div>
+<div class="reflist"><ol class="references"><li>Ref</li></ol></div>
+</div><!--NewPP limit report--></body></html>"""
+
+# Building blocks for generated pages: well-formed and broken markup alike.
+_OPEN = [
+    "<p>", "<p class='noprint'>", "<div>", "<div class='mw-heading'>", "<h2>", "<h3>", "<h4>",
+    "<ul>", "<ol>", "<ol class='references'>", "<li>", "<b>", "<i>", "<em>", "<strong>", "<code>",
+    "<span>", "<a href='/wiki/X'>", "<sup>", "<table>", "<blockquote>", "<pre>", "<small>",
+    "<span class='reference'>", "<div class='navbox'>", "<rt>", "<h1>",
+]
+_CLOSE = [
+    "</p>", "</div>", "</h2>", "</h3>", "</ul>", "</li>", "</b>", "</i>", "</span>", "</a>",
+    "</sup>", "</table>", "</br>", "</em>", "</blockquote>",
+]
+_TEXT = [
+    "Storkyrkan", " is ", "old", "  ", "\n", " , ", " .", "( x )", "&amp;", "&nbsp;", "&#91;1&#93;",
+    "<br>", "<br/>", "<img src='x'>", "<!-- c -->", "<p/>", "References", "See also", "AT&T",
+    "<![CDATA[cd]]>", "&lt;tag&gt;", "café", " ",
+]
+
+
+def _generated_page(rng: random.Random) -> str:
+    parts = ["<div class='mw-parser-output'>"] if rng.random() < 0.8 else []
+    for _ in range(rng.randint(5, 60)):
+        roll = rng.random()
+        if roll < 0.4:
+            parts.append(rng.choice(_OPEN))
+        elif roll < 0.6:
+            parts.append(rng.choice(_CLOSE))
+        else:
+            parts.append(rng.choice(_TEXT))
+    return "".join(parts)
+
+
+class HtmlSimplifyParityTests(unittest.TestCase):
+    def assertParity(self, html: str, title: str | None = None) -> None:
+        self.assertEqual(simplify_html(html, title), strip_links_and_simplify_html(html, title))
+
+    def test_wikipedia_page(self) -> None:
+        self.assertParity(PAGE)
+        self.assertParity(PAGE, "Storkyrkan & <friends>")
+        self.assertParity(make_page_html("Place 1"), "Place 1")
+
+    def test_output_stops_at_first_stop_section(self) -> None:
+        out = simplify_html(PAGE, "Storkyrkan")
+
+        self.assertTrue(out.startswith("<h1>Storkyrkan</h1>\n<p><strong>Storkyrkan</strong>"))
+        self.assertIn("<h2>History</h2>", out)
+        self.assertIn("<h3>Legacy heading</h3>", out)
+        self.assertNotIn("Other church", out)
+        self.assertNotIn("Infobox", out)
+        self.assertNotIn("[1]", out)
+
+    def test_page_without_content_container(self) -> None:
+        self.assertParity("<html><body><h2>Intro</h2><p>Text <a>link</a>.</p><table><tr><td>x</td></tr></table>")
+        self.assertParity("<p>mentions mw-parser-output in text only</p>")
+
+    def test_generated_pages(self) -> None:
+        rng = random.Random(1234)
+        for _ in range(400):
+            html = _generated_page(rng)
+            with self.subTest(html=html):
+                self.assertParity(html, "Title")
+
+    def test_parsed_corpus(self) -> None:
+        # Previously parsed records are themselves valid parse-like HTML.
+        records = sorted((SCRIPTS_DIR / "parsed").glob("Q*.json"))[:150]
+        if not records:
+            self.skipTest("no parsed corpus")
+        for path in records:
+            record = json.loads(path.read_text(encoding="utf-8"))
+            html = f'<div class="mw-parser-output">{record.get("text") or ""}</div>'
+            with self.subTest(entity=path.stem):
+                self.assertParity(html, record.get("title"))
+
+    def test_simple_html_text_matches_get_text(self) -> None:
+        simple = simplify_html(PAGE, "Storkyrkan & <friends>")
+
+        self.assertEqual(
+            simple_html_text(simple),
+            BeautifulSoup(simple, "html.parser").get_text(" ", strip=True),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from _wikimedia_stub import WikimediaStub, make_entity
+
+import wikidata_entity_to_json as w2j
+from http_client import CacheMiss, HttpClient
+
+
+class HttpCacheTests(unittest.TestCase):
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.cache_dir = Path(tmp.name)
+        saved = w2j.HTTP
+        self.addCleanup(setattr, w2j, "HTTP", saved)
+
+    def test_revalidates_with_etag(self) -> None:
+        with WikimediaStub({}) as stub:
+            client = HttpClient(cache_dir=self.cache_dir, cache_mode="revalidate")
+            url = f"{stub.base_url}/api/rest_v1/page/summary/Storkyrkan"
+
+            first = client.get_json(url)
+            second = client.get_json(url)
+
+        self.assertEqual(first, second)
+        self.assertEqual(client.stats["network"], 2)
+        self.assertEqual(client.stats["revalidated"], 1)
+        self.assertEqual(len(list(self.cache_dir.rglob("*.json.gz"))), 1)
+
+    def test_params_order_does_not_change_cache_key(self) -> None:
+        with WikimediaStub({}) as stub:
+            url = f"{stub.base_url}/w/api.php"
+            HttpClient(cache_dir=self.cache_dir, cache_mode="revalidate").get_json(
+                url, params={"action": "parse", "page": "Storkyrkan"}
+            )
+            client = HttpClient(cache_dir=self.cache_dir, cache_mode="prefer")
+            client.get_json(url, params={"page": "Storkyrkan", "action": "parse"})
+
+        self.assertEqual(client.stats["network"], 0)
+        self.assertEqual(client.stats["cache_hits"], 1)
+
+    def test_cache_only_mode_reparses_without_network(self) -> None:
+        entities = {"Q1": make_entity("Q1", 1)}
+        with WikimediaStub(entities) as stub:
+            w2j.configure_http(self.cache_dir, "revalidate")
+            online = w2j.build_json("Q1")
+            fetched = len(stub.requests)
+
+            client = w2j.configure_http(self.cache_dir, "only")
+            offline = w2j.build_json("Q1")
+            gets_after = [r for r in stub.requests[fetched:] if r[0] == "GET"]
+
+            with self.assertRaises(CacheMiss):
+                w2j.build_json("Q2")
+
+        self.assertEqual(gets_after, [])
+        self.assertEqual(client.stats["cache_hits"], 4)
+        self.assertEqual(offline["text"], online["text"])
+        self.assertEqual(offline["image_url"], online["image_url"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,245 @@
+import asyncio
+import tempfile
+import unittest
+from pathlib import Path
+from typing import Any
+from unittest.mock import patch
+
+import import_parsed
+from parse_all_entities import write_json
+from near_duplicates import NearDuplicateDetector
+from record_store import RecordStore
+
+
+def parsed(qid: str, text: str = "text", **extra: Any) -> dict[str, Any]:
+    return {"entity_id": qid, "latitude": 59.3, "longitude": 18.0, "text": text, **extra}
+
+
+class _Result:
+    def __init__(self, **counts: int):
+        self.__dict__.update(counts)
+
+
+def _valid_point(doc: dict[str, Any]) -> bool:
+    location = doc.get("location") or {}
+    lon, lat = (location.get("coordinates") or [None, None])[:2]
+    return location.get("type") == "Point" and -180 <= lon <= 180 and -90 <= lat <= 90
+
+
+class _FakeCollection:
+    """Applies ReplaceOne upserts and the stale-document delete to an in-memory dict."""
+
+    def __init__(self, docs: list[dict[str, Any]] | None = None, db: "_FakeDB | None" = None, name: str = ""):
+        self.docs = {doc["entity_id"]: doc for doc in docs or []}
+        self.batches: list[int] = []
+        self.indexes: list[Any] = []
+        self.db = db
+        self.name = name
+
+    def _touch(self) -> None:
+        # Like a real handle, writing to a dropped collection creates it again.
+        if self.db is not None:
+            self.db.collections[self.name] = self
+
+    async def create_index(self, keys: Any, **kwargs: Any) -> None:
+        self._touch()
+        if (keys, kwargs) not in self.indexes:
+            self.indexes.append((keys, kwargs))
+
+    async def count_documents(self, query: dict[str, Any]) -> int:
+        if query == import_parsed.INVALID_LOCATION:
+            return sum(not _valid_point(doc) for doc in self.docs.values())
+        assert query == {}
+        return len(self.docs)
+
+    async def drop(self) -> None:
+        self.docs, self.indexes = {}, []
+        self.db.collections.pop(self.name, None)
+
+    async def rename(self, new_name: str, dropTarget: bool = False) -> None:
+        assert dropTarget or new_name not in self.db.collections
+        self.db.collections[new_name] = self.db.collections.pop(self.name)
+        self.name = new_name
+
+    def aggregate(self, pipeline: list[dict[str, Any]]) -> "_FakeCollection":
+        (stage,) = pipeline
+        copy = self.db[stage["$out"]]
+        copy.docs = dict(self.docs)
+        return self
+
+    async def to_list(self, length: int | None) -> list[Any]:
+        return []
+
+    async def find_one_and_update(self, query: dict[str, Any], update: dict[str, Any], **kwargs: Any) -> dict[str, Any]:
+        state = self.docs.setdefault(query["_id"], {"_id": query["_id"], "generation": 0})
+        state["generation"] += update["$inc"]["generation"]
+        state.update(update["$set"])
+        return state
+
+    async def bulk_write(self, operations: list[Any], ordered: bool = True) -> _Result:
+        assert not ordered
+        self._touch()
+        self.batches.append(len(operations))
+        upserted = matched = 0
+        for op in operations:
+            entity_id = op._filter["entity_id"]
+            matched += entity_id in self.docs
+            upserted += entity_id not in self.docs
+            self.docs[entity_id] = op._doc
+        return _Result(upserted_count=upserted, matched_count=matched)
+
+    async def delete_many(self, query: dict[str, Any]) -> _Result:
+        if "entity_id" in query:
+            stale = [key for key in query["entity_id"]["$in"] if key in self.docs]
+        else:
+            keep = query["imported_at"]["$ne"]
+            stale = [key for key, doc in self.docs.items() if doc.get("imported_at") != keep]
+        for key in stale:
+            del self.docs[key]
+        return _Result(deleted_count=len(stale))
+
+
+class _FakeDB:
+    def __init__(self) -> None:
+        self.collections: dict[str, _FakeCollection] = {}
+
+    def __getitem__(self, name: str) -> _FakeCollection:
+        if name not in self.collections:
+            self.collections[name] = _FakeCollection(db=self, name=name)
+        return self.collections[name]
+
+    async def list_collection_names(self) -> list[str]:
+        return list(self.collections)
+
+
+class StreamingImportTests(unittest.TestCase):
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = Path(tmp.name)
+        audio_dir = self.tmp / "audio"
+        audio_dir.mkdir()
+        (audio_dir / "Q2.txt").write_text("Narration.", encoding="utf-8")
+        patcher = patch.object(import_parsed, "AUDIO_OUTPUT_DIR", audio_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_upserts_in_batches_and_removes_stale_documents(self) -> None:
+        parsed_dir = self.tmp / "parsed"
+        parsed_dir.mkdir()
+        for i in range(1, 8):
+            write_json(parsed_dir / f"Q{i}.json", parsed(f"Q{i}"))
+        write_json(parsed_dir / "Q8.json", {"entity_id": "Q8", "text": "No coordinates."})
+        (parsed_dir / "Q9.json").write_text("{", encoding="utf-8")
+        write_json(parsed_dir / "_failed_entities.json", {"failed": []})
+        collection = _FakeCollection([{"entity_id": "Q1", "text": "old"}, {"entity_id": "Q404", "text": "gone"}])
+
+        stats = asyncio.run(import_parsed.upsert_batches(collection, parsed_dir, batch_size=3, workers=4))
+
+        self.assertEqual(sorted(collection.batches), [1, 3, 3])
+        self.assertEqual(sorted(collection.docs), [f"Q{i}" for i in range(1, 8)])
+        self.assertEqual((stats["written"], stats["inserted"], stats["updated"]), (7, 6, 1))
+        self.assertEqual((stats["skipped"], stats["removed"]), (2, 1))
+        doc = collection.docs["Q2"]
+        self.assertEqual(doc["location"], {"type": "Point", "coordinates": [18.0, 59.3]})
+        self.assertEqual(doc["text_audio"], "Narration.")
+        self.assertIsNone(collection.docs["Q1"]["text_audio"])
+        self.assertEqual(collection.indexes, [("entity_id", {"unique": True})])
+
+    def test_reimport_from_a_record_store_keeps_unchanged_ids(self) -> None:
+        store_dir = self.tmp / "store"
+        with RecordStore(store_dir) as store:
+            for i in range(1, 4):
+                store.write(parsed(f"Q{i}"))
+        collection = _FakeCollection()
+        asyncio.run(import_parsed.upsert_batches(collection, store_dir, batch_size=2))
+
+        with RecordStore(store_dir) as store:
+            store.write(parsed("Q3", "Updated."))
+        stats = asyncio.run(import_parsed.upsert_batches(collection, store_dir, batch_size=2))
+
+        self.assertEqual((stats["inserted"], stats["updated"], stats["removed"]), (0, 3, 0))
+        self.assertEqual(collection.docs["Q3"]["text"], "Updated.")
+
+    def test_near_duplicates_are_merged_during_import(self) -> None:
+        parsed_dir = self.tmp / "parsed"
+        parsed_dir.mkdir()
+        # Q1 is written in the first batch, then replaced by Q4, which has more text.
+        write_json(parsed_dir / "Q1.json", parsed("Q1", "short", title="Storkyrkan"))
+        write_json(parsed_dir / "Q2.json", parsed("Q2", title="Royal Palace", latitude=59.31))
+        write_json(parsed_dir / "Q3.json", parsed("Q3", "x", title="Storkyrkan (church)", latitude=59.3001))
+        write_json(parsed_dir / "Q4.json", parsed("Q4", "much longer text", title="Storkyrkan", longitude=18.0002))
+        collection = _FakeCollection()
+        detector = NearDuplicateDetector(max_distance_m=50, min_similarity=0.85)
+
+        stats = asyncio.run(
+            import_parsed.upsert_batches(collection, parsed_dir, batch_size=1, workers=1, detector=detector)
+        )
+
+        self.assertEqual(sorted(collection.docs), ["Q2", "Q4"])
+        self.assertEqual((stats["written"], stats["merged"]), (2, 2))
+        self.assertEqual({(d.keep, d.drop) for d in detector.decisions}, {("Q1", "Q3"), ("Q4", "Q1")})
+
+
+class SwapImportTests(unittest.TestCase):
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.parsed_dir = Path(tmp.name)
+        patcher = patch.object(import_parsed, "AUDIO_OUTPUT_DIR", self.parsed_dir / "audio")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.db = _FakeDB()
+        self.db["pois"].docs = {f"Q{i}": {"entity_id": f"Q{i}", "text": "old"} for i in range(1, 5)}
+
+    def write_parsed(self, count: int) -> None:
+        for path in self.parsed_dir.glob("*.json"):
+            path.unlink()
+        for i in range(1, count + 1):
+            write_json(self.parsed_dir / f"Q{i}.json", parsed(f"Q{i}", "new"))
+
+    def generation(self) -> int:
+        return self.db["pois_generation"].docs["pois"]["generation"]
+
+    def test_validated_staging_is_swapped_in_and_can_be_rolled_back(self) -> None:
+        self.write_parsed(5)
+
+        self.assertTrue(asyncio.run(import_parsed.import_swap(self.db, self.parsed_dir)))
+
+        self.assertEqual(sorted(self.db.collections), ["pois", "pois_generation", "pois_previous"])
+        live = self.db["pois"]
+        self.assertEqual(len(live.docs), 5)
+        self.assertEqual({doc["text"] for doc in live.docs.values()}, {"new"})
+        # Indexes were built on the empty staging collection, before any writes.
+        self.assertIn(([("location", "2dsphere")], {}), live.indexes)
+        self.assertEqual({doc["text"] for doc in self.db["pois_previous"].docs.values()}, {"old"})
+        self.assertEqual(self.generation(), 1)
+
+        self.assertTrue(asyncio.run(import_parsed.rollback(self.db)))
+
+        self.assertEqual({doc["text"] for doc in self.db["pois"].docs.values()}, {"old"})
+        self.assertEqual({doc["text"] for doc in self.db["pois_previous"].docs.values()}, {"new"})
+        self.assertIn(([("location", "2dsphere")], {}), self.db["pois"].indexes)
+        self.assertEqual(self.generation(), 2)
+
+    def test_incomplete_staging_is_not_swapped_in(self) -> None:
+        self.write_parsed(2)
+        write_json(self.parsed_dir / "Q9.json", {**parsed("Q9"), "latitude": 123.0})
+
+        self.assertFalse(asyncio.run(import_parsed.import_swap(self.db, self.parsed_dir, min_ratio=0.9)))
+
+        self.assertEqual({doc["text"] for doc in self.db["pois"].docs.values()}, {"old"})
+        self.assertIn("pois_staging", self.db.collections)
+        self.assertNotIn("pois_generation", self.db.collections)
+        problems = asyncio.run(import_parsed.validate_staging(self.db["pois_staging"], 3, 4, 0.9))
+        self.assertEqual(
+            problems,
+            [
+                "3 documents is less than 90% of the 4 live ones",
+                "1 documents without a valid GeoJSON point",
+            ],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
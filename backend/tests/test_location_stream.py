@@ -0,0 +1,97 @@
+import unittest
+from unittest.mock import patch
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.models import PointOfInterest
+from app.routes import locations
+from app.services.spatial import GridIndex
+
+
+def _poi(entity_id: str, lat: float = 59.0, lon: float = 18.0) -> PointOfInterest:
+    return PointOfInterest(entity_id=entity_id, title=f"title-{entity_id}", latitude=lat, longitude=lon)
+
+
+def _build_client() -> TestClient:
+    application = FastAPI()
+    application.include_router(locations.router, prefix="/api/v1")
+    return TestClient(application)
+
+
+async def _empty_index() -> GridIndex:
+    return GridIndex([])
+
+
+async def _fixed_version() -> int:
+    return 0
+
+
+class LocationStreamTests(unittest.TestCase):
+    def setUp(self) -> None:
+        for name, fake in (("get_index", _empty_index), ("data_version", _fixed_version)):
+            patcher = patch.object(locations, name, side_effect=fake)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_pushes_only_additions_and_removals(self) -> None:
+        results = [
+            [_poi("Q1"), _poi("Q2")],
+            [_poi("Q1"), _poi("Q2")],
+            [_poi("Q2"), _poi("Q3")],
+        ]
+
+        async def fake_fetch(lat: float, lon: float, poi_filter=None) -> tuple[list[PointOfInterest], float]:
+            return results.pop(0), 0.0
+
+        with patch.object(locations, "fetch_nearby_pois", side_effect=fake_fetch):
+            with _build_client().websocket_connect("/api/v1/locations/stream") as ws:
+                ws.send_json({"latitude": 59.0, "longitude": 18.0})
+                first = ws.receive_json()
+                self.assertEqual([poi["entity_id"] for poi in first["added"]], ["Q1", "Q2"])
+                self.assertEqual(first["removed"], [])
+
+                # Unchanged result set: nothing is pushed for this fix.
+                ws.send_json({"latitude": 59.001, "longitude": 18.0, "force": True})
+                ws.send_json({"latitude": 59.002, "longitude": 18.0, "force": True})
+                second = ws.receive_json()
+                self.assertEqual([poi["entity_id"] for poi in second["added"]], ["Q3"])
+                self.assertEqual(second["removed"], ["Q1"])
+
+    def test_skips_fixes_below_move_threshold(self) -> None:
+        calls: list[tuple[float, float]] = []
+
+        async def fake_fetch(lat: float, lon: float, poi_filter=None) -> tuple[list[PointOfInterest], float]:
+            calls.append((lat, lon))
+            return [_poi(f"Q{len(calls)}")], 0.0
+
+        with patch.object(locations, "fetch_nearby_pois", side_effect=fake_fetch):
+            with _build_client().websocket_connect("/api/v1/locations/stream") as ws:
+                ws.send_json({"latitude": 59.0, "longitude": 18.0})
+                ws.receive_json()
+                ws.send_json({"latitude": 59.00001, "longitude": 18.0})
+                ws.send_json({"latitude": "invalid", "longitude": 18.0})
+                error = ws.receive_json()
+
+        self.assertEqual(error["type"], "error")
+        self.assertEqual(len(calls), 1)
+
+    def test_changed_filter_refetches_inside_the_threshold(self) -> None:
+        async def fake_fetch(lat: float, lon: float, poi_filter=None) -> tuple[list[PointOfInterest], float]:
+            if poi_filter.min_importance is None:
+                return [_poi("Q1"), _poi("Q2")], 1000.0
+            return [_poi("Q2")], 1000.0
+
+        with patch.object(locations, "fetch_nearby_pois", side_effect=fake_fetch):
+            with _build_client().websocket_connect("/api/v1/locations/stream") as ws:
+                ws.send_json({"latitude": 59.0, "longitude": 18.0})
+                ws.receive_json()
+                ws.send_json({"latitude": 59.0001, "longitude": 18.0, "min_importance": 0.5})
+                update = ws.receive_json()
+
+        self.assertEqual(update["added"], [])
+        self.assertEqual(update["removed"], ["Q1"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,129 @@
+import asyncio
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from _ai_stub import AiStub, mp3_for, narration_for
+
+from ai import Information, adescribe
+from ai import batch
+from ai.services.retry import retry_after, with_retries
+
+
+def write_parsed(parsed_dir: Path, count: int) -> list[Path]:
+    paths = []
+    for i in range(1, count + 1):
+        path = parsed_dir / f"Q{i}.json"
+        record = {"title": f"Place {i}", "latitude": 59.3, "longitude": 18.0, "summary": None, "text": "<p>Text.</p>"}
+        path.write_text(json.dumps(record))
+        paths.append(path)
+    return paths
+
+
+class NarrationBatchTests(unittest.TestCase):
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.parsed_dir = Path(tmp.name) / "parsed"
+        self.output_dir = Path(tmp.name) / "output"
+        self.parsed_dir.mkdir()
+
+    def test_llm_and_tts_run_in_separate_bounded_pools(self) -> None:
+        paths = write_parsed(self.parsed_dir, 6)
+        runner = batch.NarrationRunner(self.output_dir, llm_concurrency=2, tts_concurrency=1)
+
+        with AiStub(llm_delay=0.1, tts_delay=0.1) as stub:
+            stats = asyncio.run(runner.run(paths))
+
+        self.assertEqual((stats.narrated, stats.failed), (6, {}))
+        self.assertEqual(stub.max_concurrent("llm"), 2)
+        self.assertEqual(stub.max_concurrent("tts"), 1)
+        self.assertTrue(stub.overlapped("llm", "tts"))
+        self.assertEqual((self.output_dir / "Q3.txt").read_text(), narration_for("Place 3"))
+        self.assertEqual((self.output_dir / "Q3.mp3").read_bytes(), mp3_for(narration_for("Place 3")))
+
+    def test_rate_limits_are_retried(self) -> None:
+        paths = write_parsed(self.parsed_dir, 2)
+        runner = batch.NarrationRunner(self.output_dir, attempts=3, base_delay=0)
+
+        with AiStub() as stub:
+            stub.failures = {"llm": [429, 503], "tts": [429]}
+            stats = asyncio.run(runner.run(paths))
+
+        self.assertEqual((stats.narrated, stats.retries), (2, 3))
+        self.assertEqual((stub.count("llm"), stub.count("tts")), (4, 3))
+
+    def test_failures_are_reported_and_runs_resume(self) -> None:
+        paths = write_parsed(self.parsed_dir, 3)
+        runner = batch.NarrationRunner(self.output_dir, llm_concurrency=1, tts_concurrency=1, attempts=2, base_delay=0)
+
+        with AiStub() as stub:
+            # Q1 gets its text but its audio fails twice; nothing is retried on 400.
+            stub.failures = {"llm": [], "tts": [429, 429]}
+            first = asyncio.run(runner.run(paths[:1]))
+            stub.failures = {"llm": [400], "tts": []}
+            second = asyncio.run(runner.run(paths[1:2]))
+            failed = json.loads((self.output_dir / batch.FAILED_NAME).read_text())["failed"]
+
+            llm_before = stub.count("llm")
+            resumed = asyncio.run(runner.run([p for p in paths if not batch.is_done(p, self.output_dir)]))
+
+        self.assertEqual(list(first.failed), ["Q1"])
+        self.assertTrue(second.failed["Q2"].startswith("BadRequestError"))
+        self.assertEqual(sorted(failed), ["Q2"])
+        self.assertTrue((self.output_dir / "Q1.txt").exists())
+        self.assertEqual((resumed.narrated, resumed.resumed), (3, 1))
+        # Q1 reused its saved text: only Q2 and Q3 needed completions.
+        self.assertEqual(stub.count("llm") - llm_before, 2)
+        self.assertFalse((self.output_dir / batch.FAILED_NAME).exists())
+
+    def test_main_selects_unprocessed_files(self) -> None:
+        write_parsed(self.parsed_dir, 4)
+        (self.parsed_dir / "_changed_entities.json").write_text(json.dumps({"changed": ["Q4"]}))
+        args = ["--parsed-dir", str(self.parsed_dir), "--output-dir", str(self.output_dir)]
+
+        with AiStub() as stub:
+            self.assertEqual(batch.main(args + ["-n", "2"]), 0)
+            done = sorted(p.name for p in self.output_dir.glob("*.mp3"))
+            self.assertEqual(batch.main(args + ["--changed"]), 0)
+            self.assertEqual(batch.main(args + ["Q1"]), 0)
+
+        self.assertEqual(done, ["Q1.mp3", "Q2.mp3"])
+        self.assertEqual(stub.count("llm"), 4)
+
+
+class AsyncDescribeTests(unittest.TestCase):
+    def test_adescribe_matches_describe(self) -> None:
+        ctx = Information("Storkyrkan", 59.3, 18.0, "", "", "Stockholm", "history")
+
+        with AiStub() as stub:
+            stub.failures["tts"] = [429]
+            result = asyncio.run(adescribe(ctx))
+
+        self.assertEqual(result.text, narration_for("Storkyrkan"))
+        self.assertEqual(result.audio, mp3_for(result.text))
+
+    def test_non_retryable_errors_are_raised_at_once(self) -> None:
+        calls = 0
+
+        async def fail() -> None:
+            nonlocal calls
+            calls += 1
+            raise ValueError("bad input")
+
+        with self.assertRaises(ValueError):
+            asyncio.run(with_retries(fail, attempts=5, base_delay=0))
+        self.assertEqual(calls, 1)
+
+    def test_retry_after_header(self) -> None:
+        class _Error(Exception):
+            status_code = 429
+            headers = {"retry-after": "2.5"}
+
+        self.assertEqual(retry_after(_Error()), 2.5)
+        self.assertIsNone(retry_after(ValueError()))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import json
+import random
+import tempfile
+import unittest
+from pathlib import Path
+
+from near_duplicates import NearDuplicateDetector, normalize_title, title_similarity
+
+# ~1 m of latitude in degrees
+_M = 1 / 111_320
+
+
+def _doc(entity_id: str, title: str | None, metres_north: float = 0.0, text: str = "", lon: float = 18.0) -> dict:
+    return {
+        "entity_id": entity_id,
+        "title": title,
+        "text": text,
+        "location": {"type": "Point", "coordinates": [lon, 59.0 + metres_north * _M]},
+    }
+
+
+class TitleSimilarityTests(unittest.TestCase):
+    def test_normalize_title(self) -> None:
+        self.assertEqual(normalize_title("Storkyrkan (Stockholm)"), "storkyrkan")
+        self.assertEqual(normalize_title("Riddarholms\u00adkyrkan – Église"), "riddarholmskyrkan eglise")
+        self.assertEqual(normalize_title(None), "")
+
+    def test_similarity(self) -> None:
+        self.assertEqual(title_similarity("storkyrkan", "storkyrkan"), 1.0)
+        self.assertGreater(title_similarity("stockholm cathedral", "cathedral stockholm"), 0.85)
+        self.assertGreater(title_similarity("riddarholmskyrkan", "riddarholms kyrkan"), 0.85)
+        self.assertLess(title_similarity("stockholm cathedral", "stockholm palace"), 0.85)
+        self.assertEqual(title_similarity("", "storkyrkan"), 0.0)
+
+
+class NearDuplicateDetectorTests(unittest.TestCase):
+    def test_keeps_the_poi_with_the_longest_text(self) -> None:
+        detector = NearDuplicateDetector(max_distance_m=50, min_similarity=0.85)
+
+        self.assertIsNone(detector.add(_doc("Q1", "Storkyrkan", text="short")))
+        replaced = detector.add(_doc("Q2", "Storkyrkan", 20, text="a much longer article"))
+        dropped = detector.add(_doc("Q3", "Storkyrkan", 40, text=""))
+
+        self.assertEqual((replaced.keep, replaced.drop, replaced.replaces_accepted), ("Q2", "Q1", True))
+        self.assertEqual((dropped.keep, dropped.drop, dropped.replaces_accepted), ("Q2", "Q3", False))
+        self.assertAlmostEqual(dropped.distance_m, 20, delta=0.1)
+
+    def test_distance_and_similarity_thresholds(self) -> None:
+        detector = NearDuplicateDetector(max_distance_m=50, min_similarity=0.85)
+        detector.add(_doc("Q1", "Storkyrkan"))
+
+        self.assertIsNone(detector.add(_doc("Q2", "Storkyrkan", 60)))
+        self.assertIsNone(detector.add(_doc("Q3", "Royal Palace", 5)))
+        self.assertIsNone(detector.add(_doc("Q4", None, 1)))
+        # Neighbouring cells in longitude are searched as well.
+        self.assertIsNotNone(detector.add(_doc("Q5", "Storkyrkan", lon=18.0 + 30 * _M / 0.515)))
+
+    def test_comparisons_stay_local(self) -> None:
+        rng = random.Random(1)
+        detector = NearDuplicateDetector(max_distance_m=50)
+        for i in range(5000):
+            detector.add(_doc(f"Q{i}", f"Place {i}", rng.uniform(0, 20_000), lon=18.0 + rng.uniform(0, 0.4)))
+
+        # 5000 POIs over ~20 x 20 km: each one is only compared with its few neighbours.
+        self.assertLess(detector.comparisons, 5000)
+
+    def test_report_lists_every_decision(self) -> None:
+        detector = NearDuplicateDetector()
+        detector.add(_doc("Q1", "Vasa Museum", text="long text"))
+        detector.add(_doc("Q2", "Vasa museum", 10))
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "report.jsonl"
+            detector.write_report(path)
+            rows = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+        self.assertEqual(len(rows), 1)
+        self.assertEqual((rows[0]["keep"], rows[0]["drop"], rows[0]["similarity"]), ("Q1", "Q2", 1.0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,160 @@
+import asyncio
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from _ai_stub import AiStub, mp3_for, narration_for
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from ai.services.cache import NarrationCache, narration_key
+from app.config import settings
+from app.models import PoiDetail
+from app.routes import locations
+from app.services import narration
+
+
+def _doc(entity_id: str) -> dict:
+    return {"entity_id": entity_id, "title": f"Place {entity_id}", "location": {"type": "Point", "coordinates": [18.07, 59.32]}}
+
+
+class _NarrationTestCase:
+    """Temporary cache directory plus a fake ``pois`` collection for the narration fields."""
+
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.cache = NarrationCache(Path(tmp.name))
+        self.saved: dict[str, tuple[str, str]] = {}
+
+        async def fake_save(entity_id: str, text_audio: str, audio_file: str) -> None:
+            self.saved[entity_id] = (text_audio, audio_file)
+
+        patcher = patch.object(narration, "save_poi_narration", side_effect=fake_save)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+class NarrationQueueTests(_NarrationTestCase, unittest.IsolatedAsyncioTestCase):
+    async def test_concurrent_requests_share_one_generation(self) -> None:
+        queue = narration.NarrationQueue(self.cache)
+        ctx = narration.narration_input(_doc("Q1"))
+
+        with AiStub(llm_delay=0.05) as stub:
+            first, second = queue.submit("Q1", ctx), queue.submit("Q1", ctx)
+            paths = await asyncio.gather(first, second)
+
+        self.assertIs(first, second)
+        self.assertEqual(stub.count("llm"), 1)
+        self.assertEqual(paths[0], self.cache.paths(narration_key(ctx))[1])
+        self.assertEqual(paths[0].read_bytes(), mp3_for(narration_for("Place Q1")))
+        self.assertEqual(self.saved["Q1"], (narration_for("Place Q1"), str(paths[0])))
+        self.assertEqual(queue.pending, 0)
+
+    async def test_generations_are_bounded_and_cached_by_content(self) -> None:
+        queue = narration.NarrationQueue(self.cache, workers=2)
+        contexts = {f"Q{i}": narration.narration_input(_doc(f"Q{i}")) for i in range(5)}
+
+        with AiStub(llm_delay=0.05) as stub:
+            await asyncio.gather(*(queue.submit(entity_id, ctx) for entity_id, ctx in contexts.items()))
+            # A re-import cleared the audio fields: the same input is served from the cache.
+            self.saved.clear()
+            await queue.submit("Q3", contexts["Q3"])
+            await queue.submit("Q3", narration.narration_input(_doc("Q3"), interest="architecture"))
+
+        self.assertEqual(stub.max_concurrent("llm"), 2)
+        self.assertEqual(stub.count("llm"), 6)
+        self.assertEqual((queue.generated, queue.cache_hits), (6, 1))
+        self.assertIn("Q3", self.saved)
+
+    async def test_cache_key_is_computed_off_the_event_loop(self) -> None:
+        queue = narration.NarrationQueue(self.cache)
+        threads = []
+
+        def key(ctx):
+            threads.append(threading.get_ident())
+            return narration_key(ctx)
+
+        with AiStub(), patch.object(narration, "narration_key", side_effect=key):
+            await queue.submit("Q1", narration.narration_input(_doc("Q1")))
+
+        self.assertNotIn(threading.get_ident(), threads)
+        self.assertEqual(len(threads), 1)
+
+    async def test_pending_limit(self) -> None:
+        queue = narration.NarrationQueue(self.cache, max_pending=1)
+
+        with AiStub(llm_delay=0.05):
+            task = queue.submit("Q1", narration.narration_input(_doc("Q1")))
+            with self.assertRaises(narration.NarrationQueueFull):
+                queue.submit("Q2", narration.narration_input(_doc("Q2")))
+            await task
+
+    async def test_failures_are_logged(self) -> None:
+        queue = narration.NarrationQueue(self.cache)
+
+        with AiStub() as stub, self.assertLogs(narration.log, "ERROR") as logs:
+            stub.failures["llm"] = [400]
+            with self.assertRaises(Exception):
+                await queue.submit("Q1", narration.narration_input(_doc("Q1")))
+
+        self.assertIn("Narration of Q1 failed", logs.output[0])
+        self.assertNotIn("Q1", self.saved)
+
+
+class OnDemandAudioRouteTests(_NarrationTestCase, unittest.TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.details = {"Q1": PoiDetail(entity_id="Q1", title="Place Q1")}
+
+        async def fake_detail(entity_id: str) -> PoiDetail | None:
+            return self.details.get(entity_id)
+
+        async def fake_source(entity_id: str) -> dict | None:
+            return _doc(entity_id) if entity_id in self.details else None
+
+        for target, name, fake in ((locations, "fetch_poi_detail", fake_detail), (narration, "fetch_poi_source", fake_source)):
+            patcher = patch.object(target, name, side_effect=fake)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = patch.object(narration, "_queue", narration.NarrationQueue(self.cache))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        application = FastAPI()
+        application.include_router(locations.router, prefix="/api/v1")
+        self.client = TestClient(application)
+
+    def test_missing_audio_is_generated_and_served(self) -> None:
+        with AiStub() as stub, self.client:
+            response = self.client.get("/api/v1/locations/audio/Q1")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, mp3_for(narration_for("Place Q1")))
+        self.assertEqual(self.saved["Q1"][0], narration_for("Place Q1"))
+        self.assertEqual(stub.count("tts"), 1)
+
+    def test_slow_generation_answers_202_and_finishes_in_the_background(self) -> None:
+        with AiStub(llm_delay=0.3), self.client, patch.object(settings, "narration_wait_s", 0.01):
+            pending = self.client.get("/api/v1/locations/audio/Q1")
+            task = narration.get_narration_queue()._in_flight["Q1"]
+            self.client.portal.call(asyncio.wait, [task])
+            self.details["Q1"].audio_file = self.saved["Q1"][1]
+            done = self.client.get("/api/v1/locations/audio/Q1")
+
+        self.assertEqual(pending.status_code, 202)
+        self.assertEqual(pending.headers["retry-after"], "5")
+        self.assertEqual(done.status_code, 200)
+
+    def test_provider_failure_is_a_502(self) -> None:
+        with AiStub() as stub, self.client:
+            stub.failures["llm"] = [400]
+            response = self.client.get("/api/v1/locations/audio/Q1")
+
+        self.assertEqual(response.status_code, 502)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,251 @@
+import json
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+from _wikimedia_stub import WikimediaStub, make_entity
+
+import parse_all_entities
+import wikidata_entity_to_json as w2j
+from pipeline import Pipeline, Stage
+from rate_limit import HostRateLimiter, TokenBucket, parse_rate_spec
+
+
+class RateLimitTests(unittest.TestCase):
+    def test_token_bucket_spaces_requests(self) -> None:
+        bucket = TokenBucket(rate=50, burst=1)
+
+        started = time.monotonic()
+        for _ in range(11):
+            bucket.acquire()
+        elapsed = time.monotonic() - started
+
+        self.assertGreaterEqual(elapsed, 0.18)
+
+    def test_limiter_only_limits_configured_hosts(self) -> None:
+        limiter = HostRateLimiter()
+        limiter.set_rate("www.wikidata.org", 5, burst=1)
+
+        self.assertEqual(limiter.acquire("https://www.wikidata.org/wiki/Q1"), 0.0)
+        self.assertGreater(limiter.acquire("https://WWW.wikidata.org/wiki/Q2"), 0.1)
+        self.assertEqual(limiter.acquire("https://en.wikipedia.org/w/api.php"), 0.0)
+
+    def test_parse_rate_spec(self) -> None:
+        self.assertEqual(
+            parse_rate_spec("www.wikidata.org=10, en.wikipedia.org=2.5"),
+            {"www.wikidata.org": 10.0, "en.wikipedia.org": 2.5},
+        )
+        with self.assertRaises(ValueError):
+            parse_rate_spec("www.wikidata.org")
+
+
+def _run(pipeline: Pipeline, items) -> dict:
+    """Errors by entity id after running ``items`` (ids or Prefetched) through ``pipeline``."""
+    items = [parse_all_entities.Prefetched(i) if isinstance(i, str) else i for i in items]
+    return {key: error for key, _, error in pipeline.run((i.entity_id, i) for i in items)}
+
+
+class ConcurrentIngestionTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.addCleanup(w2j.RATE_LIMITER.clear)
+
+    def test_entities_are_fetched_concurrently_and_written(self) -> None:
+        qids = [f"Q{100 + i}" for i in range(8)]
+        entities = {qid: make_entity(qid, i) for i, qid in enumerate(qids)}
+
+        with tempfile.TemporaryDirectory() as tmp, WikimediaStub(entities, delay=0.05) as stub:
+            out_dir = Path(tmp)
+            w2j.RATE_LIMITER.set_rate("127.0.0.1", 200)
+
+            results = _run(parse_all_entities.build_pipeline(out_dir, 0, 0, fetch_workers=4), qids)
+
+            self.assertEqual(results, {qid: None for qid in qids})
+            self.assertGreater(stub.max_concurrent, 1)
+            record = json.loads((out_dir / "Q103.json").read_text(encoding="utf-8"))
+
+        self.assertEqual(record["title"], "Place 3")
+        self.assertEqual(record["categories"], ["historic", "culture"])
+        self.assertEqual(record["image_url"], "https://upload.example/Place_3.jpg")
+        self.assertIn("<h2>History</h2>", record["text"])
+
+    def test_failures_are_retried_then_reported(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp, WikimediaStub({}) as stub:
+            results = _run(parse_all_entities.build_pipeline(Path(tmp), 2, 0, fetch_workers=2), ["Q404"])
+
+            self.assertTrue(results["Q404"].startswith("fetch: "))
+            self.assertIn("404", results["Q404"])
+            self.assertEqual(stub.count("/wiki/Special:EntityData/"), 3)
+
+    def test_entities_are_prefetched_in_batches(self) -> None:
+        qids = [f"Q{100 + i}" for i in range(60)]
+        entities = {qid: make_entity(qid, i) for i, qid in enumerate(qids)}
+        entities["Q100"]["claims"]["P1082"] = [{"mainsnak": {}}]
+
+        with WikimediaStub(entities) as stub:
+            pairs = list(parse_all_entities.iter_prefetched(qids + ["Q404"], batch_size=50))
+
+        self.assertEqual(stub.count("/wikidata/w/api.php"), 2)
+        self.assertEqual(stub.count("/commons/w/api.php"), 2)
+        self.assertEqual([item.entity_id for item in pairs], qids + ["Q404"])
+        self.assertIsNone(pairs[-1].entity)
+        first = pairs[0].entity
+        self.assertEqual(sorted(first["claims"]), ["P18", "P31", "P625"])
+        self.assertEqual(first["sitelinks"]["enwiki"]["title"], "Place 0")
+        self.assertNotIn("labels", first)
+
+    def test_prefetched_entity_skips_entity_download(self) -> None:
+        entities = {"Q1": make_entity("Q1", 1)}
+
+        with tempfile.TemporaryDirectory() as tmp, WikimediaStub(entities) as stub:
+            items = parse_all_entities.iter_prefetched(["Q1"], batch_size=50)
+            results = _run(parse_all_entities.build_pipeline(Path(tmp), 0, 0), items)
+
+            self.assertEqual(results, {"Q1": None})
+            self.assertEqual(stub.count("/wiki/Special:EntityData/"), 0)
+            self.assertEqual(stub.count("/commons/w/api.php"), 1)
+            self.assertTrue((Path(tmp) / "Q1.json").exists())
+
+    def test_commons_urls_are_resolved_in_one_call_per_batch(self) -> None:
+        qids = [f"Q{100 + i}" for i in range(5)]
+        entities = {qid: make_entity(qid, i) for i, qid in enumerate(qids)}
+        entities["Q104"]["claims"]["P18"][0]["mainsnak"]["datavalue"]["value"] = "Missing_file.jpg"
+
+        with tempfile.TemporaryDirectory() as tmp, WikimediaStub(entities) as stub:
+            items = list(parse_all_entities.iter_prefetched(qids, batch_size=50, thumb_width=320))
+            _run(parse_all_entities.build_pipeline(Path(tmp), 0, 0, thumb_width=320), items)
+
+            self.assertEqual(stub.count("/commons/w/api.php"), 1)
+            record = json.loads((Path(tmp) / "Q102.json").read_text(encoding="utf-8"))
+            missing = json.loads((Path(tmp) / "Q104.json").read_text(encoding="utf-8"))
+
+        self.assertEqual(items[2].image_info["url"], "https://upload.example/Place_2.jpg")
+        self.assertEqual(record["image_url"], "https://upload.example/Place_2.jpg")
+        self.assertEqual(record["thumbnail_url"], "https://upload.example/thumb/320px-Place_2.jpg")
+        self.assertEqual(items[4].image_info, {})
+        self.assertIsNone(missing["image_url"])
+
+    def test_queue_size_bounds_entities_in_flight(self) -> None:
+        qids = [f"Q{100 + i}" for i in range(20)]
+        entities = {qid: make_entity(qid, i) for i, qid in enumerate(qids)}
+        pulled = 0
+        peak_ahead = 0
+        finished = 0
+
+        def items():
+            nonlocal pulled, peak_ahead
+            for qid in qids:
+                pulled += 1
+                peak_ahead = max(peak_ahead, pulled - finished)
+                yield qid, parse_all_entities.Prefetched(qid)
+
+        with tempfile.TemporaryDirectory() as tmp, WikimediaStub(entities, delay=0.01) as stub:
+            pipeline = parse_all_entities.build_pipeline(Path(tmp), 0, 0, fetch_workers=3, queue_size=1)
+            for _, _, error in pipeline.run(items()):
+                self.assertIsNone(error)
+                finished += 1
+
+        self.assertEqual(finished, 20)
+        self.assertLessEqual(stub.max_concurrent, 3)
+        # One slot in each of the five queues plus one item held by each of the six workers and the feeder.
+        self.assertLessEqual(peak_ahead, 5 + 6 + 1)
+
+
+def _double(value: int) -> int:
+    return value * 2
+
+
+class PipelineTests(unittest.TestCase):
+    def test_queues_bound_the_work_in_flight(self) -> None:
+        pulled = 0
+        peak_ahead = 0
+        finished = 0
+
+        def items():
+            nonlocal pulled, peak_ahead
+            for i in range(40):
+                pulled += 1
+                peak_ahead = max(peak_ahead, pulled - finished)
+                yield i, i
+
+        def slow(value: int) -> int:
+            time.sleep(0.005)
+            return value
+
+        pipeline = Pipeline([Stage("double", _double, workers=2), Stage("slow", slow)], queue_size=2)
+        results = []
+        for key, value, error in pipeline.run(items()):
+            finished += 1
+            results.append((key, value, error))
+
+        self.assertEqual(sorted(results), [(i, i * 2, None) for i in range(40)])
+        # 2 slots in each of the three queues plus one item held by each worker and the feeder.
+        self.assertLessEqual(peak_ahead, 3 * 2 + 2 + 1 + 1)
+        stats = [stage.stats() for stage in pipeline.stages]
+        self.assertEqual([s["processed"] for s in stats], [40, 40])
+        self.assertEqual([s["queue"] for s in stats], [0, 0])
+        self.assertIn("slow 40", pipeline.report())
+
+    def test_failed_items_skip_later_stages(self) -> None:
+        seen = []
+
+        def check(value: int) -> int:
+            if value == 3:
+                raise ValueError("bad value")
+            return value
+
+        pipeline = Pipeline([Stage("check", check), Stage("record", seen.append)])
+        results = {key: error for key, _, error in pipeline.run((i, i) for i in range(5))}
+
+        self.assertEqual(results[3], "check: bad value")
+        self.assertEqual(sorted(seen), [0, 1, 2, 4])
+        self.assertEqual(pipeline.stages[0].stats()["failed"], 1)
+
+    def test_entities_flow_through_all_stages(self) -> None:
+        qids = [f"Q{100 + i}" for i in range(6)]
+        entities = {qid: make_entity(qid, i) for i, qid in enumerate(qids)}
+
+        with tempfile.TemporaryDirectory() as tmp, WikimediaStub(entities) as stub:
+            out_dir = Path(tmp)
+            pipeline = parse_all_entities.build_pipeline(
+                out_dir, 0, 0, fetch_workers=3, cpu_workers=2, queue_size=2
+            )
+            items = parse_all_entities.iter_prefetched(qids + ["Q404"], batch_size=50)
+            results = {key: error for key, _, error in pipeline.run((i.entity_id, i) for i in items)}
+            record = json.loads((out_dir / "Q102.json").read_text(encoding="utf-8"))
+
+            # Q16970 (church building) is in the type table, so the LLM is never asked.
+            self.assertEqual(stub.count("/api/chat"), 0)
+
+        self.assertEqual([qid for qid, error in results.items() if error], ["Q404"])
+        self.assertTrue(results["Q404"].startswith("fetch: "))
+        self.assertEqual(record["categories"], ["historic", "culture"])
+        self.assertIn("<h2>History</h2>", record["text"])
+        self.assertEqual([s.stats()["processed"] for s in pipeline.stages], [7, 6, 6, 6])
+
+
+class RefreshTests(unittest.TestCase):
+    def test_only_entities_with_new_revisions_are_reported(self) -> None:
+        qids = [f"Q{i}" for i in range(1, 5)]
+        entities = {qid: make_entity(qid, i) for i, qid in enumerate(qids, 1)}
+
+        with tempfile.TemporaryDirectory() as tmp, WikimediaStub(entities) as stub:
+            out_dir = Path(tmp)
+            self.assertEqual(_run(parse_all_entities.build_pipeline(out_dir, 0, 0), qids[:3]), dict.fromkeys(qids[:3]))
+            parse_all_entities.write_json(out_dir / "Q4.json", {"entity_id": "Q4"})
+            record = json.loads((out_dir / "Q1.json").read_text(encoding="utf-8"))
+
+            entities["Q2"]["lastrevid"] += 1
+            stub.page_revids["Place 3"] = 501
+            requests_before = len(stub.requests)
+            changed = parse_all_entities.changed_entities(qids + ["Q404"], out_dir)
+            lookups = stub.requests[requests_before:]
+
+        self.assertEqual(record["wikidata_revid"], 1001)
+        self.assertEqual(record["wikipedia_revid"], 500)
+        self.assertEqual(changed, ["Q2", "Q3", "Q4"])
+        self.assertEqual([path for _, path, _ in lookups], ["/wikidata/w/api.php", "/w/api.php"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+import unittest
+from typing import Any
+from unittest.mock import patch
+
+from app.models import LocationRequest, PoiFilter
+from app.services.database import fetch_nearby_pois
+from app.services.spatial import GridIndex, IndexedPoi
+
+
+class _FakeCursor:
+    def __aiter__(self) -> "_FakeCursor":
+        return self
+
+    async def __anext__(self) -> dict[str, Any]:
+        raise StopAsyncIteration
+
+    async def close(self) -> None:
+        pass
+
+
+class _FakeCollection:
+    def __init__(self) -> None:
+        self.last_query: dict[str, Any] | None = None
+
+    def find(self, query: dict[str, Any]) -> _FakeCursor:
+        self.last_query = query
+        return _FakeCursor()
+
+
+class _FakeDB:
+    def __init__(self) -> None:
+        self.pois = _FakeCollection()
+
+
+class PoiFilterTests(unittest.TestCase):
+    def test_normalizes_categories(self) -> None:
+        req = LocationRequest(
+            latitude=59.0,
+            longitude=18.0,
+            include_categories=[" Historic", "CULTURE", " "],
+            exclude_categories=[""],
+        )
+
+        self.assertEqual(req.include_categories, ["historic", "culture"])
+        self.assertIsNone(req.exclude_categories)
+        self.assertFalse(req.is_empty)
+
+    def test_matches(self) -> None:
+        poi_filter = PoiFilter(
+            include_categories=["historic", "culture"],
+            exclude_categories=["sport"],
+            min_importance=0.5,
+        )
+
+        self.assertTrue(poi_filter.matches(("culture",), 0.7))
+        self.assertFalse(poi_filter.matches(("nature",), 0.7))
+        self.assertFalse(poi_filter.matches(("culture", "sport"), 0.7))
+        self.assertFalse(poi_filter.matches(("culture",), 0.2))
+        self.assertFalse(poi_filter.matches(("culture",), None))
+
+    def test_grid_index_applies_filter(self) -> None:
+        index = GridIndex(
+            [
+                IndexedPoi("Q-church", 59.0, 18.0, importance=0.8, categories=("historic", "culture")),
+                IndexedPoi("Q-park", 59.0, 18.0, importance=0.9, categories=("nature",)),
+                IndexedPoi("Q-minor", 59.0, 18.0, importance=0.1, categories=("historic",)),
+            ]
+        )
+        poi_filter = PoiFilter(include_categories=["historic"], min_importance=0.5)
+
+        hits = index.query(59.0, 18.0, 50, poi_filter)
+
+        self.assertEqual([poi.entity_id for poi, _ in hits], ["Q-church"])
+        self.assertEqual(len(index.query(59.0, 18.0, 50, PoiFilter())), 3)
+
+
+class FilterPushdownTests(unittest.IsolatedAsyncioTestCase):
+    async def test_filters_are_part_of_the_geo_query(self) -> None:
+        fake_db = _FakeDB()
+        poi_filter = PoiFilter(
+            include_categories=["historic"], exclude_categories=["sport"], min_importance=0.3
+        )
+
+        with patch("app.services.database.get_db", return_value=fake_db):
+            await fetch_nearby_pois(59.0, 18.0, poi_filter=poi_filter)
+
+        query = fake_db.pois.last_query
+        assert query is not None
+        self.assertIn("$nearSphere", query["location"])
+        self.assertEqual(query["categories"], {"$in": ["historic"], "$nin": ["sport"]})
+        self.assertEqual(query["importance"], {"$gte": 0.3})
+
+    async def test_no_filter_adds_no_clauses(self) -> None:
+        fake_db = _FakeDB()
+
+        with patch("app.services.database.get_db", return_value=fake_db):
+            await fetch_nearby_pois(59.0, 18.0, poi_filter=PoiFilter())
+
+        self.assertEqual(list(fake_db.pois.last_query), ["location"])
+
+
+if __name__ == "__main__":
+    unittest.main()
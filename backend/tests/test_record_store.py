@@ -0,0 +1,130 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from _wikimedia_stub import WikimediaStub, make_entity
+
+import parse_all_entities
+from import_parsed import iter_sources, load_source
+from record_store import MANIFEST_NAME, RecordStore, is_store
+
+
+def record(qid: str, text: str = "text", wikidata_revid: int = 1) -> dict:
+    return {"entity_id": qid, "text": text, "wikidata_revid": wikidata_revid, "wikipedia_revid": 500}
+
+
+class RecordStoreTests(unittest.TestCase):
+    def test_records_are_written_compactly_to_rotating_shards(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            with RecordStore(root, shard_size=2) as store:
+                for i in range(5):
+                    store.write(record(f"Q{i}"))
+
+            reopened = RecordStore(root)
+            shards = sorted(p.name for p in root.glob("records-*.jsonl.gz"))
+            records = list(reopened.iter_records())
+
+            self.assertTrue(is_store(root))
+            self.assertEqual(shards, ["records-00000.jsonl.gz", "records-00001.jsonl.gz", "records-00002.jsonl.gz"])
+            self.assertEqual([r["entity_id"] for r in records], [f"Q{i}" for i in range(5)])
+            self.assertEqual(reopened.status("Q3"), "ok")
+            self.assertEqual(reopened.revisions("Q3"), (1, 500))
+            self.assertEqual(reopened.revisions("Q9"), (None, None))
+
+    def test_rewritten_records_supersede_earlier_ones(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            with RecordStore(root) as store:
+                store.write(record("Q1", "old"))
+                store.write(record("Q2", "kept"))
+            with RecordStore(root) as store:
+                store.write(record("Q1", "new", wikidata_revid=2))
+
+            records = {r["entity_id"]: r for r in RecordStore(root).iter_records()}
+            shard_count = len(list(root.glob("records-*.jsonl.gz")))
+
+        self.assertEqual(shard_count, 2)
+        self.assertEqual(records["Q1"]["text"], "new")
+        self.assertEqual(records["Q2"]["text"], "kept")
+        self.assertEqual(len(records), 2)
+
+    def test_failure_keeps_the_previous_record_readable(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            with RecordStore(root) as store:
+                store.write(record("Q1"))
+            with RecordStore(root) as store:
+                store.mark_failed("Q1", "fetch: timeout")
+                store.mark_failed("Q2", "fetch: 404")
+
+            reopened = RecordStore(root)
+            self.assertEqual(sorted(reopened.ids_with_status("failed")), ["Q1", "Q2"])
+            self.assertEqual(reopened.manifest["Q1"]["error"], "fetch: timeout")
+            self.assertEqual([r["entity_id"] for r in reopened.iter_records()], ["Q1"])
+            self.assertEqual(reopened.revisions("Q2"), (None, None))
+
+    def test_interrupted_run_only_loses_unflushed_records(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            store = RecordStore(root, flush_every=2)
+            for i in range(3):
+                store.write(record(f"Q{i}"))
+            # Simulate a crash: the shard is never closed and the manifest ends mid-line.
+            with (root / MANIFEST_NAME).open("a", encoding="utf-8") as fh:
+                fh.write('{"entity_id": "Q2", "sta')
+
+            reopened = RecordStore(root)
+            self.assertEqual(sorted(reopened.manifest), ["Q0", "Q1"])
+            self.assertEqual([r["entity_id"] for r in reopened.iter_records()], ["Q0", "Q1"])
+
+
+class ShardedIngestionTests(unittest.TestCase):
+    def test_pipeline_writes_to_the_store_and_importer_reads_it(self) -> None:
+        qids = [f"Q{100 + i}" for i in range(4)]
+        entities = {qid: make_entity(qid, i) for i, qid in enumerate(qids)}
+
+        with tempfile.TemporaryDirectory() as tmp, WikimediaStub(entities) as stub:
+            out_dir = Path(tmp)
+            with RecordStore(out_dir, shard_size=3) as store:
+                pipeline = parse_all_entities.build_pipeline(out_dir, 0, 0, fetch_workers=2, store=store)
+                items = parse_all_entities.iter_prefetched(qids + ["Q404"], batch_size=50)
+                for qid, _, error in pipeline.run((i.entity_id, i) for i in items):
+                    if error is not None:
+                        store.mark_failed(qid, error)
+
+            imported = {name: load_source(source) for name, source in iter_sources(out_dir)}
+            store = RecordStore(out_dir)
+            failed = parse_all_entities.previously_failed(out_dir, store)
+
+            entities["Q101"]["lastrevid"] += 1
+            changed = parse_all_entities.changed_entities(qids, out_dir, store)
+            json_files = list(out_dir.glob("*.json"))
+
+        self.assertEqual(sorted(imported), qids)
+        self.assertEqual(imported["Q102"]["categories"], ["historic", "culture"])
+        self.assertEqual(failed, ["Q404"])
+        self.assertEqual(changed, ["Q101"])
+        self.assertEqual(json_files, [])
+
+    def test_importer_still_reads_per_entity_files(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            out_dir = Path(tmp)
+            parse_all_entities.write_json(out_dir / "Q1.json", record("Q1"))
+            parse_all_entities.write_json(out_dir / "_failed_entities.json", {"failed": [{"entity_id": "Q2"}]})
+            (out_dir / "Q3.json").write_text("{", encoding="utf-8")
+
+            sources = dict(iter_sources(out_dir))
+            failed = parse_all_entities.previously_failed(out_dir)
+
+            self.assertEqual(load_source(sources["Q1.json"])["text"], "text")
+            with self.assertRaises(ValueError):
+                load_source(sources["Q3.json"])
+
+        self.assertEqual(sorted(sources), ["Q1.json", "Q3.json"])
+        self.assertEqual(failed, ["Q2"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+import unittest
+from unittest.mock import patch
+
+from app.models import PointOfInterest, RoutePoint, RouteRequest
+from app.routes import locations
+from app.utils import corridor_polygons, locate_on_polyline
+
+# ~1 m of latitude in degrees
+_M = 1 / 111_320
+
+# An L-shaped walk: ~1 km north, then ~1 km east.
+_ROUTE = [(59.0, 18.0), (59.0 + 1000 * _M, 18.0), (59.0 + 1000 * _M, 18.0175)]
+
+
+def _inside(ring: list[list[float]], lon: float, lat: float) -> bool:
+    inside = False
+    for (x1, y1), (x2, y2) in zip(ring, ring[1:]):
+        if (y1 > lat) != (y2 > lat) and lon < x1 + (lat - y1) * (x2 - x1) / (y2 - y1):
+            inside = not inside
+    return inside
+
+
+class CorridorGeometryTests(unittest.TestCase):
+    def test_locate_on_polyline(self) -> None:
+        along, offset = locate_on_polyline(_ROUTE, 59.0 + 400 * _M, 18.0005)
+
+        self.assertAlmostEqual(along, 400, delta=1)
+        self.assertAlmostEqual(offset, 28.6, delta=1)
+
+    def test_polygons_cover_the_buffer_around_joins(self) -> None:
+        rings = corridor_polygons(_ROUTE, 50)
+        corner_lat, corner_lon = _ROUTE[1]
+
+        self.assertEqual(len(rings), 2)
+        for ring in rings:
+            self.assertEqual(ring[0], ring[-1])
+        # Outside the corner of the L, 45 m away diagonally.
+        lat, lon = corner_lat + 32 * _M, corner_lon - 0.00056
+        self.assertLess(locate_on_polyline(_ROUTE, lat, lon)[1], 50)
+        self.assertTrue(any(_inside(ring, lon, lat) for ring in rings))
+        # Well outside the corridor.
+        self.assertFalse(any(_inside(ring, 18.01, 59.0 + 500 * _M) for ring in rings))
+
+
+class RouteEndpointTests(unittest.IsolatedAsyncioTestCase):
+    async def test_orders_by_distance_along_route_and_drops_corner_overcoverage(self) -> None:
+        candidates = [
+            PointOfInterest(entity_id="Q-east", title="", latitude=59.0 + 1010 * _M, longitude=18.01),
+            PointOfInterest(entity_id="Q-start", title="", latitude=59.0 + 20 * _M, longitude=18.0002),
+            # Inside the first rectangle's far corner but > 50 m from the route.
+            PointOfInterest(entity_id="Q-corner", title="", latitude=59.0 + 1045 * _M, longitude=17.99925),
+        ]
+        seen_polygons = []
+
+        async def fake_fetch(polygons, poi_filter=None):
+            seen_polygons.append(polygons)
+            return candidates
+
+        req = RouteRequest(points=[RoutePoint(latitude=lat, longitude=lon) for lat, lon in _ROUTE])
+        with patch.object(locations, "fetch_pois_in_polygons", side_effect=fake_fetch):
+            response = await locations.get_pois_along_route(req)
+
+        self.assertEqual(len(seen_polygons), 1)
+        self.assertEqual(
+            [poi.entity_id for poi in response.points_of_interest], ["Q-start", "Q-east"]
+        )
+        self.assertAlmostEqual(response.length_m, 2000, delta=10)
+        self.assertGreater(response.points_of_interest[1].distance_along_m, 1000)
+
+
+if __name__ == "__main__":
+    unittest.main()
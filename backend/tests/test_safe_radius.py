@@ -0,0 +1,169 @@
+import unittest
+from typing import Any
+from unittest.mock import patch
+
+from app.config import settings
+from app.models import LocationRequest, PointOfInterest
+from app.routes import locations
+from app.services.database import fetch_nearby_pois
+
+# ~1 m of latitude in degrees
+_M = 1 / 111_320
+
+
+def _build_doc(entity_id: str, metres_north: float) -> dict[str, Any]:
+    return {
+        "entity_id": entity_id,
+        "title": f"title-{entity_id}",
+        "location": {"type": "Point", "coordinates": [18.0, 59.0 + metres_north * _M]},
+    }
+
+
+class _FakeCursor:
+    def __init__(self, docs: list[dict[str, Any]]):
+        self._docs = iter(docs)
+        self.read = 0
+        self.closed = False
+
+    def __aiter__(self) -> "_FakeCursor":
+        return self
+
+    async def __anext__(self) -> dict[str, Any]:
+        try:
+            doc = next(self._docs)
+        except StopIteration:
+            raise StopAsyncIteration
+        self.read += 1
+        return doc
+
+    async def close(self) -> None:
+        self.closed = True
+
+
+class _FakeCollection:
+    def __init__(self, docs: list[dict[str, Any]]):
+        self.cursor = _FakeCursor(docs)
+        self.last_query: dict[str, Any] | None = None
+
+    def find(self, query: dict[str, Any]) -> _FakeCursor:
+        self.last_query = query
+        return self.cursor
+
+
+class _FakeDB:
+    def __init__(self, docs: list[dict[str, Any]]):
+        self.pois = _FakeCollection(docs)
+
+
+class FetchNearbyPoisTests(unittest.IsolatedAsyncioTestCase):
+    async def test_safe_radius_is_gap_to_nearest_outside_poi(self) -> None:
+        docs = [
+            _build_doc("Q1", 10),
+            _build_doc("Q2", 250),
+            _build_doc("Q3", 700),
+            _build_doc("Q4", 900),
+        ]
+        fake_db = _FakeDB(docs)
+
+        with patch("app.services.database.get_db", return_value=fake_db):
+            pois, safe_radius_m = await fetch_nearby_pois(59.0, 18.0, radius_m=300)
+
+        self.assertEqual([poi.entity_id for poi in pois], ["Q1", "Q2"])
+        self.assertAlmostEqual(safe_radius_m, 400, delta=1)
+        # Stops reading at the first POI outside the radius.
+        self.assertEqual(fake_db.pois.cursor.read, 3)
+        self.assertTrue(fake_db.pois.cursor.closed)
+        max_distance = fake_db.pois.last_query["location"]["$nearSphere"]["$maxDistance"]
+        self.assertEqual(max_distance, 300 + settings.max_safe_radius_m)
+
+    async def test_empty_area_returns_cap(self) -> None:
+        fake_db = _FakeDB([_build_doc("Q1", 10)])
+
+        with patch("app.services.database.get_db", return_value=fake_db):
+            pois, safe_radius_m = await fetch_nearby_pois(59.0, 18.0, radius_m=300)
+
+        self.assertEqual(len(pois), 1)
+        self.assertEqual(safe_radius_m, settings.max_safe_radius_m)
+
+
+class UpdateLocationSafeRadiusTests(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        locations._last_positions.clear()
+        locations._safe_radii.clear()
+        locations._data_versions.clear()
+        locations._filters.clear()
+        # A fixed POI generation, so no test reaches the database for it.
+        self.version = 0
+
+        async def fake_version() -> int:
+            return self.version
+
+        patcher = patch.object(locations, "data_version", side_effect=fake_version)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_skips_fetch_while_inside_safe_radius(self) -> None:
+        calls = 0
+
+        async def fake_fetch(lat: float, lon: float, poi_filter=None) -> tuple[list[PointOfInterest], float]:
+            nonlocal calls
+            calls += 1
+            return [], 500.0
+
+        with patch.object(locations, "fetch_nearby_pois", side_effect=fake_fetch):
+            first = await locations.update_location(LocationRequest(latitude=59.0, longitude=18.0))
+            inside = await locations.update_location(
+                LocationRequest(latitude=59.0 + 400 * _M, longitude=18.0)
+            )
+            outside = await locations.update_location(
+                LocationRequest(latitude=59.0 + 600 * _M, longitude=18.0)
+            )
+
+        self.assertEqual(first.safe_radius_m, 500.0)
+        self.assertEqual(inside.status_code, 204)
+        self.assertEqual(outside.safe_radius_m, 500.0)
+        self.assertEqual(calls, 2)
+
+    async def test_new_poi_generation_drops_the_safe_radius(self) -> None:
+        calls = 0
+
+        async def fake_fetch(lat: float, lon: float, poi_filter=None) -> tuple[list[PointOfInterest], float]:
+            nonlocal calls
+            calls += 1
+            return [], 500.0
+
+        with patch.object(locations, "fetch_nearby_pois", side_effect=fake_fetch):
+            await locations.update_location(LocationRequest(latitude=59.0, longitude=18.0))
+            inside = await locations.update_location(LocationRequest(latitude=59.0 + 100 * _M, longitude=18.0))
+            self.version = 1
+            after_import = await locations.update_location(
+                LocationRequest(latitude=59.0 + 100 * _M, longitude=18.0)
+            )
+
+        self.assertEqual(inside.status_code, 204)
+        self.assertEqual(after_import.safe_radius_m, 500.0)
+        self.assertEqual(calls, 2)
+
+    async def test_changed_filter_drops_the_safe_radius(self) -> None:
+        filters = []
+
+        async def fake_fetch(lat: float, lon: float, poi_filter=None) -> tuple[list[PointOfInterest], float]:
+            filters.append(poi_filter.include_categories)
+            return [], 500.0
+
+        with patch.object(locations, "fetch_nearby_pois", side_effect=fake_fetch):
+            await locations.update_location(LocationRequest(latitude=59.0, longitude=18.0))
+            refiltered = await locations.update_location(
+                LocationRequest(latitude=59.0 + 100 * _M, longitude=18.0, include_categories=["Historic"])
+            )
+            same_filter = await locations.update_location(
+                LocationRequest(latitude=59.0 + 200 * _M, longitude=18.0, include_categories=["historic"])
+            )
+
+        self.assertEqual(refiltered.safe_radius_m, 500.0)
+        self.assertEqual(same_filter.status_code, 204)
+        self.assertEqual(filters, [None, ["historic"]])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+import asyncio
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from _ai_stub import AiStub, mp3_for
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from ai import Information, astream_describe
+from ai.services import mp3
+from ai.services.sentences import SentenceChunker
+from app.models import PoiDetail
+from app.routes import locations
+from app.services import narration
+
+SENTENCES = [
+    "Storkyrkan is the oldest church in Gamla Stan.",
+    "It was first mentioned in writing in the year 1279.",
+    "Inside stands the famous statue of Saint George and the Dragon.",
+]
+CTX = Information("Storkyrkan", 59.3257, 18.0706, "", "", "Stockholm, Sweden", "history")
+
+
+def _chunks(text: str, size: int = 7) -> list[str]:
+    return [text[i : i + size] for i in range(0, len(text), size)]
+
+
+async def _collect(stream) -> list[bytes]:
+    return [chunk async for chunk in stream]
+
+
+class SentenceChunkerTests(unittest.TestCase):
+    def test_releases_whole_sentences_of_a_minimum_length(self) -> None:
+        chunker = SentenceChunker(min_chars=20)
+        pieces = []
+        for delta in _chunks("Yes. St. Mary's is old. It was built in 1200!\n\nA new paragraph"):
+            pieces += chunker.feed(delta)
+
+        self.assertEqual(pieces, ["Yes. St. Mary's is old.", "It was built in 1200!"])
+        self.assertEqual(chunker.flush(), "A new paragraph")
+        self.assertIsNone(chunker.flush())
+
+
+class StreamingDescribeTests(unittest.TestCase):
+    def test_audio_starts_before_the_text_is_finished(self) -> None:
+        with AiStub(token_delay=0.01) as stub:
+            stub.narrations["Storkyrkan"] = " ".join(SENTENCES)
+            chunks = asyncio.run(_collect(astream_describe(CTX)))
+
+        tts_requests = [request for kind, request in stub.requests if kind == "tts"]
+        llm_end = next(end for kind, _, end in stub.intervals if kind == "llm")
+        first_tts_start = min(start for kind, start, _ in stub.intervals if kind == "tts")
+
+        self.assertEqual(b"".join(chunks), mp3.concat([mp3_for(s) for s in SENTENCES]))
+        self.assertEqual([request["text"] for request in tts_requests], SENTENCES)
+        self.assertNotIn("previous_text", tts_requests[0])
+        self.assertEqual(tts_requests[2]["previous_text"], " ".join(SENTENCES[:2]))
+        self.assertLess(first_tts_start, llm_end)
+
+
+class StreamAudioRouteTests(unittest.TestCase):
+    def setUp(self) -> None:
+        application = FastAPI()
+        application.include_router(locations.router, prefix="/api/v1")
+        self.client = TestClient(application)
+        self.detail = PoiDetail(entity_id="Q1", title="Storkyrkan")
+
+        async def fake_detail(entity_id: str) -> PoiDetail | None:
+            return self.detail if entity_id == "Q1" else None
+
+        async def fake_source(entity_id: str) -> dict:
+            return {"entity_id": "Q1", "title": "Storkyrkan", "location": {"type": "Point", "coordinates": [18.07, 59.32]}}
+
+        for target, name, fake in ((locations, "fetch_poi_detail", fake_detail), (narration, "fetch_poi_source", fake_source)):
+            patcher = patch.object(target, name, side_effect=fake)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_streams_live_narration(self) -> None:
+        with AiStub() as stub:
+            stub.narrations["Storkyrkan"] = " ".join(SENTENCES)
+            response = self.client.get("/api/v1/locations/audio/Q1/stream", params={"interest": "architecture"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["content-type"], "audio/mpeg")
+        self.assertEqual(response.content, mp3.concat([mp3_for(s) for s in SENTENCES]))
+        self.assertIn("client interest: architecture", stub.requests[0][1]["messages"][-1]["content"])
+
+    def test_pre_generated_audio_is_served_as_is(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp, AiStub() as stub:
+            audio_file = Path(tmp) / "Q1.mp3"
+            audio_file.write_bytes(b"pre-generated")
+            self.detail.audio_file = str(audio_file)
+            response = self.client.get("/api/v1/locations/audio/Q1/stream")
+
+        self.assertEqual(response.content, b"pre-generated")
+        self.assertEqual(stub.requests, [])
+
+    def test_provider_failure_is_a_502_and_unknown_pois_a_404(self) -> None:
+        with AiStub() as stub:
+            stub.failures["llm"] = [400]
+            failed = self.client.get("/api/v1/locations/audio/Q1/stream")
+        missing = self.client.get("/api/v1/locations/audio/Q2/stream")
+
+        self.assertEqual(failed.status_code, 502)
+        self.assertEqual(missing.status_code, 404)
+
+
+if __name__ == "__main__":
+    unittest.main()
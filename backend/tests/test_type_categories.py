@@ -0,0 +1,93 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from _wikimedia_stub import WikimediaStub, make_class, make_entity
+
+import wikidata_entity_to_json as w2j
+from type_categories import TypeCategoryTable
+
+SEEDS = {"Q-church": ("historic", "culture"), "Q-park": ("nature",)}
+ORDER = ("historic", "culture", "nature")
+
+
+class _Hierarchy:
+    def __init__(self, parents: dict[str, list[str]]):
+        self.parents = parents
+        self.calls: list[list[str]] = []
+
+    def __call__(self, class_ids: list[str]) -> dict[str, list[str]]:
+        self.calls.append(class_ids)
+        return {qid: self.parents[qid] for qid in class_ids if qid in self.parents}
+
+
+class TypeCategoryTableTests(unittest.TestCase):
+    def test_subclasses_inherit_nearest_seed(self) -> None:
+        fetch = _Hierarchy(
+            {
+                "Q-lutheran": ["Q-protestant"],
+                "Q-protestant": ["Q-church"],
+                "Q-city-park": ["Q-park", "Q-place"],
+                "Q-thing": ["Q-entity"],
+                "Q-entity": [],
+            }
+        )
+        table = TypeCategoryTable(seeds=SEEDS, order=ORDER)
+
+        lookups = table.resolve(["Q-lutheran", "Q-city-park", "Q-thing"], fetch)
+
+        self.assertEqual(lookups, 2)
+        self.assertEqual(fetch.calls[0], ["Q-city-park", "Q-lutheran", "Q-thing"])
+        self.assertEqual(table.categories_for(["Q-lutheran"]), ["historic", "culture"])
+        self.assertEqual(table.categories_for(["Q-city-park", "Q-lutheran"]), ["historic", "culture", "nature"])
+        self.assertIsNone(table.categories_for(["Q-thing"]))
+        self.assertIsNone(table.categories_for(["Q-never-resolved"]))
+
+    def test_parents_are_cached_on_disk(self) -> None:
+        fetch = _Hierarchy({"Q-lutheran": ["Q-church"]})
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "types.json"
+            TypeCategoryTable(path, seeds=SEEDS).resolve(["Q-lutheran"], fetch)
+
+            reloaded = TypeCategoryTable(path, seeds=SEEDS, order=ORDER)
+            lookups = reloaded.resolve(["Q-lutheran"], fetch)
+
+        self.assertEqual(lookups, 0)
+        self.assertEqual(len(fetch.calls), 1)
+        self.assertEqual(reloaded.categories_for(["Q-lutheran"]), ["historic", "culture"])
+
+    def test_cycles_and_depth_limit(self) -> None:
+        fetch = _Hierarchy({"Q-a": ["Q-b"], "Q-b": ["Q-a"], "Q-1": ["Q-2"], "Q-2": ["Q-3"], "Q-3": ["Q-church"]})
+        table = TypeCategoryTable(seeds=SEEDS, max_depth=2)
+
+        table.resolve(["Q-a", "Q-1"], fetch)
+
+        self.assertIsNone(table.categories_for(["Q-a"]))
+        self.assertIsNone(table.categories_for(["Q-1"]))
+        self.assertNotIn("Q-3", [qid for call in fetch.calls for qid in call])
+
+
+class TypeClassificationTests(unittest.TestCase):
+    def test_known_types_skip_the_llm(self) -> None:
+        covered = make_entity("Q1", 1)
+        covered["claims"]["P31"][0]["mainsnak"]["datavalue"]["value"]["id"] = "Q500"
+        uncovered = make_entity("Q2", 2)
+        uncovered["claims"]["P31"][0]["mainsnak"]["datavalue"]["value"]["id"] = "Q600"
+        entities = {"Q1": covered, "Q2": uncovered, "Q500": make_class("Q500", "Q16970")}
+
+        with WikimediaStub(entities) as stub:
+            before = dict(w2j.CLASSIFY_STATS)
+            record = w2j.build_json("Q1")
+            self.assertEqual(stub.count("/api/chat"), 0)
+
+            fallback = w2j.build_json("Q2")
+            self.assertEqual(stub.count("/api/chat"), 1)
+
+        self.assertEqual(record["categories"], ["historic", "culture"])
+        self.assertEqual(fallback["categories"], ["historic", "culture"])
+        self.assertEqual(w2j.CLASSIFY_STATS["type_table"] - before["type_table"], 1)
+        self.assertEqual(w2j.CLASSIFY_STATS["llm"] - before["llm"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+import bz2
+import gzip
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from _wikimedia_stub import WikimediaStub, make_class, make_entity
+
+import wikidata_dump
+import wikidata_entity_to_json as w2j
+
+# Around central Stockholm; make_entity(qid, i) is at latitude 59 + i / 1000.
+BBOX = wikidata_dump.parse_bbox("17.9,59.005,18.1,59.015")
+
+
+def write_dump(path: Path, entities: list[dict]) -> None:
+    """Write ``entities`` in the Wikidata dump layout: one entity per line inside a JSON array."""
+    lines = ",\n".join(json.dumps(entity) for entity in entities)
+    data = f"[\n{lines}\n]\n".encode("utf-8")
+    if path.suffix == ".gz":
+        data = gzip.compress(data)
+    elif path.suffix == ".bz2":
+        data = bz2.compress(data)
+    path.write_bytes(data)
+
+
+def fixture_entities() -> list[dict]:
+    entities = [make_entity(f"Q{100 + i}", i) for i in range(20)]
+    del entities[7]["claims"]["P625"]
+    del entities[8]["sitelinks"]
+    entities[9]["claims"]["P31"][0]["mainsnak"]["datavalue"]["value"]["id"] = "Q999"
+    return entities + [make_class("Q999", "Q5"), {"id": "P625", "type": "property", "claims": {}}]
+
+
+class DumpReaderTests(unittest.TestCase):
+    def setUp(self) -> None:
+        saved = w2j.TYPE_CATEGORIES
+        self.addCleanup(setattr, w2j, "TYPE_CATEGORIES", saved)
+        w2j.configure_type_categories(None)
+
+    def test_byte_ranges_cover_every_line_once(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "dump.json"
+            write_dump(path, fixture_entities())
+            lines = path.read_bytes().splitlines(keepends=True)
+
+            for chunk_bytes in (1, 7, 100, 1000, 10**6):
+                with self.subTest(chunk_bytes=chunk_bytes):
+                    read = [
+                        line
+                        for chunk in wikidata_dump.iter_chunks(path, chunk_bytes)
+                        for line in wikidata_dump.iter_range_lines(Path(chunk.path), chunk.start, chunk.end)
+                    ]
+                    self.assertEqual(read, lines)
+
+    def test_region_records_match_build_json_format(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "dump.json"
+            write_dump(path, fixture_entities())
+            records = {r["entity_id"]: r for r in wikidata_dump.iter_region(path, BBOX, chunk_bytes=500)}
+
+        # Indices 5..15 are inside the box; index 7 has no coordinates.
+        self.assertEqual(sorted(records), [f"Q{100 + i}" for i in range(5, 16) if i != 7])
+        record = records["Q106"]
+        with WikimediaStub({entity["id"]: entity for entity in fixture_entities()}):
+            self.assertEqual(list(record), list(w2j.build_json("Q106")))
+        self.assertEqual(record["title"], "Place 6")
+        self.assertEqual(record["categories"], ["historic", "culture"])
+        self.assertEqual(record["wikidata_revid"], 1006)
+        self.assertIsNone(record["wikipedia_revid"])
+        self.assertIsNone(record["text"])
+        self.assertRegex(
+            record["image_url"], r"^https://upload\.wikimedia\.org/wikipedia/commons/[0-9a-f]/[0-9a-f]{2}/Place_6\.jpg$"
+        )
+        self.assertIsNone(records["Q108"]["title"])
+        # Q999 is not covered by the type table and the dump reader never asks the LLM.
+        self.assertEqual(records["Q109"]["categories"], ["other"])
+
+    def test_compressed_dumps_and_processes_give_the_same_records(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            results = {}
+            for name, processes in (("dump.json", 2), ("dump.json.gz", 1), ("dump.json.bz2", 2)):
+                path = Path(tmp) / name
+                write_dump(path, fixture_entities())
+                results[name] = sorted(
+                    (r["entity_id"], r["latitude"])
+                    for r in wikidata_dump.iter_region(path, BBOX, processes=processes, chunk_bytes=300)
+                )
+
+        self.assertEqual(len(results["dump.json"]), 10)
+        self.assertEqual(results["dump.json.gz"], results["dump.json"])
+        self.assertEqual(results["dump.json.bz2"], results["dump.json"])
+
+    def test_commons_upload_url(self) -> None:
+        self.assertEqual(
+            wikidata_dump.commons_upload_url("example.jpg"),
+            "https://upload.wikimedia.org/wikipedia/commons/a/a9/Example.jpg",
+        )
+        self.assertTrue(wikidata_dump.commons_upload_url("Café (1).jpg").endswith("/Caf%C3%A9_(1).jpg"))
+
+    def test_parse_bbox_rejects_bad_input(self) -> None:
+        for spec in ("1,2,3", "a,b,c,d", "18,59,17,60"):
+            with self.subTest(spec=spec), self.assertRaises(ValueError):
+                wikidata_dump.parse_bbox(spec)
+
+
+if __name__ == "__main__":
+    unittest.main()
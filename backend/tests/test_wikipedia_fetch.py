@@ -0,0 +1,130 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from _wikimedia_stub import WikimediaStub, make_entity, make_sections
+
+import wikidata_entity_to_json as w2j
+from html_simplify import simplify_html
+
+NAVBOX = '<div class="navbox"><table><tr><td>' + "<a href=\"/wiki/X\">Related</a> " * 200 + "</td></tr></table></div>"
+REFLIST = '<div class="reflist"><ol class="references">' + "<li>Citation.</li>" * 200 + "</ol></div>"
+
+LAYOUTS = {
+    "default": make_sections("Storkyrkan"),
+    "long tail": [
+        (None, 0, "<p><b>Storkyrkan</b> is a church.</p>"),
+        ("History", 2, "<p>Built in 1279.</p>"),
+        ("Interior", 3, "<p>Gothic vaulting.</p>"),
+        ("See also", 2, "<ul><li>Riddarholmen Church</li></ul>"),
+        ("References", 2, REFLIST),
+        ("External links", 2, "<ul><li>Official site</li></ul>" + NAVBOX),
+    ],
+    "stop subsection": [
+        (None, 0, "<p>Lead.</p>"),
+        ("History", 2, "<p>Old.</p>"),
+        ("Notes", 3, REFLIST),
+        ("Architecture", 2, "<p>Never reached.</p>"),
+    ],
+    "formatted heading": [
+        (None, 0, "<p>Lead.</p>"),
+        ("Name", 2, "<p>Named after <i>Saint Nicholas</i>.</p>"),
+        ("<i>Works cited</i>", 2, REFLIST),
+    ],
+    "no stop section": [
+        (None, 0, "<p>Lead.</p>"),
+        ("History", 2, "<p>Old.</p>"),
+        ("Deep", 5, "<p>Level five.</p>"),
+    ],
+    "template heading": [
+        (None, 0, "<p>Lead.</p>"),
+        ("History", 2, '<p>Old.</p><div class="mw-heading mw-heading2"><h2>References</h2></div>' + REFLIST),
+    ],
+    "non-ascii": [
+        (None, 0, "<p>Kyrkan på Stadsholmen – ”Storkyrkan”.</p>"),
+        ("Historia och ärkebiskopar", 2, "<p>Byggd år 1279 för Sankt Nikolaus.</p>"),
+        ("References", 2, REFLIST),
+    ],
+}
+
+
+class LeanFetchParityTests(unittest.TestCase):
+    def test_lean_page_simplifies_like_the_full_page(self) -> None:
+        with WikimediaStub({}) as stub:
+            for name, sections in LAYOUTS.items():
+                with self.subTest(layout=name):
+                    stub.pages["Storkyrkan"] = sections
+                    full_html, full_revid = w2j.wikipedia_parse_page("Storkyrkan", w2j.USER_AGENT)
+                    lean_html, lean_revid = w2j.wikipedia_lean_page("Storkyrkan", w2j.USER_AGENT)
+
+                    self.assertEqual(
+                        simplify_html(lean_html, page_title="Storkyrkan"),
+                        simplify_html(full_html, page_title="Storkyrkan"),
+                    )
+                    self.assertEqual(
+                        w2j.strip_links_and_simplify_html(lean_html, page_title="Storkyrkan"),
+                        w2j.strip_links_and_simplify_html(full_html, page_title="Storkyrkan"),
+                    )
+                    self.assertEqual(lean_revid, full_revid)
+                    if name == "long tail":
+                        self.assertLess(len(lean_html), len(full_html) / 5)
+
+    def test_records_match_and_summary_comes_from_the_lead(self) -> None:
+        entities = {"Q1": make_entity("Q1", 1), "Q2": make_entity("Q2", 2)}
+        del entities["Q2"]["claims"]["P18"]
+
+        with WikimediaStub(entities) as stub:
+            full = [w2j.build_json(qid) for qid in entities]
+            w2j.configure_wikipedia_fetch("lean")
+            self.addCleanup(w2j.configure_wikipedia_fetch, "full")
+            requests_before = len(stub.requests)
+            lean = [w2j.build_json(qid) for qid in entities]
+            summary_requests = [path for _, path, _ in stub.requests[requests_before:] if "/summary/" in path]
+
+        for full_record, lean_record in zip(full, lean):
+            for key in ("title", "text", "categories", "image_url", "summary", "wikipedia_revid"):
+                self.assertEqual(lean_record[key], full_record[key], key)
+        self.assertEqual(lean[0]["summary"], "Place 1 is a church in Stockholm.")
+        # Only the entity without a P18 image still asks the REST API (for its image).
+        self.assertEqual(summary_requests, ["/api/rest_v1/page/summary/Place_2"])
+
+    def test_lean_fetch_works_from_the_http_cache(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp, WikimediaStub({"Q1": make_entity("Q1", 1)}) as stub:
+            w2j.configure_wikipedia_fetch("lean")
+            self.addCleanup(w2j.configure_wikipedia_fetch, "full")
+            self.addCleanup(w2j.configure_http)
+            w2j.configure_http(Path(tmp), "revalidate")
+            online = w2j.build_json("Q1")
+            fetched = len(stub.requests)
+
+            w2j.configure_http(Path(tmp), "only")
+            offline = w2j.build_json("Q1")
+
+            self.assertEqual(len(stub.requests), fetched)
+        self.assertEqual(offline["text"], online["text"])
+
+
+class KeptWikitextTests(unittest.TestCase):
+    def test_cut_uses_utf8_byte_offsets(self) -> None:
+        wikitext = "Å lead.\n== Références ==\nx\n== Notes ==\nrefs\n"
+        offset = len(wikitext[: wikitext.index("== Notes")].encode("utf-8"))
+        sections = [
+            {"level": "2", "line": "Références", "byteoffset": 10},
+            {"level": "2", "line": "Notes", "byteoffset": offset},
+        ]
+
+        self.assertEqual(w2j.kept_wikitext(wikitext, sections), "Å lead.\n== Références ==\nx\n")
+
+    def test_stop_section_from_a_template_keeps_everything(self) -> None:
+        sections = [{"level": "2", "line": "External links", "byteoffset": None}]
+
+        self.assertEqual(w2j.kept_wikitext("text", sections), "text")
+
+    def test_level_five_headings_do_not_stop(self) -> None:
+        sections = [{"level": "5", "line": "Notes", "byteoffset": 2}]
+
+        self.assertEqual(w2j.kept_wikitext("text", sections), "text")
+
+
+if __name__ == "__main__":
+    unittest.main()